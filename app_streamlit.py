@@ -1,22 +1,46 @@
 # app_streamlit.py
 import streamlit as st
 import os
+import importlib
 from services.styling import inject_css
-from modules.explore_dashboard import show_explore_page
-from modules.ai_predictions import show_ai_predictions_page
-from modules.custom_dashboard import show_custom_dashboard_page
+from services import perf
+
+# Page modules pull in plotly, scikit-learn and friends, so each one is only
+# imported the first time its page is routed to.
+PAGES = {
+    "Explore Data": ("modules.explore_dashboard", "show_explore_page"),
+    "AI Predictions": ("modules.ai_predictions", "show_ai_predictions_page"),
+    "Custom Dashboard": ("modules.custom_dashboard", "show_custom_dashboard_page"),
+}
+
+
+def load_page(page_name):
+    module_name, function_name = PAGES[page_name]
+    with perf.span(f"import.{module_name}"):
+        module = importlib.import_module(module_name)
+    return getattr(module, function_name)
+
+
+@st.cache_resource
+def create_data_folders():
+    """Runs once per server process instead of on every rerun."""
+    for folder in [
+        "data/raw/forecast",
+        "data/raw/consumption",
+        "data/merged",
+        "data/custom/workspaces",
+    ]:
+        os.makedirs(folder, exist_ok=True)
+    return True
+
 
 # === CONFIGURATION ===
 st.set_page_config(page_title="Inventory Forecast AI", layout="wide")
 inject_css()
+perf.start_run(track_memory=st.session_state.get("perf_track_memory", False))
 
 # === CREATE FOLDERS ===
-os.makedirs("data/raw/forecast", exist_ok=True)
-os.makedirs("data/raw/consumption", exist_ok=True)
-os.makedirs("data/merged", exist_ok=True)
-os.makedirs("data/custom/raw/forecast", exist_ok=True)
-os.makedirs("data/custom/raw/consumption", exist_ok=True)
-os.makedirs("data/custom/merged", exist_ok=True)
+create_data_folders()
 
 # === SIDEBAR ===
 with st.sidebar:
@@ -40,8 +64,8 @@ with st.sidebar:
 
     selected_page = st.radio(
         "Select Section:", 
-        ["Explore Data", "AI Predictions", "Custom Dashboard"],
-        index=["Explore Data", "AI Predictions", "Custom Dashboard"].index(st.session_state.page)
+        list(PAGES),
+        index=list(PAGES).index(st.session_state.page)
     )
     st.session_state.page = selected_page
 
@@ -66,10 +90,27 @@ with st.sidebar:
         
         st.caption("Files with the same name will be overwritten")
 
+    st.markdown("---")
+    if st.checkbox("Show performance panel", key="perf_show_panel"):
+        st.checkbox("Track memory (slower)", key="perf_track_memory",
+                    help="Records allocation peaks per step with tracemalloc; takes effect on the next rerun.")
+
 # === ROUTING ===
-if st.session_state.page == "Explore Data":
-    show_explore_page(forecast_files, consumption_file)
-elif st.session_state.page == "AI Predictions":
-    show_ai_predictions_page(forecast_files, consumption_file)
-elif st.session_state.page == "Custom Dashboard":
-    show_custom_dashboard_page()
\ No newline at end of file
+try:
+    with perf.span(f"page.{st.session_state.page}"):
+        show_page = load_page(st.session_state.page)
+        if st.session_state.page == "Custom Dashboard":
+            show_page()
+        else:
+            show_page(forecast_files, consumption_file)
+finally:
+    # Stops memory tracing once no session needs it; the spans stay for the panel
+    perf.end_run()
+
+perf.record_startup()
+
+# === PERFORMANCE ===
+if st.session_state.get("perf_show_panel"):
+    from modules.performance_panel import show_performance_panel
+    with st.sidebar:
+        show_performance_panel()
\ No newline at end of file
@@ -0,0 +1,271 @@
+# batch_cli.py
+"""
+Headless entry point for the inventory pipeline, e.g. for a nightly job:
+
+    python batch_cli.py run --workers 8
+    python batch_cli.py run --rebuild --out-of-core --skip-predict
+    python batch_cli.py append --forecast YPPMPL_W06-25.xlsx --consumption usage_W06-25.csv
+    python batch_cli.py train --n-iter 30
+    python batch_cli.py train --incremental
+    python batch_cli.py train --segments bu
+    python batch_cli.py export
+    python batch_cli.py backtest --workers 8 --last-weeks 12
+
+Runs the same ingest -> clean -> merge -> aggregate -> predict steps as the
+dashboards and writes their outputs under data/merged, so the pages open on
+precomputed results.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from services import perf
+
+
+def _print_timings():
+    print("\nStep timings:")
+    for row in perf.summarize_spans():
+        print(f"  {row['name']:<40} {row['calls']:>4} x {row['total_s']:>9.2f} s")
+
+
+def cmd_run(args) -> int:
+    from services.pipeline import run_pipeline
+
+    out_of_core = True if args.out_of_core else (False if args.in_memory else None)
+    start = time.perf_counter()
+    run_pipeline(
+        workers=args.workers,
+        rebuild=args.rebuild,
+        out_of_core=out_of_core,
+        predict=not args.skip_predict,
+        model_path=args.model,
+    )
+    _print_timings()
+    print(f"Done in {time.perf_counter() - start:.1f} s")
+    return 0
+
+
+def cmd_append(args) -> int:
+    import shutil
+    from services.ingest_service import FORECAST_RAW_DIR, CONSUMPTION_RAW_DIR
+    from services.pipeline import can_append, run_append_step
+
+    if not can_append():
+        print("No merged partitions to append to yet; run 'batch_cli.py run' once first.")
+        return 1
+
+    def to_raw(paths, folder):
+        copied = []
+        for path in paths:
+            target = os.path.join(folder, os.path.basename(path))
+            if os.path.abspath(path) != os.path.abspath(target):
+                shutil.copy2(path, target)
+            copied.append(target)
+        return copied
+
+    start = time.perf_counter()
+    result = run_append_step(
+        to_raw(args.forecast, FORECAST_RAW_DIR),
+        to_raw(args.consumption, CONSUMPTION_RAW_DIR),
+        workers=args.workers,
+    )
+    if result["weeks"]:
+        print(f"Appended {', '.join(result['weeks'])}; "
+              f"{result['aggregates']['Week'].nunique()} weeks in the merged data")
+    else:
+        print("No new or changed weeks in the given files.")
+    _print_timings()
+    print(f"Done in {time.perf_counter() - start:.1f} s")
+    return 0
+
+
+def cmd_train(args) -> int:
+    from services.training import (
+        load_merged_history, update_training_set, train_with_search, retrain_incremental,
+        train_segment_models
+    )
+
+    merged_df = load_merged_history()
+    if merged_df is None or merged_df.empty:
+        print("No merged history found; run `python batch_cli.py run` first.")
+        return 1
+
+    training_set, new_rows = update_training_set(merged_df)
+    print(f"Training set: {len(training_set):,} rows, {len(new_rows):,} new")
+
+    if args.incremental and os.path.exists(args.model):
+        if new_rows.empty:
+            print("No new weeks since the last training run; nothing to do.")
+            return 0
+        run = retrain_incremental(training_set, new_rows, extra_trees=args.extra_trees,
+                                  n_jobs=args.n_jobs, model_path=args.model, max_trees=args.max_trees)
+        print(f"{run['kind']}: {run['n_estimators']} trees, forward test {run['forward_test']}")
+    else:
+        run = train_with_search(training_set, n_iter=args.n_iter, n_jobs=args.n_jobs,
+                                cv_splits=args.cv_splits, holdout_weeks=args.holdout_weeks,
+                                model_path=args.model)
+        print(f"search: best {run['params']} (cv MAE {run['cv_mae']:,.1f}), holdout {run['holdout']}")
+    print(f"Trained in {run['seconds']:.1f} s, model saved to {run['model_path']}")
+
+    if args.segments:
+        run = train_segment_models(training_set, segment_by=args.segments, holdout_weeks=args.holdout_weeks,
+                                   min_rows=args.min_segment_rows, n_jobs=args.n_jobs)
+        for key, entry in run["segments"].items():
+            print(f"  segment {key}: {entry['rows']:,} rows, holdout {entry['holdout']}")
+        if run["kept_global"]:
+            print(f"  global model kept for: {', '.join(map(str, run['kept_global']))}")
+        print(f"Segment models trained in {run['seconds']:.1f} s")
+    print("Run `python batch_cli.py export` to refresh the compiled models.")
+    return 0
+
+
+def _parity_sample(rows: int):
+    """Feature rows to check exported models on: the training set, else the cleaned forecasts."""
+    import pandas as pd
+    from services.training import TRAINING_SET_PATH, MODEL_FEATURES
+    from services.prediction_service import build_feature_matrix
+    from services.ingest_service import load_forecast_data
+
+    if os.path.exists(TRAINING_SET_PATH):
+        X = pd.read_parquet(TRAINING_SET_PATH, columns=MODEL_FEATURES)
+    else:
+        forecast_long = load_forecast_data()
+        if forecast_long is None:
+            return None
+        X = build_feature_matrix(forecast_long.fillna(0))
+    return X.sample(min(rows, len(X)), random_state=0) if len(X) else None
+
+
+def cmd_export(args) -> int:
+    from services.compiled_model import compile_model, compiled_path_for, check_parity, benchmark_latency
+    from services.model_registry import MANIFEST_PATH
+    from services.prediction_service import load_model
+
+    X = _parity_sample(args.check_rows)
+    if X is None:
+        print("No training set or forecast data to check the export against.")
+        return 1
+
+    paths = [args.model]
+    if os.path.exists(MANIFEST_PATH):
+        with open(MANIFEST_PATH) as f:
+            paths += [entry["path"] for entry in json.load(f).get("segments", {}).values()]
+
+    status = 0
+    for path in paths:
+        model = load_model(path, prefer_compiled=False)
+        if model is None:
+            print(f"{path}: not found, skipped")
+            continue
+        compiled = compile_model(model)
+        parity = check_parity(model, compiled, X)
+        if not parity["ok"]:
+            print(f"{path}: parity check FAILED ({parity['mismatches']} of {parity['rows']} rows, "
+                  f"max diff {parity['max_abs_diff']:.3g}); not exported")
+            status = 1
+            continue
+        compiled.save(compiled_path_for(path))
+        print(f"{path} -> {compiled_path_for(path)}: {compiled.n_trees} trees, depth {compiled.depth}, "
+              f"parity ok on {parity['rows']:,} rows (max diff {parity['max_abs_diff']:.3g})")
+        for row in benchmark_latency(model, compiled, X, repeat=args.repeat):
+            print(f"  {row['batch_rows']:>7,} rows: pickle {row['pickle_ms']:8.2f} ms, "
+                  f"compiled {row['compiled_ms']:8.2f} ms ({row['speedup']:.1f}x)")
+    return status
+
+
+def cmd_backtest(args) -> int:
+    from services.backtest import run_backtest, accuracy_by_plant, RESULTS_PATH
+
+    results = run_backtest(workers=args.workers, min_history_weeks=args.min_history_weeks,
+                           last_weeks=args.last_weeks, model_path=args.model,
+                           retrain=not args.deployed_model, rebuild=args.rebuild)
+    if results.empty:
+        print("Not enough merged history to backtest.")
+        return 1
+    weeks = results["Week"].nunique()
+    print(f"Backtested {weeks} weeks -> {RESULTS_PATH}")
+    if args.deployed_model:
+        print("IN-SAMPLE: the deployed model was trained on these weeks; "
+              "its accuracy below is optimistic. Drop --deployed-model for an out-of-sample backtest.")
+    columns = ["Plant", "Rows", "ModelMAE", "ForecastMAE", "ModelWAPE", "ForecastWAPE",
+               "ModelBiasPercent", "WeeksModelBetter"]
+    print(accuracy_by_plant(results)[columns].to_string(index=False))
+    _print_timings()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    from services.prediction_service import MODEL_PATH
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Ingest data/raw, merge, aggregate and predict")
+    run.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                     help="Processes for file parsing and threads for prediction (default: all cores)")
+    run.add_argument("--rebuild", action="store_true", help="Re-clean every raw file instead of reusing the stores")
+    mode = run.add_mutually_exclusive_group()
+    mode.add_argument("--out-of-core", action="store_true", help="Merge one week partition at a time")
+    mode.add_argument("--in-memory", action="store_true", help="Merge the full history in one DataFrame")
+    run.add_argument("--skip-predict", action="store_true", help="Do not run the AI model")
+    run.add_argument("--model", default=MODEL_PATH, help=f"Model file (default: {MODEL_PATH})")
+    run.set_defaults(func=cmd_run)
+
+    append = subparsers.add_parser("append", help="Clean and merge only newly arrived weeks onto the existing data")
+    append.add_argument("--forecast", nargs="*", default=[], help="New YPPMPL forecast files")
+    append.add_argument("--consumption", nargs="*", default=[], help="New or updated consumption files")
+    append.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Processes for file parsing (default: all cores)")
+    append.set_defaults(func=cmd_append)
+
+    train = subparsers.add_parser("train", help="Build the training set and (re)train the model")
+    train.add_argument("--incremental", action="store_true",
+                       help="Warm-start the existing model on new weeks only, without a search")
+    train.add_argument("--n-iter", type=int, default=20, help="Search candidates (default 20)")
+    train.add_argument("--n-jobs", type=int, default=-1, help="Parallel worker processes (default: all cores)")
+    train.add_argument("--cv-splits", type=int, default=3, help="Forward-chaining CV folds (default 3)")
+    train.add_argument("--holdout-weeks", type=int, default=2, help="Latest weeks held out for scoring")
+    train.add_argument("--extra-trees", type=int, default=50, help="Trees added per incremental run")
+    train.add_argument("--max-trees", type=int, default=800,
+                       help="Refit from scratch instead once the forest would exceed this many trees")
+    train.add_argument("--model", default=MODEL_PATH, help=f"Model file (default: {MODEL_PATH})")
+    train.add_argument("--segments", choices=["plant", "bu"],
+                       help="Also train one model per plant or business unit")
+    train.add_argument("--min-segment-rows", type=int, default=500,
+                       help="Smaller segments keep using the global model (default 500)")
+    train.set_defaults(func=cmd_train)
+
+    export = subparsers.add_parser("export", help="Export the trained models to the compiled NumPy form")
+    export.add_argument("--model", default=MODEL_PATH, help=f"Model file (default: {MODEL_PATH})")
+    export.add_argument("--check-rows", type=int, default=10_000, help="Rows for the parity check")
+    export.add_argument("--repeat", type=int, default=5, help="Latency benchmark repeats")
+    export.set_defaults(func=cmd_export)
+
+    backtest = subparsers.add_parser("backtest", help="Rolling-origin backtest of the model against the MRP forecast")
+    backtest.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                          help="Worker processes, one origin week each (default: all cores)")
+    backtest.add_argument("--min-history-weeks", type=int, default=4,
+                          help="Weeks of history before the first origin (default 4)")
+    backtest.add_argument("--last-weeks", type=int, help="Only backtest the latest N origin weeks")
+    backtest.add_argument("--deployed-model", action="store_true",
+                          help="Score the deployed model instead of refitting per origin (in-sample, faster)")
+    backtest.add_argument("--rebuild", action="store_true", help="Ignore cached week results")
+    backtest.add_argument("--model", default=MODEL_PATH, help=f"Model file (default: {MODEL_PATH})")
+    backtest.set_defaults(func=cmd_backtest)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    perf.start_run()
+    try:
+        return args.func(args)
+    finally:
+        perf.end_run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
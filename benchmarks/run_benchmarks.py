@@ -0,0 +1,211 @@
+# benchmarks/run_benchmarks.py
+"""
+Benchmark the ingest -> merge -> KPI pipeline on synthetic YPPMPL/MCSK data.
+
+    python -m benchmarks.run_benchmarks --scales small,medium
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/baseline.json
+
+Each stage is timed `--repeat` times and then run once more under
+tracemalloc for its peak memory. Results are written as JSON so two runs
+can be compared; --compare exits with status 1 when a stage regressed.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic_data import DEFAULT_PLANTS, generate_history
+from services.consumption_reader import normalize_consumption_chunk
+from services.data_service import merge_forecast_and_consumption, summarize_gap_by_plant
+from services.file_utils import clean_dataframe
+from services.forecast_cleaner import clean_yppmpl_file
+from services.kpi_service import calculate_kpis, get_worst_plants
+from services.preprocessing import create_features
+from services.prediction_service import generate_risk_explanation, explain_risk
+
+SCALES = {
+    "small": {"materials": 1_000, "weeks": 4, "buckets": 26},
+    "medium": {"materials": 10_000, "weeks": 8, "buckets": 26},
+    "large": {"materials": 40_000, "weeks": 12, "buckets": 52},
+}
+
+DEFAULT_OUTPUT = "benchmarks/results/latest.json"
+
+
+def measure(fn, repeat: int) -> dict:
+    """Time `fn` `repeat` times, then run it once under tracemalloc for peak memory."""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds_min": min(timings),
+        "seconds_median": statistics.median(timings),
+        "peak_mb": peak / 1e6,
+    }
+
+
+def clean_all_snapshots(snapshots) -> pd.DataFrame:
+    cleaned = [
+        clean_yppmpl_file(raw_df.copy(), week_str, week, year)
+        for week_str, week, year, raw_df in snapshots
+    ]
+    forecast_long = pd.concat(cleaned, ignore_index=True)
+    forecast_long["ForecastQty"] = pd.to_numeric(forecast_long["ForecastQty"], errors="coerce")
+    return forecast_long.dropna(subset=["ForecastQty"])
+
+
+def with_full_year_weeks(df: pd.DataFrame) -> pd.DataFrame:
+    """create_features expects W01-2024 style weeks."""
+    return df.assign(Week=df["Week"].str.replace(r"-(\d{2})$", r"-20\1", regex=True))
+
+
+def with_predictions(df: pd.DataFrame, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = df.copy()
+    df["Predicted_ConsumptionQty"] = df["ForecastQty"] * rng.uniform(0.2, 1.8, len(df))
+    df["Predicted_Gap"] = df["ForecastQty"] - df["Predicted_ConsumptionQty"]
+    df["Predicted_GapPercent"] = np.where(
+        df["ForecastQty"] != 0, df["Predicted_Gap"] / df["ForecastQty"] * 100, 0
+    )
+    return df
+
+
+def run_scale(name: str, materials: int, weeks: int, buckets: int, plants, repeat: int) -> list:
+    snapshots, mcsk_raw = generate_history(materials, weeks, plants, buckets)
+
+    forecast_long = clean_all_snapshots(snapshots)
+    consumption = normalize_consumption_chunk(mcsk_raw.copy())
+    merged = clean_dataframe(merge_forecast_and_consumption(forecast_long, consumption))
+    features_input = with_full_year_weeks(merged)
+    predicted = with_predictions(merged)
+
+    stages = [
+        ("clean_yppmpl_file", sum(len(raw) for *_, raw in snapshots),
+         lambda: clean_all_snapshots(snapshots)),
+        ("normalize_consumption", len(mcsk_raw),
+         lambda: normalize_consumption_chunk(mcsk_raw.copy())),
+        ("merge_forecast_and_consumption", len(merged),
+         lambda: merge_forecast_and_consumption(forecast_long, consumption)),
+        ("calculate_kpis", len(merged), lambda: calculate_kpis(merged)),
+        ("get_worst_plants", len(merged), lambda: get_worst_plants(merged)),
+        ("summarize_gap_by_plant", len(merged), lambda: summarize_gap_by_plant(merged)),
+        ("create_features", len(merged), lambda: create_features(features_input.copy())),
+        ("risk_explanation", len(predicted),
+         lambda: predicted.apply(generate_risk_explanation, axis=1)),
+        ("risk_explanation_vectorised", len(predicted), lambda: explain_risk(predicted)),
+    ]
+
+    results = []
+    for stage, rows, fn in stages:
+        result = {"scale": name, "stage": stage, "rows": rows, **measure(fn, repeat)}
+        print(f"{name:>8} {stage:<32} {rows:>10,} rows  "
+              f"{result['seconds_median'] * 1000:>10.1f} ms  {result['peak_mb']:>9.1f} MB")
+        results.append(result)
+    return results
+
+
+def compare(current: dict, baseline: dict, threshold: float, min_seconds: float = 0.005) -> list:
+    """List stages whose median time or peak memory grew by more than `threshold`."""
+    previous = {(r["scale"], r["stage"]): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = previous.get((result["scale"], result["stage"]))
+        if old is None:
+            continue
+        for metric, floor in [("seconds_median", min_seconds), ("peak_mb", 1.0)]:
+            before, after = old[metric], result[metric]
+            if after - before > floor and before > 0 and after / before > 1 + threshold:
+                regressions.append(
+                    f"{result['scale']}/{result['stage']} {metric}: "
+                    f"{before:.4g} -> {after:.4g} (+{(after / before - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="small,medium",
+                        help=f"Comma separated presets: {', '.join(SCALES)}, or 'custom'")
+    parser.add_argument("--materials", type=int, help="Materials for the custom scale")
+    parser.add_argument("--weeks", type=int, help="Weeks for the custom scale")
+    parser.add_argument("--buckets", type=int, default=26, help="MRP bucket columns for the custom scale")
+    parser.add_argument("--plants", default=",".join(DEFAULT_PLANTS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Relative slowdown treated as a regression (default 0.25)")
+    args = parser.parse_args(argv)
+
+    plants = [p.strip() for p in args.plants.split(",") if p.strip()]
+    scales = {}
+    for name in [s.strip() for s in args.scales.split(",") if s.strip()]:
+        if name == "custom":
+            if not (args.materials and args.weeks):
+                parser.error("the custom scale needs --materials and --weeks")
+            scales[name] = {"materials": args.materials, "weeks": args.weeks, "buckets": args.buckets}
+        elif name in SCALES:
+            scales[name] = SCALES[name]
+        else:
+            parser.error(f"unknown scale '{name}'")
+
+    results = []
+    for name, scale in scales.items():
+        results.extend(run_scale(name, scale["materials"], scale["weeks"], scale["buckets"], plants, args.repeat))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+            "plants": plants,
+            "scales": scales,
+        },
+        "results": results,
+    }
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print("Regressions:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+# benchmarks/synthetic_data.py
+import numpy as np
+import pandas as pd
+
+DEFAULT_PLANTS = ["YMO", "YMM", "YMM2", "YMK", "YMOK"]
+
+
+def _materials(n_materials: int) -> np.ndarray:
+    return np.array([f"M{i:07d}" for i in range(n_materials)])
+
+
+def _iso_weeks(first_week: int, year: int, n_weeks: int) -> list:
+    """(week, year) pairs, rolling over after week 52."""
+    weeks = []
+    week, yr = first_week, year
+    for _ in range(n_weeks):
+        weeks.append((week, yr))
+        week += 1
+        if week > 52:
+            week, yr = 1, yr + 1
+    return weeks
+
+
+def generate_yppmpl(
+    n_materials: int,
+    week: int,
+    year: int,
+    plants=DEFAULT_PLANTS,
+    n_buckets: int = 26,
+    seed: int = 0
+) -> pd.DataFrame:
+    """
+    One synthetic YPPMPL snapshot: every material in every plant, with MRP
+    BACKLOG/MRP, `n_buckets` weekly "MRP ww.yyyy" columns starting a few weeks
+    before the snapshot week, PO/SL columns and the preserved stock features.
+    """
+    rng = np.random.default_rng(seed + week * 1000 + year)
+    materials = _materials(n_materials)
+    n_rows = n_materials * len(plants)
+
+    df = pd.DataFrame({
+        "Material": np.tile(materials, len(plants)),
+        "Plant": np.repeat(plants, n_materials),
+        "Vendor": rng.integers(10000, 10100, n_rows).astype(str),
+        "WIP": rng.integers(0, 2000, n_rows),
+        "Stock": rng.integers(0, 5000, n_rows),
+        "MRP BACKLOG": rng.integers(0, 20000, n_rows),
+        "MRP": rng.integers(0, 1000, n_rows),
+        "Price from Info Record": rng.uniform(0.01, 50, n_rows).round(4),
+        "Price unit": rng.choice([1, 100, 1000], n_rows),
+        "Currency from Info Record": "EUR",
+        "Safety Stock": rng.integers(0, 8000, n_rows),
+    })
+
+    buckets = {}
+    for bucket_week, bucket_year in _iso_weeks(max(week - 4, 1), year, n_buckets):
+        label = f"{bucket_week:02d}.{bucket_year}"
+        buckets[f"MRP {label}"] = rng.integers(0, 3000, n_rows)
+        buckets[f"PO/SL {label}"] = rng.integers(0, 3000, n_rows)
+    return pd.concat([df, pd.DataFrame(buckets)], axis=1)
+
+
+def generate_mcsk(
+    n_materials: int,
+    weeks,
+    plants=DEFAULT_PLANTS,
+    seed: int = 0
+) -> pd.DataFrame:
+    """MCSK-style consumption rows with the raw "w.yyyy" week format."""
+    rng = np.random.default_rng(seed)
+    materials = _materials(n_materials)
+    n_per_week = n_materials * len(plants)
+    n_rows = n_per_week * len(weeks)
+
+    usage = rng.integers(0, 60000, n_rows)
+    return pd.DataFrame({
+        "Material": np.tile(np.tile(materials, len(plants)), len(weeks)),
+        "Plant": np.tile(np.repeat(plants, n_materials), len(weeks)),
+        "Week": np.repeat([f"{week}.{year}" for week, year in weeks], n_per_week),
+        "Tot. usage": usage,
+        "Tot.us.val": (usage * rng.uniform(0.01, 5, n_rows)).round(2),
+    })
+
+
+def generate_history(n_materials: int, n_weeks: int, plants=DEFAULT_PLANTS, n_buckets: int = 26,
+                     first_week: int = 1, year: int = 2024, seed: int = 0):
+    """
+    A list of (week_str, week, year, raw YPPMPL frame) snapshots plus the
+    matching raw MCSK frame, for `n_weeks` consecutive weeks.
+    """
+    weeks = _iso_weeks(first_week, year, n_weeks)
+    snapshots = [
+        (f"W{week:02d}-{str(yr)[-2:]}", week, yr,
+         generate_yppmpl(n_materials, week, yr, plants, n_buckets, seed))
+        for week, yr in weeks
+    ]
+    return snapshots, generate_mcsk(n_materials, weeks, plants, seed)
@@ -2,75 +2,102 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import os
-import joblib
 import glob
-import re
 from io import BytesIO
 
-from services.forecast_cleaner import clean_yppmpl_file
-from services.plot_service import plot_consumption_vs_forecast
-
-
-
-MODEL_PATH = "inventory_ai_api/model/inventory_model.pkl"
+from services.perf import span
+from services.ingest_service import FORECAST_STORE, load_forecast_data, append_forecast_files
+from services.workspace_service import upload_key
+from services.compiled_model import CompiledForest, compiled_path_for
+from services.figure_cache import cached_figure, data_version
+from services.scenario_service import TARGETS, SCOPES, run_scenarios, scenarios_from_table
+from services.model_registry import MANIFEST_PATH, SEGMENTS_DIR, load_registry
+from services.prediction_service import (
+    MODEL_PATH, PREDICTIONS_PATH, load_precomputed_predictions, predict_consumption
+)
 
 def show_ai_predictions_page(forecast_files, consumption_file):
     st.title("📦 AI Future Consumption Forecast (Supply Chain)")
 
-    model = load_model()
+    with span("ai.load_model"):
+        model = load_model(model_version())
     if model is None:
         st.error("❌ AI model file not found. Please make sure the model is properly trained and deployed.")
         return
+    if isinstance(model.global_model, CompiledForest):
+        st.caption(f"⚡ Compiled {model.global_model.source} ({model.global_model.n_trees} trees).")
+    if model.segment_models:
+        st.caption(f"🧩 Segment models ({model.segment_by}): {', '.join(model.segments)} — "
+                   "other plants use the global model.")
 
     handle_file_upload(forecast_files)
-    forecast_long = load_and_clean_forecast_data()
 
+    # Predictions precomputed by batch_cli.py are reused while they are newer
+    # than the forecast store and the models.
+    forecast_long = load_precomputed_predictions(newer_than=(FORECAST_STORE, MODEL_PATH, MANIFEST_PATH))
     if forecast_long is None:
-        st.warning("Please upload valid forecast files to proceed.")
-        return
-
-    forecast_long = clean_dataframe(forecast_long)
-    forecast_long.to_csv("data/merged/latest_forecast_only.csv", index=False)
-
-    feature_cols = ['ForecastQty', 'WIP', 'Stock', 'MRP BACKLOG', 
-                    'Price from Info Record', 'Price unit', 'Safety Stock']
-
-    for col in feature_cols:
-        if col not in forecast_long.columns:
-            forecast_long[col] = 0
-
-    X = forecast_long[feature_cols]
-    X = X.rename(columns={"ForecastQty": "Total_MRP"})
-
-    forecast_long['Predicted_ConsumptionQty'] = model.predict(X)
-    forecast_long['Predicted_Gap'] = forecast_long['ForecastQty'] - forecast_long['Predicted_ConsumptionQty']
-    forecast_long['Predicted_GapPercent'] = np.where(
-        forecast_long['ForecastQty'] != 0,
-        (forecast_long['Predicted_Gap'] / forecast_long['ForecastQty']) * 100,
-        0
-    )
-
-    forecast_long['Risk Explanation'] = forecast_long.apply(generate_risk_explanation, axis=1)
-
-    display_forecast_horizon(forecast_long)
-    display_kpis(forecast_long)
-    display_filters_and_table(forecast_long)
-    display_prediction_chart(forecast_long)
-    display_weekly_risk_summary(forecast_long)
-    export_prediction_data(forecast_long)
-
-@st.cache_resource
-def load_model():
-    if not os.path.exists(MODEL_PATH):
-        return None
-    return joblib.load(MODEL_PATH)
+        with span("ai.load_forecast"):
+            forecast_long = load_forecast_data()
+
+        if forecast_long is None:
+            st.warning("Please upload valid forecast files to proceed.")
+            return
+
+        forecast_long = clean_dataframe(forecast_long)
+        forecast_long.to_csv("data/merged/latest_forecast_only.csv", index=False)
+
+        with span("ai.predict", rows=len(forecast_long)):
+            forecast_long = predict_consumption(model, forecast_long)
+        forecast_long.to_parquet(PREDICTIONS_PATH, index=False)
+
+    with span("ai.kpis"):
+        display_forecast_horizon(forecast_long)
+        display_kpis(forecast_long)
+    with span("ai.table"):
+        display_filters_and_table(forecast_long)
+    with span("ai.chart"):
+        display_prediction_chart(forecast_long)
+    with span("ai.risk_summary"):
+        display_weekly_risk_summary(forecast_long)
+    display_scenarios(forecast_long, model)
+    with span("ai.export"):
+        export_prediction_data(forecast_long)
+
+def model_version() -> tuple:
+    """Modification times of every model file, so a retrain or export reloads the models."""
+    paths = [MODEL_PATH, compiled_path_for(MODEL_PATH), MANIFEST_PATH]
+    paths += sorted(glob.glob(os.path.join(SEGMENTS_DIR, "*")))
+    return data_version(*paths)
+
+
+@st.cache_resource(max_entries=1)
+def load_model(version: tuple):
+    """The global model plus any per-plant/BU segment models."""
+    return load_registry(MODEL_PATH, MANIFEST_PATH)
 
 
 def handle_file_upload(forecast_files):
-    if forecast_files:
-        for file in forecast_files:
-            with open(os.path.join("data/raw/forecast", file.name), "wb") as f:
-                f.write(file.getbuffer())
+    """
+    Save uploaded forecasts to data/raw and replace only their weeks in the
+    cleaned store (the predictions then go stale and are recomputed). Each
+    set of uploads is handled once, not on every rerun.
+    """
+    if not forecast_files:
+        return
+    key = upload_key(forecast_files)
+    if st.session_state.get("processed_forecast_uploads") == key:
+        return
+    paths = []
+    for file in forecast_files:
+        path = os.path.join("data/raw/forecast", file.name)
+        with open(path, "wb") as f:
+            f.write(file.getbuffer())
+        paths.append(path)
+    # Without a store, load_forecast_data() builds it from data/raw
+    if os.path.isdir(FORECAST_STORE):
+        with st.spinner("Adding the uploaded forecast week(s)..."), span("ai.append_forecast"):
+            append_forecast_files(paths)
+    st.session_state["processed_forecast_uploads"] = key
 
 def display_forecast_horizon(df):
     st.header("📅 Forecast Horizon Summary")
@@ -134,7 +161,12 @@ def display_filters_and_table(df):
 
 def display_prediction_chart(df):
     st.header("📈 Forecast vs Predicted Consumption Trend")
+    # predictions.parquet is rewritten whenever the predictions change
+    fig = cached_figure("ai_trend", data_version(PREDICTIONS_PATH), None, lambda: build_prediction_chart(df))
+    st.plotly_chart(fig, use_container_width=True)
 
+
+def build_prediction_chart(df):
     # Build compatible dataframe for plot
     plot_df = df.groupby("Week").agg({
         "ForecastQty": "sum",
@@ -148,7 +180,7 @@ def display_prediction_chart(df):
     fig.add_trace(go.Scatter(x=plot_df["Week"], y=plot_df["Predicted_ConsumptionQty"], mode='lines+markers', name='PredictedConsumption'))
 
     fig.update_layout(title="Forecast vs Predicted Consumption (Weekly)", xaxis_title="Week", yaxis_title="Quantity")
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
 
 def display_weekly_risk_summary(df):
@@ -162,6 +194,59 @@ def display_weekly_risk_summary(df):
 
     st.dataframe(summary, use_container_width=True)
 
+DEFAULT_SCENARIOS = pd.DataFrame([
+    {"Scenario": "YMM2 forecast -10%", "Target": "ForecastQty", "Scope": "Plant", "Value": "YMM2", "Factor": 0.9, "Set": None},
+    {"Scenario": "Safety stock x2", "Target": "Safety Stock", "Scope": "All", "Value": "", "Factor": 2.0, "Set": None},
+])
+
+
+def display_scenarios(df, model):
+    st.header("🧪 What-if Scenarios")
+    st.caption("One adjustment per row; rows sharing a scenario name are applied together. "
+               "Use Set instead of Factor to override a value.")
+    table = st.data_editor(
+        DEFAULT_SCENARIOS,
+        num_rows="dynamic",
+        use_container_width=True,
+        key="scenario_table",
+        column_config={
+            "Target": st.column_config.SelectboxColumn(options=list(TARGETS), required=True),
+            "Scope": st.column_config.SelectboxColumn(options=["All"] + list(SCOPES), required=True),
+            "Factor": st.column_config.NumberColumn(min_value=0.0, step=0.05),
+            "Set": st.column_config.NumberColumn(),
+        },
+    )
+    repredict = st.checkbox("Re-predict consumption with the model for each scenario (slower)", key="scenario_repredict")
+
+    if st.button("▶️ Run scenarios", key="scenario_run"):
+        try:
+            scenarios = scenarios_from_table(table)
+            with span("ai.scenarios", scenarios=len(scenarios), rows=len(df)):
+                st.session_state["scenario_results"] = {
+                    "version": data_version(PREDICTIONS_PATH),
+                    "results": run_scenarios(df, scenarios, model=model if repredict else None),
+                }
+        except ValueError as e:
+            st.error(f"❌ {e}")
+            return
+
+    # Results are only shown for the predictions they were computed from
+    stored = st.session_state.get("scenario_results")
+    if stored is None or stored["version"] != data_version(PREDICTIONS_PATH):
+        return
+    results = stored["results"]
+    kpis = results["kpis"].copy()
+    for col in ["ForecastQty", "Predicted_ConsumptionQty", "TotalGap", "AbsTotalGap", "TotalGapChange"]:
+        kpis[f"{col} (K)"] = (kpis.pop(col) / 1e3).round(2)
+    st.dataframe(kpis, use_container_width=True, hide_index=True)
+    st.dataframe(results["risks"], use_container_width=True, hide_index=True)
+
+    import plotly.express as px
+    fig = px.bar(results["by_plant"], x="Plant", y="GapPercent", color="Scenario", barmode="group",
+                 title="Predicted Gap % by Plant per Scenario")
+    st.plotly_chart(fig, use_container_width=True)
+
+
 def export_prediction_data(df):
     export_cols = ['Material', 'Plant', 'Week', 'ForecastQty', 'Predicted_ConsumptionQty', 'Predicted_Gap', 'Predicted_GapPercent', 'Risk Explanation']
     export_df = df[export_cols].copy()
@@ -175,30 +260,6 @@ def export_prediction_data(df):
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
 
-@st.cache_data
-def load_and_clean_forecast_data():
-    all_forecast_dfs = []
-    for forecast_path in glob.glob("data/raw/forecast/*.xlsx"):
-        with open(forecast_path, 'rb') as f:
-            raw_df = safe_read_file(f)
-        match = re.search(r"W(\d{2})-(\d{2})", os.path.basename(forecast_path))
-        if not match:
-            continue
-        current_week = int(match.group(1))
-        current_year = 2000 + int(match.group(2))
-        week_str = match.group(0)
-        cleaned_df = clean_yppmpl_file(raw_df, week_str, current_week, current_year)
-        all_forecast_dfs.append(cleaned_df)
-
-    if not all_forecast_dfs:
-        return None
-
-    forecast_long = pd.concat(all_forecast_dfs, ignore_index=True)
-    forecast_long['ForecastQty'] = pd.to_numeric(forecast_long['ForecastQty'], errors='coerce')
-    forecast_long = forecast_long.dropna(subset=['ForecastQty'])
-
-    return forecast_long
-
 def safe_read_file(uploaded_file):
     try:
         return pd.read_excel(uploaded_file, engine='openpyxl')
@@ -209,14 +270,3 @@ def safe_read_file(uploaded_file):
 def clean_dataframe(df):
     df = df.replace([np.inf, -np.inf], np.nan)
     return df.fillna(0)
-
-def generate_risk_explanation(row):
-    if abs(row.get('Predicted_GapPercent', 0)) < 50:
-        return "Low risk"
-    if row.get('MRP BACKLOG', 0) > 10000:
-        return "High backlog — supplier delays likely"
-    if row.get('WIP', 0) < 500 and row.get('Stock', 0) < 500:
-        return "Low WIP & Stock — supply shortage risk"
-    if row.get('Safety Stock', 0) > 5000 and row.get('Predicted_ConsumptionQty', 0) < (0.5 * row.get('ForecastQty', 1)):
-        return "Over-forecasting with high safety stock"
-    return "Forecast deviation — needs investigation"
@@ -1,26 +1,26 @@
 import streamlit as st
 import pandas as pd
-import os
 import re
 import numpy as np
 
-from services.OEM_project import OEMMapper
-
 from services.forecast_cleaner import clean_yppmpl_file,clean_yppmpl_file_cached
-from services.data_service import merge_forecast_and_consumption, summarize_gap_by_plant
 from services.plot_service import plot_gap_by_plant, plot_consumption_vs_forecast
-from services.kpi_service import calculate_kpis, get_worst_plants
+from services.engine import get_engine
+from services.perf import span
+from services.figure_cache import cached_figure
+from services.workspace_service import upload_key, load_workspace, save_workspace, evict_idle_workspaces
 
 def show_custom_dashboard_page():
     st.header("🧪 Custom Dashboard")
-    load_custom_dashboard_data()
-
-    if os.path.exists("data/custom/merged/latest.csv"):
-        custom_df = pd.read_csv("data/custom/merged/latest.csv")
+    with span("custom.process_uploads"):
+        custom_df = load_custom_dashboard_data()
 
+    if custom_df is not None:
         st.subheader("📊 Custom KPIs")
-        total_gap, abs_total_gap, average_deviation_percent = calculate_kpis(custom_df)
-        plant_over, plant_under = get_worst_plants(custom_df)
+        engine = get_engine()
+        with span("custom.kpis"):
+            total_gap, abs_total_gap, average_deviation_percent = engine.calculate_kpis(custom_df)
+            plant_over, plant_under = engine.get_worst_plants(custom_df)
 
         col1, col2, col3 = st.columns(3)
         col1.metric("Total Gap", f"{abs_total_gap:,}", delta=f"{'+' if total_gap >= 0 else '-'}{abs(total_gap):,}")
@@ -28,12 +28,15 @@ def show_custom_dashboard_page():
         col3.metric("Over/Under Forecast", f"⬆️ {plant_over} / ⬇️ {plant_under}")
 
         st.subheader("📉 Custom Deviation % by Plant")
-        gap_df = summarize_gap_by_plant(custom_df)
-        gap_df = gap_df.rename(columns={"RealQty": "ConsumptionQty"})
-        gap_df["GapPercent"] = ((gap_df["ForecastQty"] - gap_df["ConsumptionQty"]) / gap_df["ForecastQty"]) * 100
-        gap_df["GapPercent"] = gap_df["GapPercent"].round(2)
-        st.dataframe(gap_df, use_container_width=True)
-        st.plotly_chart(plot_gap_by_plant(gap_df), use_container_width=True)
+        with span("custom.plant_gap"):
+            gap_df = engine.summarize_gap_by_plant(custom_df)
+            gap_df = gap_df.rename(columns={"RealQty": "ConsumptionQty"})
+            gap_df["GapPercent"] = ((gap_df["ForecastQty"] - gap_df["ConsumptionQty"]) / gap_df["ForecastQty"]) * 100
+            gap_df["GapPercent"] = gap_df["GapPercent"].round(2)
+            st.dataframe(gap_df, use_container_width=True)
+            workspace = st.session_state["custom_workspace"]["key"]
+            fig = cached_figure("custom_gap_by_plant", workspace, None, lambda: plot_gap_by_plant(gap_df))
+            st.plotly_chart(fig, use_container_width=True)
 
         st.subheader("🔍 Custom Forecast vs Consumption")
         with st.expander("Filter Options"):
@@ -44,56 +47,89 @@ def show_custom_dashboard_page():
 
         plant_filter = None if selected_plant == "All" else selected_plant
         material_filter = None if selected_material == "All" else selected_material
-        st.plotly_chart(plot_consumption_vs_forecast(custom_df, plant_filter, material_filter), use_container_width=True)
+        with span("custom.chart"):
+            fig = cached_figure("custom_consumption_vs_forecast", workspace, (plant_filter, material_filter),
+                                lambda: plot_consumption_vs_forecast(custom_df, plant_filter, material_filter))
+            st.plotly_chart(fig, use_container_width=True)
 
 def load_custom_dashboard_data():
+    """
+    The merged frame for this session's uploads. Uploads are processed once per
+    distinct set of files (see services.workspace_service); reruns reuse the
+    session's copy and other sessions with the same files reuse the workspace.
+    """
     custom_forecast = st.file_uploader("📊 Upload Forecast File(s)", type=None, accept_multiple_files=True, key="custom_forecast")
     custom_consumption = st.file_uploader("📈 Upload Consumption File", type=None, key="custom_consumption")
 
-    if custom_forecast and custom_consumption:
-        all_forecast_dfs = []
-        for forecast_file in custom_forecast:
-            raw_df = safe_read_file(forecast_file)
-            forecast_path = os.path.join("data/custom/raw/forecast", forecast_file.name)
-            with open(forecast_path, "wb") as f:
-                f.write(forecast_file.getbuffer())
-
-            match = re.search(r"W(\d{2})-(\d{2})", forecast_file.name)
-            if not match:
-                st.warning(f"⚠️ Could not extract week from {forecast_file.name}")
-                continue
-            current_week = int(match.group(1))
-            current_year = 2000 + int(match.group(2))
-            week_str = match.group(0)
-            cleaned_df = clean_yppmpl_file_cached(raw_df, week_str, current_week, current_year)
-            all_forecast_dfs.append(cleaned_df)
-
-        forecast_df = pd.concat(all_forecast_dfs, ignore_index=True)
-        forecast_df["ForecastQty"] = pd.to_numeric(forecast_df["ForecastQty"], errors="coerce")
-        forecast_df = forecast_df.dropna(subset=["ForecastQty"])
-
-        cons_path = os.path.join("data/custom/raw/consumption", custom_consumption.name)
-        with open(cons_path, "wb") as f:
-            f.write(custom_consumption.getbuffer())
-
-        consumption_df = safe_read_file(custom_consumption)
-        usage_cols = ["ConsumptionQty", "RealQty", "Tot_usage", "Tot. usage", "Usage", "Real Usage"]
-        real_qty_col = next((col for col in consumption_df.columns if col in usage_cols), None)
-        if not real_qty_col:
-            st.error("❌ 'ConsumptionQty' column not found.")
-            return None
+    if not (custom_forecast and custom_consumption):
+        st.session_state.pop("custom_workspace", None)
+        return None
 
-        consumption_df = consumption_df.rename(columns={real_qty_col: "ConsumptionQty"})
-        consumption_df = consumption_df[["Material", "Plant", "Week", "ConsumptionQty"]]
-        consumption_df["Week"] = consumption_df["Week"].astype(str).apply(convert_week_format)
-        consumption_df["Material"] = consumption_df["Material"].astype(str).str.strip()
-        consumption_df["Plant"] = consumption_df["Plant"].astype(str).str.strip()
+    key = upload_key(list(custom_forecast) + [custom_consumption])
+    session_ws = st.session_state.get("custom_workspace")
+    if session_ws and session_ws["key"] == key:
+        return session_ws["df"]
 
-        merged_df = merge_forecast_and_consumption(forecast_df, consumption_df)
-        merged_df = clean_dataframe(merged_df)
-        merged_df.to_csv("data/custom/merged/latest.csv", index=False)
+    with span("custom.evict_workspaces"):
+        evict_idle_workspaces(keep=(key,))
+
+    stored = load_workspace(key)
+    if stored is not None:
+        merged_df, meta = stored
+    else:
+        merged_df = process_custom_uploads(custom_forecast, custom_consumption)
+        if merged_df is None:
+            return None
+        meta = {"forecast_files": [f.name for f in custom_forecast], "consumption_file": custom_consumption.name}
+        save_workspace(key, merged_df, meta)
         st.success("✅ Custom data processed.")
 
+    st.session_state["custom_workspace"] = {"key": key, "df": merged_df}
+    return merged_df
+
+
+def process_custom_uploads(custom_forecast, custom_consumption):
+    all_forecast_dfs = []
+    for forecast_file in custom_forecast:
+        match = re.search(r"W(\d{2})-(\d{2})", forecast_file.name)
+        if not match:
+            st.warning(f"⚠️ Could not extract week from {forecast_file.name}")
+            continue
+        raw_df = safe_read_file(forecast_file)
+        current_week = int(match.group(1))
+        current_year = 2000 + int(match.group(2))
+        week_str = match.group(0)
+        cleaned_df = clean_yppmpl_file_cached(raw_df, week_str, current_week, current_year)
+        all_forecast_dfs.append(cleaned_df)
+
+    if not all_forecast_dfs:
+        st.error("❌ None of the forecast files has a week (e.g. W05-24) in its name.")
+        return None
+
+    forecast_df = pd.concat(all_forecast_dfs, ignore_index=True)
+    forecast_df["ForecastQty"] = pd.to_numeric(forecast_df["ForecastQty"], errors="coerce")
+    forecast_df = forecast_df.dropna(subset=["ForecastQty"])
+
+    consumption_df = safe_read_file(custom_consumption)
+    usage_cols = ["ConsumptionQty", "RealQty", "Tot_usage", "Tot. usage", "Usage", "Real Usage"]
+    real_qty_col = next((col for col in consumption_df.columns if col in usage_cols), None)
+    if not real_qty_col:
+        st.error("❌ 'ConsumptionQty' column not found.")
+        return None
+
+    consumption_df = consumption_df.rename(columns={real_qty_col: "ConsumptionQty"})
+    consumption_df = consumption_df[["Material", "Plant", "Week", "ConsumptionQty"]]
+    consumption_df["Week"] = consumption_df["Week"].astype(str).apply(convert_week_format)
+    consumption_df["Material"] = consumption_df["Material"].astype(str).str.strip()
+    consumption_df["Plant"] = consumption_df["Plant"].astype(str).str.strip()
+
+    merged_df = get_engine().merge_forecast_and_consumption(forecast_df, consumption_df)
+    merged_df = clean_dataframe(merged_df)
+    # Same normalisation as the main merged file, so the frame round-trips through parquet
+    for col in merged_df.select_dtypes(include=['object']).columns:
+        merged_df[col] = merged_df[col].astype(str)
+    return merged_df
+
 def safe_read_file(uploaded_file):
     try:
         return pd.read_excel(uploaded_file, engine='openpyxl')
@@ -1,61 +1,348 @@
 # modules/explore_dashboard.py
-import re
 import streamlit as st
 import pandas as pd
 import numpy as np
 import os
-import glob
 
+from services.plot_service import plot_gap_by_plant, plot_consumption_vs_forecast, plot_forecast_evolution, plot_gap_by_group
+from services.data_service import merge_forecast_and_consumption_cached, summarize_gap_by_plant_cached
+from services.ingest_service import load_all_raw_data, ensure_cleaned_stores, reset_cleaned_stores
+from services.out_of_core import (
+    MERGED_STORE, AGGREGATES_PATH, run_out_of_core_merge, load_aggregates,
+    combine_gap_by_plant, combine_kpis, combine_worst_plants, combine_value_by_plant,
+    read_merged_weeks, list_merged_values
+)
+from services.parquet_store import remove_store
+from services.config import is_out_of_core, DATAFRAME_ENGINE, QUICK_LOOK_MIN_ROWS
+from services.engine import get_engine
+from services.perf import span
+from services.pipeline import finalize_merged, write_latest, merged_is_stale, can_append, run_append_step
+from services.workspace_service import upload_key
+from services.figure_cache import cached_figure, data_version
+from services.ranking_service import MaterialRanking, RANKING_METRICS
+from services.rollup_service import ROLLUP_LEVELS, rollup_gap
 from services.OEM_project import OEMMapper
-from services.forecast_cleaner import clean_yppmpl_file, clean_yppmpl_file_cached
-from services.plot_service import plot_gap_by_plant, plot_consumption_vs_forecast
-from services.kpi_service import calculate_kpis, get_worst_plants
-from services.data_service import merge_forecast_and_consumption_cached, summarize_gap_by_plant, summarize_gap_by_plant_cached
+from services.quick_look import quick_look_sample, estimate_kpis, estimate_gap_by_plant
+from services.series_store import SERIES_STORE, WEEKS_FILE, load_series_store
+from services.snapshot_store import SNAPSHOT_STORE, INDEX_FILE as SNAPSHOT_INDEX, load_snapshot_store
 
 def show_explore_page(forecast_files, consumption_file):
     # === FILE PROCESSING ===
-    # If new files uploaded, delete existing parquet to force regeneration
+    # New uploads are appended week by week onto the existing stores; without
+    # them the cleaned stores are deleted to force a full regeneration. Each
+    # set of uploads is handled once, not on every rerun.
     if forecast_files or consumption_file:
-        if os.path.exists("data/merged/forecast_cleaned.parquet"):
-            os.remove("data/merged/forecast_cleaned.parquet")
-        if os.path.exists("data/merged/consumption_cleaned.parquet"):
-            os.remove("data/merged/consumption_cleaned.parquet")
+        uploads = list(forecast_files or []) + ([consumption_file] if consumption_file else [])
+        key = upload_key(uploads)
+        if st.session_state.get("processed_uploads") != key:
+            process_uploads(forecast_files, consumption_file)
+            st.session_state["processed_uploads"] = key
+
+    if is_out_of_core():
+        show_out_of_core_view()
+        render_top_materials()
+        render_oem_rollup()
+        render_forecast_evolution()
+        render_footer()
+        return
+
+    # When the cleaned stores already exist, the quick look is drawn from them
+    # before the ingest and merge start.
+    quick_look_slot = st.empty()
+    shown = merged_is_stale() and render_quick_look(quick_look_slot)
+
+    with st.spinner("Loading and cleaning forecast and consumption files..."), span("explore.ingest"):
+        ensure_cleaned_stores()
+        # The merged partitions are reused until the cleaned stores change (new
+        # uploads or a batch_cli.py run), instead of being re-merged on every rerun.
+        stale = merged_is_stale()
+
+    if stale:
+        if not shown:
+            render_quick_look(quick_look_slot)
+        with st.spinner("Loading cleaned forecast and consumption data..."), span("explore.load_cleaned"):
+            forecast_long, mcsk_df = load_all_raw_data()
+    else:
+        forecast_long, mcsk_df = None, None
 
-    if forecast_files:
-        for file in forecast_files:
-            with open(os.path.join("data/raw/forecast", file.name), "wb") as f:
-                f.write(file.getbuffer())
+    if forecast_long is not None and mcsk_df is not None:
+        with st.spinner("Merging forecast and consumption data..."), span("explore.merge"):
+            merged_df = merge_forecast_and_consumption_cached(forecast_long, mcsk_df, DATAFRAME_ENGINE)
+            merged_df = finalize_merged(merged_df)
 
-    if consumption_file:
-        with open(os.path.join("data/raw/consumption", consumption_file.name), "wb") as f:
-            f.write(file.getbuffer())
+        with span("explore.write_merged"):
+            write_latest(merged_df)
+    # Exact figures replace the quick look below
+    quick_look_slot.empty()
 
-    with st.spinner("Loading and cleaning forecast and consumption files..."):
-        forecast_long, mcsk_df = load_all_raw_data()
 
-    if forecast_long is not None and mcsk_df is not None:
-        with st.spinner("Merging forecast and consumption data..."):
-            merged_df = merge_forecast_and_consumption_cached(forecast_long, mcsk_df)
-            merged_df = clean_dataframe(merged_df)
+    # === DISPLAY ===
+    # Read from the week partitions, which appends keep current
+    with span("explore.load_merged"):
+        merged_df = read_merged_weeks()
+    if merged_df.empty:
+        st.warning("No merged data available. Please upload forecast and consumption files.")
+        return
 
-            # Fix mixed types: force all object columns to str
-            for col in merged_df.select_dtypes(include=['object']).columns:
-                merged_df[col] = merged_df[col].astype(str)
+    selected_weeks = render_week_filter(merged_df["Week"].unique())
 
-            merged_df.to_csv("data/merged/latest.csv", index=False)
-            merged_df.to_parquet("data/merged/latest.parquet", index=False)
+    # Filter DataFrame based on week(s)
+    if selected_weeks is None:
+        filtered_df = merged_df.copy()
+    else:
+        filtered_df = merged_df[merged_df["Week"].isin(selected_weeks)]
 
+    # Use filtered_df instead of merged_df for all calculations
+    with span("explore.kpis"):
+        engine = get_engine()
+        total_gap, abs_total_gap, average_deviation_percent = engine.calculate_kpis(filtered_df)
+        plant_over, plant_under = engine.get_worst_plants(filtered_df)
 
-    # === DISPLAY ===
-    try:
-        merged_df = pd.read_parquet("data/merged/latest.parquet")
-    except FileNotFoundError:
+        # 💶 Total Value if available
         try:
-            merged_df = pd.read_csv("data/merged/latest.csv")
-        except FileNotFoundError:
+            filtered_df["Tot.us.val"] = pd.to_numeric(filtered_df["Tot.us.val"], errors="coerce")
+            total_value_eur = filtered_df["Tot.us.val"].sum()
+        except Exception:
+            total_value_eur = None
+
+        render_kpis(total_gap, abs_total_gap, average_deviation_percent, plant_over, plant_under, total_value_eur)
+
+    with span("explore.plant_gap"):
+        gap_df = summarize_gap_by_plant_cached(filtered_df, DATAFRAME_ENGINE)
+        money_by_plant = None
+        if "Tot.us.val" in filtered_df.columns:
+            money_by_plant = filtered_df.groupby("Plant")["Tot.us.val"].sum().reset_index()
+        render_gap_by_plant(gap_df, money_by_plant, data_version(AGGREGATES_PATH), selected_weeks)
+
+    st.subheader("🔍 Forecast vs Consumption")
+    with st.expander("Filter Options"):
+        plant_options = np.append(["All"], sorted(filtered_df["Plant"].unique()))
+        material_options = np.append(["All"], sorted(filtered_df["Material"].unique()))
+        selected_plant = st.selectbox("Select Plant", plant_options)
+        selected_material = st.selectbox("Select Material", material_options)
+
+    plant_filter = None if selected_plant == "All" else selected_plant
+    material_filter = None if selected_material == "All" else selected_material
+    with span("explore.chart"):
+        def build_chart():
+            chart_df = series_chart_data(material_filter, plant_filter, selected_weeks)
+            if chart_df is None:
+                chart_df = filtered_df
+            return plot_consumption_vs_forecast(chart_df, plant_filter, material_filter)
+
+        fig = cached_figure("consumption_vs_forecast", data_version(AGGREGATES_PATH),
+                            (selected_weeks, plant_filter, material_filter), build_chart)
+        st.plotly_chart(fig, use_container_width=True)
+
+    render_top_materials()
+    render_oem_rollup()
+    render_forecast_evolution()
+    render_footer()
+
+
+def process_uploads(forecast_files, consumption_file):
+    append = can_append()
+    if not append:
+        reset_cleaned_stores()
+        remove_store(MERGED_STORE)
+        remove_store(AGGREGATES_PATH)
+        remove_store(SERIES_STORE)
+
+    forecast_paths, consumption_paths = [], []
+    for file in forecast_files or []:
+        path = os.path.join("data/raw/forecast", file.name)
+        with open(path, "wb") as f:
+            f.write(file.getbuffer())
+        forecast_paths.append(path)
+
+    if consumption_file:
+        path = os.path.join("data/raw/consumption", consumption_file.name)
+        with open(path, "wb") as f:
+            f.write(consumption_file.getbuffer())
+        consumption_paths.append(path)
+
+    if append:
+        with st.spinner("Appending the new week(s) to the merged data..."), span("explore.append"):
+            appended = run_append_step(forecast_paths, consumption_paths)
+        if appended["weeks"]:
+            st.success(f"✅ Appended {', '.join(appended['weeks'])}.")
+        else:
+            st.info("No new or changed weeks in the uploaded files.")
+
+
+@st.cache_resource(max_entries=1)
+def load_series_store_cached(written: float):
+    return load_series_store()
+
+
+@st.cache_resource(max_entries=1)
+def load_material_ranking(written: float):
+    store = load_series_store()
+    return None if store is None else MaterialRanking(store)
+
+
+def render_top_materials():
+    """Top-K worst Material/Plant series for a plant and week range."""
+    weeks_path = os.path.join(SERIES_STORE, WEEKS_FILE)
+    if not os.path.exists(weeks_path):
+        return
+    ranking = load_material_ranking(os.path.getmtime(weeks_path))
+    if ranking is None or not ranking.weeks:
+        return
+
+    st.subheader("🏆 Worst Materials")
+    metrics = [m for m in RANKING_METRICS if m != "value_gap" or ranking.has_value]
+    col1, col2, col3, col4 = st.columns(4)
+    metric = col1.selectbox("Rank by", metrics, format_func=RANKING_METRICS.get, key="top_metric")
+    direction = col2.selectbox("Direction", ["both", "over", "under"],
+                               format_func={"both": "Largest gap", "over": "Over-forecast",
+                                            "under": "Under-forecast"}.get, key="top_direction")
+    plant = col3.selectbox("Plant", ["All"] + sorted(ranking.plant_rows), key="top_plant")
+    k = col4.number_input("Top K", min_value=5, max_value=500, value=50, step=5, key="top_k")
+    if len(ranking.weeks) > 1:
+        first_week, last_week = st.select_slider("Week range", options=ranking.weeks,
+                                                 value=(ranking.weeks[0], ranking.weeks[-1]), key="top_weeks")
+    else:
+        first_week = last_week = ranking.weeks[0]
+
+    with span("explore.top_materials"):
+        top_df = ranking.top_k(metric, int(k), None if plant == "All" else plant,
+                               first_week, last_week, direction=direction)
+    if top_df.empty:
+        st.info("No materials with data for this selection.")
+        return
+    st.dataframe(top_df, use_container_width=True, hide_index=True)
+
+
+@st.cache_resource(max_entries=1)
+def load_project_map(written: float):
+    return OEMMapper.project_map()
+
+
+def render_oem_rollup():
+    """Forecast gap by OEM and/or Project, from the series store and the cached project map."""
+    weeks_path = os.path.join(SERIES_STORE, WEEKS_FILE)
+    if not os.path.exists(weeks_path):
+        return
+    sources = [OEMMapper.PROJECT_MAP_CACHE, OEMMapper.ALL_PNS_PATH, OEMMapper.OEM_DETAILS_PATH]
+    written = max((os.path.getmtime(p) for p in sources if os.path.exists(p)), default=None)
+    if written is None:
+        return
+    try:
+        project_map = load_project_map(written)
+    except ValueError as e:
+        st.warning(f"⚠️ OEM/Project mapping could not be loaded: {e}")
+        return
+    ranking = load_material_ranking(os.path.getmtime(weeks_path))
+    if project_map is None or ranking is None or not ranking.weeks:
+        return
+
+    st.subheader("🏷️ Gap by OEM / Project")
+    col1, col2 = st.columns(2)
+    level = col1.selectbox("Group by", list(ROLLUP_LEVELS), key="rollup_level")
+    plant = col2.selectbox("Plant", ["All"] + sorted(ranking.plant_rows), key="rollup_plant")
+    if len(ranking.weeks) > 1:
+        first_week, last_week = st.select_slider("Week range", options=ranking.weeks,
+                                                 value=(ranking.weeks[0], ranking.weeks[-1]), key="rollup_weeks")
+    else:
+        first_week = last_week = ranking.weeks[0]
+
+    with span("explore.oem_rollup"):
+        rollup_df = rollup_gap(ranking, project_map, level, None if plant == "All" else plant,
+                               first_week, last_week)
+    if rollup_df.empty:
+        st.info("No materials with data for this selection.")
+        return
+    st.caption("A material's gap is split evenly across its projects; materials without a mapping are grouped as Unmapped.")
+    st.dataframe(rollup_df, use_container_width=True, hide_index=True)
+    fig = cached_figure("oem_rollup", data_version(weeks_path, *sources), (level, plant, first_week, last_week),
+                        lambda: plot_gap_by_group(rollup_df, ROLLUP_LEVELS[level]))
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def series_chart_data(material=None, plant=None, weeks=None):
+    """Weekly forecast/consumption from the series store (a row slice or column sums), or None."""
+    weeks_path = os.path.join(SERIES_STORE, WEEKS_FILE)
+    if not os.path.exists(weeks_path):
+        return None
+    store = load_series_store_cached(os.path.getmtime(weeks_path))
+    if store is None:
+        return None
+    chart_df = store.weekly(material, plant, weeks)
+    return chart_df.assign(Material=material or "", Plant=plant or "")
+
+
+def show_out_of_core_view():
+    """Explore view driven by week partitions and Week/Plant partial aggregates.
+
+    Nothing here loads the full merged history: KPIs and the plant table are
+    combined from the partial aggregates, and only the partitions needed for a
+    single-material chart are read.
+    """
+    aggregates = load_aggregates()
+    if aggregates is None:
+        quick_look_slot = st.empty()
+        shown = render_quick_look(quick_look_slot)
+        with st.spinner("Loading and cleaning forecast and consumption files..."), span("explore.ingest"):
+            has_forecast, has_consumption = ensure_cleaned_stores()
+        if not (has_forecast and has_consumption):
+            quick_look_slot.empty()
             st.warning("No merged data available. Please upload forecast and consumption files.")
             return
+        if not shown:
+            render_quick_look(quick_look_slot)
+        with st.spinner("Merging forecast and consumption data week by week..."):
+            aggregates = run_out_of_core_merge()
+        quick_look_slot.empty()
+
+    if aggregates.empty:
+        st.warning("No merged data available. Please upload forecast and consumption files.")
+        return
+
+    selected_weeks = render_week_filter(aggregates["Week"].unique())
+
+    with span("explore.kpis"):
+        total_gap, abs_total_gap, average_deviation_percent = combine_kpis(aggregates, selected_weeks)
+        plant_over, plant_under = combine_worst_plants(aggregates, selected_weeks)
+        money_by_plant = combine_value_by_plant(aggregates, selected_weeks)
+        total_value_eur = None if money_by_plant is None else money_by_plant["Tot.us.val"].sum()
+        render_kpis(total_gap, abs_total_gap, average_deviation_percent, plant_over, plant_under, total_value_eur)
+
+    with span("explore.plant_gap"):
+        render_gap_by_plant(combine_gap_by_plant(aggregates, selected_weeks), money_by_plant,
+                            data_version(AGGREGATES_PATH), selected_weeks)
+
+    selected_aggregates = aggregates if selected_weeks is None else aggregates[aggregates["Week"].isin(selected_weeks)]
 
+    st.subheader("🔍 Forecast vs Consumption")
+    with st.expander("Filter Options"):
+        plant_options = np.append(["All"], sorted(selected_aggregates["Plant"].unique()))
+        material_options = np.append(["All"], list_merged_values("Material", selected_weeks))
+        selected_plant = st.selectbox("Select Plant", plant_options)
+        selected_material = st.selectbox("Select Material", material_options)
+
+    plant_filter = None if selected_plant == "All" else selected_plant
+    material_filter = None if selected_material == "All" else selected_material
+    with span("explore.chart"):
+        def build_chart():
+            chart_df = series_chart_data(material_filter, plant_filter, selected_weeks)
+            if chart_df is None and material_filter is None:
+                chart_df = selected_aggregates
+            elif chart_df is None:
+                chart_df = read_merged_weeks(
+                    selected_weeks,
+                    columns=["Material", "Plant", "Week", "ForecastQty", "ConsumptionQty"],
+                    material=material_filter
+                )
+            return plot_consumption_vs_forecast(chart_df, plant_filter, material_filter)
+
+        fig = cached_figure("consumption_vs_forecast", data_version(AGGREGATES_PATH),
+                            (selected_weeks, plant_filter, material_filter), build_chart)
+        st.plotly_chart(fig, use_container_width=True)
+
+
+def render_week_filter(weeks):
+    """Draw the week filter and return the selected Week keys, or None for all weeks."""
     # Add week filter at the top of the main page
     from collections import defaultdict
 
@@ -63,7 +350,7 @@ def show_explore_page(forecast_files, consumption_file):
 
     # Group available weeks by year for better UX
     week_groups = defaultdict(list)
-    for week in sorted(merged_df["Week"].unique(), key=lambda x: (int(x.split('W')[1].split('-')[0]), int(x.split('-')[1]))):
+    for week in sorted(weeks, key=lambda x: (int(x.split('W')[1].split('-')[0]), int(x.split('-')[1]))):
         week_num, year = week.split('-')
         week_groups[year].append(f"{week_num}-{year}")
 
@@ -79,27 +366,60 @@ def show_explore_page(forecast_files, consumption_file):
             key="week_filter_multi"
         )
 
-    # Filter DataFrame based on week(s)
     if "All Weeks" in selected_weeks or not selected_weeks:
-        filtered_df = merged_df.copy()
-    else:
-        formatted_weeks = [f"W{w}" for w in selected_weeks]
-        filtered_df = merged_df[merged_df["Week"].isin(formatted_weeks)]
+        return None
+    return [f"W{w}" for w in selected_weeks]
+
+
+def render_quick_look(slot) -> bool:
+    """
+    Sampled KPIs and plant gaps with 95% bounds, drawn into `slot` while the
+    full merge runs; the caller empties the slot once exact figures exist.
+    Returns False when nothing was drawn (no stores yet, or too few rows).
+    """
+    with span("explore.quick_look"):
+        # Small histories merge quickly: skip before reading anything
+        units = quick_look_sample(min_rows=QUICK_LOOK_MIN_ROWS)
+        if units is None:
+            return False
+        kpis = estimate_kpis(units)
+        gap_df = estimate_gap_by_plant(units)
+
+    with slot.container():
+        st.markdown("## ⚡ Quick Look")
+        st.caption(
+            f"Estimated from a stratified sample of {kpis['sample_rows']:,} of "
+            f"{kpis['population_rows']:,} forecast rows (per Plant/Week), with 95% bounds. "
+            "Exact figures replace these when the full merge finishes."
+        )
+        low, high = kpis["total_gap_bounds"]
+        col1, col2 = st.columns(2)
+        col1.metric(
+            label="📉 Total Gap (Qty, est.)",
+            value=f"{kpis['abs_total_gap']/1e6:,.2f} M",
+            help=f"95% bounds: {low/1e6:,.2f} M to {high/1e6:,.2f} M"
+        )
+        dev_low, dev_high = kpis["average_deviation_bounds"]
+        col2.metric(
+            label="📊 Avg Deviation % (est.)",
+            value=f"{kpis['average_deviation_percent']:.2f}%",
+            help=f"95% bounds: {dev_low:.2f}% to {dev_high:.2f}%"
+        )
+        st.caption(f"Total gap {low/1e6:,.2f} M – {high/1e6:,.2f} M · "
+                   f"Avg deviation {dev_low:.2f}% – {dev_high:.2f}%")
+        gap_df["ForecastQty (M)"] = (gap_df["ForecastQty"] / 1e6).round(2)
+        gap_df["ConsumptionQty (M)"] = (gap_df["ConsumptionQty"] / 1e6).round(2)
+        st.dataframe(
+            gap_df[["Plant", "ForecastQty (M)", "ConsumptionQty (M)", "GapPercent", "GapPercentLow", "GapPercentHigh"]],
+            use_container_width=True
+        )
+    return True
 
+
+def render_kpis(total_gap, abs_total_gap, average_deviation_percent, plant_over, plant_under, total_value_eur):
     st.markdown("## 🧮 Key Performance Indicators")
     st.markdown("---")
 
-    # Use filtered_df instead of merged_df for all calculations
-    total_gap, abs_total_gap, average_deviation_percent = calculate_kpis(filtered_df)
-    plant_over, plant_under = get_worst_plants(filtered_df)
-
-    # 💶 Total Value if available
-    try:
-        filtered_df["Tot.us.val"] = pd.to_numeric(filtered_df["Tot.us.val"], errors="coerce")
-        total_value_eur = filtered_df["Tot.us.val"].sum()
-    except Exception:
-        total_value_eur = None
-
     col1, col2, col3, col4 = st.columns(4)
 
     col1.metric(
@@ -130,8 +450,10 @@ def show_explore_page(forecast_files, consumption_file):
             help="Total monetary value of consumption."
         )
 
+
+def render_gap_by_plant(gap_df, money_by_plant=None, version=None, selection=None):
+    """Plant table and chart; with a data `version` the chart comes from the figure cache."""
     st.subheader("📉 Deviation % by Plant")
-    gap_df = summarize_gap_by_plant_cached(filtered_df)
     gap_df = gap_df.rename(columns={"RealQty": "ConsumptionQty"})
     gap_df["GapPercent"] = ((gap_df["ForecastQty"] - gap_df["ConsumptionQty"]) / gap_df["ForecastQty"])
     gap_df["GapPercent"] = gap_df["GapPercent"].round(2)
@@ -140,9 +462,8 @@ def show_explore_page(forecast_files, consumption_file):
     gap_df["ForecastQty (M)"] = (gap_df["ForecastQty"] / 1e6).round(2)
     gap_df["ConsumptionQty (M)"] = (gap_df["ConsumptionQty"] / 1e6).round(2)
 
-    if "Tot.us.val" in filtered_df.columns:
-        money_by_plant = filtered_df.groupby("Plant")["Tot.us.val"].sum().reset_index()
-        money_by_plant.rename(columns={"Tot.us.val": "Consumption Value (M EUR)"}, inplace=True)
+    if money_by_plant is not None:
+        money_by_plant = money_by_plant.rename(columns={"Tot.us.val": "Consumption Value (M EUR)"})
         money_by_plant["Consumption Value (M EUR)"] = (money_by_plant["Consumption Value (M EUR)"] / 1e6).round(2)
         gap_df = gap_df.merge(money_by_plant, on="Plant", how="left")
 
@@ -152,20 +473,55 @@ def show_explore_page(forecast_files, consumption_file):
         display_cols.append("Consumption Value (M EUR)")
 
     st.dataframe(gap_df[display_cols], use_container_width=True)
-    st.plotly_chart(plot_gap_by_plant(gap_df), use_container_width=True)
-
-    st.subheader("🔍 Forecast vs Consumption")
-    with st.expander("Filter Options"):
-        plant_options = np.append(["All"], sorted(filtered_df["Plant"].unique()))
-        material_options = np.append(["All"], sorted(filtered_df["Material"].unique()))
-        selected_plant = st.selectbox("Select Plant", plant_options)
-        selected_material = st.selectbox("Select Material", material_options)
-
-    plant_filter = None if selected_plant == "All" else selected_plant
-    material_filter = None if selected_material == "All" else selected_material
-    st.plotly_chart(plot_consumption_vs_forecast(filtered_df, plant_filter, material_filter), use_container_width=True)
-
-        # Add vertical spacer to push button to bottom visually
+    if version is None:
+        fig = plot_gap_by_plant(gap_df)
+    else:
+        fig = cached_figure("gap_by_plant", version, selection, lambda: plot_gap_by_plant(gap_df))
+    st.plotly_chart(fig, use_container_width=True)
+
+
+@st.cache_resource(max_entries=1)
+def load_snapshot_store_cached(written: float):
+    return load_snapshot_store()
+
+
+def render_forecast_evolution():
+    """How the forecast for one target week changed from snapshot to snapshot."""
+    index_path = os.path.join(SNAPSHOT_STORE, SNAPSHOT_INDEX)
+    if not os.path.exists(index_path):
+        return
+    store = load_snapshot_store_cached(os.path.getmtime(index_path))
+    if store is None or len(store.weeks) < 2:
+        return
+
+    st.subheader("🕰️ Forecast Evolution")
+    with st.expander("Evolution Options"):
+        target_weeks = store.target_weeks()
+        target_week = st.selectbox("Target week (MRP bucket)", target_weeks,
+                                   index=len(target_weeks) // 2, key="evolution_target")
+        plants = ["All"] + sorted(store.keys["Plant"].unique())
+        plant = st.selectbox("Plant", plants, key="evolution_plant")
+        material = st.text_input("Material (optional)", key="evolution_material").strip()
+
+    with span("explore.forecast_evolution"):
+        def build_chart():
+            evolution = store.forecast_evolution(
+                target_week,
+                material=material or None,
+                plant=None if plant == "All" else plant
+            )
+            return None if evolution.empty else plot_forecast_evolution(evolution)
+
+        fig = cached_figure("forecast_evolution", data_version(index_path),
+                            (target_week, plant, material), build_chart)
+    if fig is None:
+        st.info("No snapshot forecasts this target week for the selection.")
+        return
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def render_footer():
+    # Add vertical spacer to push button to bottom visually
     st.markdown("<br><br><br><br>", unsafe_allow_html=True)
 
     # Centered, styled button using st.button inside a centered container
@@ -200,65 +556,4 @@ def safe_read_file(uploaded_file):
 
 def clean_dataframe(df):
     df = df.replace([np.inf, -np.inf], np.nan)
-    return df.fillna(0)
-
-def load_all_raw_data():
-    forecast_parquet = "data/merged/forecast_cleaned.parquet"
-    consumption_parquet = "data/merged/consumption_cleaned.parquet"
-
-    # === Forecast Data ===
-    if os.path.exists(forecast_parquet):
-        forecast_long = pd.read_parquet(forecast_parquet)
-    else:
-        all_forecast_dfs = []
-        for forecast_path in glob.glob("data/raw/forecast/*.xlsx"):
-            with open(forecast_path, 'rb') as f:
-                raw_df = safe_read_file(f)
-            match = re.search(r"W(\d{2})-(\d{2})", os.path.basename(forecast_path))
-            if not match:
-                continue
-            current_week = int(match.group(1))
-            current_year = 2000 + int(match.group(2))
-            week_str = match.group(0)
-            cleaned_df = clean_yppmpl_file_cached(raw_df, week_str, current_week, current_year)
-            all_forecast_dfs.append(cleaned_df)
-
-        if not all_forecast_dfs:
-            return None, None
-
-        forecast_long = pd.concat(all_forecast_dfs, ignore_index=True)
-        forecast_long["ForecastQty"] = pd.to_numeric(forecast_long["ForecastQty"], errors="coerce")
-        forecast_long = forecast_long.dropna(subset=["ForecastQty"])
-
-        forecast_long.to_parquet(forecast_parquet, index=False)
-
-    # === Consumption Data ===
-    if os.path.exists(consumption_parquet):
-        mcsk_df = pd.read_parquet(consumption_parquet)
-    else:
-        consumption_paths = glob.glob("data/raw/consumption/*.xlsx")
-        if not consumption_paths:
-            return forecast_long, None
-        cons_file = consumption_paths[0]
-        with open(cons_file, 'rb') as f:
-            mcsk_df = safe_read_file(f)
-        usage_cols = ["ConsumptionQty", "RealQty", "Tot_usage", "Tot. usage", "Usage", "Real Usage"]
-        real_qty_col = next((col for col in mcsk_df.columns if col in usage_cols), None)
-        if not real_qty_col:
-            return forecast_long, None
-
-        mcsk_df = mcsk_df.rename(columns={real_qty_col: "ConsumptionQty"})
-        columns_to_keep = ["Material", "Plant", "Week", "ConsumptionQty", "Tot.us.val"]
-        mcsk_df = mcsk_df[[col for col in columns_to_keep if col in mcsk_df.columns]]
-        mcsk_df["Week"] = mcsk_df["Week"].astype(str).apply(convert_week_format)
-        mcsk_df["Material"] = mcsk_df["Material"].astype(str).str.strip()
-        mcsk_df["Plant"] = mcsk_df["Plant"].astype(str).str.strip()
-
-        # Ensure numeric columns are numeric
-        mcsk_df["ConsumptionQty"] = pd.to_numeric(mcsk_df["ConsumptionQty"], errors="coerce")
-        if "Tot.us.val" in mcsk_df.columns:
-            mcsk_df["Tot.us.val"] = pd.to_numeric(mcsk_df["Tot.us.val"], errors="coerce")
-
-        mcsk_df.to_parquet(consumption_parquet, index=False)
-
-    return forecast_long, mcsk_df
+    return df.fillna(0)
\ No newline at end of file
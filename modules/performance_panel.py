@@ -0,0 +1,46 @@
+# modules/performance_panel.py
+import json
+import time
+import pandas as pd
+import streamlit as st
+
+from services import perf
+from services.figure_cache import FIGURE_CACHE
+
+
+def show_performance_panel():
+    """Sidebar panel with the spans recorded during the current rerun."""
+    spans = perf.get_spans()
+    with st.expander("⏱️ Performance", expanded=True):
+        st.caption(f"Rerun time: {perf.run_seconds() * 1000:,.0f} ms · {len(spans)} spans")
+        if perf.startup_seconds() is not None:
+            st.caption(f"Cold start (first render): {perf.startup_seconds() * 1000:,.0f} ms")
+        cache = FIGURE_CACHE.stats()
+        if cache["hit_rate"] is not None:
+            st.caption(
+                f"Figure cache: {cache['hit_rate'] * 100:.0f}% hits ({cache['hits']}/{cache['hits'] + cache['misses']}) · "
+                f"{cache['entries']}/{cache['max_entries']} figures · {cache['evictions']} evicted"
+            )
+
+        if not spans:
+            st.info("No instrumented steps ran on this rerun.")
+            return
+
+        summary = pd.DataFrame(perf.summarize_spans(spans))
+        summary["total ms"] = (summary["total_s"] * 1000).round(1)
+        summary["max ms"] = (summary["max_s"] * 1000).round(1)
+        columns = ["name", "calls", "total ms", "max ms"]
+        if summary["peak_mb"].notna().any():
+            summary["peak MB"] = summary["peak_mb"].round(2)
+            columns.append("peak MB")
+        st.dataframe(summary[columns], use_container_width=True, hide_index=True)
+
+        st.download_button(
+            label="📥 Download trace",
+            data=json.dumps(perf.to_chrome_trace(spans)),
+            file_name=f"trace_{time.strftime('%Y%m%d_%H%M%S')}.json",
+            mime="application/json",
+            help="Chrome trace-event format: open in chrome://tracing or ui.perfetto.dev"
+        )
+        if st.button("Save trace to data/perf", type="secondary"):
+            st.success(f"Trace written to {perf.export_trace(spans=spans)}")
@@ -1,4 +1,6 @@
 # services/OEM_project.py
+import itertools
+import numpy as np
 import pandas as pd
 import os
 from typing import List, Dict, Optional
@@ -15,24 +17,37 @@ class OEMMapper:
         'YMOK': 'MA14'
     }
 
+    # Workbooks behind load_project_oem_mappings and the parquet cache of the project map
+    ALL_PNS_PATH = "data/project_mapping/All PNs with project & OEM.xlsx"
+    OEM_DETAILS_PATH = "data/project_mapping/PN with Project & OEM.xlsx"
+    PROJECT_MAP_CACHE = "data/project_mapping/project_map.parquet"
+
+    @staticmethod
+    def _explode_split(df: pd.DataFrame, column: str, sep: str) -> pd.DataFrame:
+        """
+        One row per `sep`-separated part of `column`, without per-row Python:
+        the split lists are flattened into one array and the other columns
+        are repeated by each row's part count. Non-string values are dropped.
+        """
+        parts = df[column].str.split(sep)
+        valid = parts.notna().to_numpy()
+        counts = np.zeros(len(df), dtype=np.int64)
+        counts[valid] = parts[valid].str.len().to_numpy()
+        flat = np.fromiter(itertools.chain.from_iterable(parts[valid]), dtype=object, count=int(counts.sum()))
+        exploded = df.iloc[np.repeat(np.arange(len(df)), counts)].copy()
+        exploded[column] = pd.Series(flat, index=exploded.index, dtype=object).str.strip()
+        return exploded
+
     @classmethod
     def _explode_combined_plants(cls, df: pd.DataFrame) -> pd.DataFrame:
         """Handle plants separated by / (creates multiple rows)"""
         if 'Plants' not in df.columns:
             return df
-            
-        # Split and explode plants
-        df['Plants'] = df['Plants'].str.split('/')
-        df = df.explode('Plants')
-        
+
+        df = cls._explode_split(df, 'Plants', '/')
+
         # Clean plant codes
-        df['Plants'] = (
-            df['Plants']
-            .str.strip()
-            .str.upper()
-            .replace(['', 'NAN', 'NONE'], pd.NA)
-        )
-        
+        df['Plants'] = df['Plants'].str.upper().replace(['', 'NAN', 'NONE'], pd.NA)
         return df.dropna(subset=['Plants'])
 
     @classmethod
@@ -40,17 +55,9 @@ class OEMMapper:
         """Handle projects separated by ; (creates multiple rows)"""
         if 'Project' not in df.columns:
             return df
-            
-        # Split and clean projects
-        df['Project'] = (
-            df['Project']
-            .str.split(';')
-            .apply(lambda x: [p.strip() for p in x if p.strip()] if isinstance(x, list) else x)
-        )
-        
-        # Explode into multiple rows
-        df = df.explode('Project')
-        return df.dropna(subset=['Project'])
+
+        df = cls._explode_split(df, 'Project', ';')
+        return df[df['Project'].ne('')]
 
     @classmethod
     def load_project_oem_mappings(cls) -> pd.DataFrame:
@@ -58,7 +65,7 @@ class OEMMapper:
         try:
             # Load All PNs file
             all_pns = pd.read_excel(
-                "data/project_mapping/All PNs with project & OEM.xlsx",
+                cls.ALL_PNS_PATH,
                 dtype={'Material': str}
             ).rename(columns=lambda x: 'Project' if 'project' in str(x).lower() else x)
             
@@ -70,7 +77,7 @@ class OEMMapper:
             
             # Load detailed OEM file
             oem_details = pd.read_excel(
-                "data/project_mapping/PN with Project & OEM.xlsx",
+                cls.OEM_DETAILS_PATH,
                 dtype={'Material': str}
             ).rename(columns={
                 'Plant': 'Plants',
@@ -106,6 +113,38 @@ class OEMMapper:
             """
             raise ValueError(error_msg)
 
+    @classmethod
+    def project_map(cls, cache_path: str = None) -> Optional[pd.DataFrame]:
+        """
+        Material, Plant, BusinessUnit, Project and OEM, one row per
+        Material/Plant/Project. Read from the parquet cache while it is newer
+        than both workbooks; None when neither the workbooks nor a cache exist.
+        """
+        cache_path = cache_path or cls.PROJECT_MAP_CACHE
+        sources = [cls.ALL_PNS_PATH, cls.OEM_DETAILS_PATH]
+        if os.path.exists(cache_path):
+            written = os.path.getmtime(cache_path)
+            if all(not os.path.exists(p) or os.path.getmtime(p) <= written for p in sources):
+                return pd.read_parquet(cache_path)
+        if not all(os.path.exists(p) for p in sources):
+            return None
+
+        mappings = cls.load_project_oem_mappings()
+        oem_col = next((c for c in ['OEM', 'OEM_detail'] if c in mappings.columns), None)
+        if oem_col is None:
+            oem_col = next((c for c in mappings.columns if 'oem' in str(c).lower()), None)
+        project_map = pd.DataFrame({
+            'Material': mappings['Material'].astype(str),
+            'Plant': mappings['Plants'].astype(str),
+            'BusinessUnit': mappings['BusinessUnit'].astype(str),
+            'Project': mappings['Project'].astype(str),
+            'OEM': mappings[oem_col].fillna('Unknown').astype(str).str.strip() if oem_col else 'Unknown',
+        })
+        project_map = project_map.drop_duplicates(['Material', 'Plant', 'Project']).reset_index(drop=True)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        project_map.to_parquet(cache_path, index=False)
+        return project_map
+
     @classmethod
     def get_plant_bu_mapping(cls, plant_code: str) -> str:
         """Safe lookup with combined plant handling"""
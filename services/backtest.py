@@ -0,0 +1,245 @@
+# services/backtest.py
+"""
+Rolling-origin backtest of the consumption model against the raw MRP forecast.
+
+For every origin week t the merged history up to t goes through
+create_features (via training.build_training_set), the model predicts the
+rows of week t and both the prediction and the MRP forecast are scored
+against the actual ConsumptionQty, per plant. Weeks run in parallel worker
+processes, each reading only the weeks it needs from the merged data.
+
+Results are cached per week under data/backtest/cache/<model key>/ together
+with a fingerprint of the history files they were computed from, so a rerun
+after a new week lands only computes that week and reads nothing for the
+cached ones.
+"""
+import glob
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from services.file_utils import week_sort_key
+from services.out_of_core import MERGED_STORE
+from services.parquet_store import list_partitions, read_store
+from services.pipeline import LATEST_PARQUET
+from services.prediction_service import MODEL_PATH
+from services.perf import timed
+
+BACKTEST_DIR = "data/backtest"
+CACHE_DIR = os.path.join(BACKTEST_DIR, "cache")
+RESULTS_PATH = os.path.join(BACKTEST_DIR, "results.parquet")
+
+# create_features looks back one week for the lag and three for the rolling mean
+FEATURE_LOOKBACK_WEEKS = 3
+
+RESULT_COLUMNS = [
+    "Week", "Plant", "Rows", "ActualQty", "ForecastQty", "PredictedQty",
+    "ModelAbsError", "ForecastAbsError", "ModelError",
+]
+
+
+def history_weeks(merged_root: str = MERGED_STORE, latest_path: str = LATEST_PARQUET) -> list:
+    """Weeks of the merged history in chronological order."""
+    if os.path.isdir(merged_root):
+        weeks = list_partitions(merged_root)
+    elif os.path.exists(latest_path):
+        weeks = pd.read_parquet(latest_path, columns=["Week"])["Week"].unique().tolist()
+    else:
+        weeks = []
+    return sorted(weeks, key=week_sort_key)
+
+
+def read_history(weeks: list, merged_root: str = MERGED_STORE, latest_path: str = LATEST_PARQUET) -> pd.DataFrame:
+    if os.path.isdir(merged_root):
+        return read_store(merged_root, keys=weeks)
+    return pd.read_parquet(latest_path, filters=[("Week", "in", list(weeks))])
+
+
+def model_key(model_path: str = MODEL_PATH, retrain_params: dict = None) -> str:
+    """Cache namespace: the model files' versions, or the retrain parameters."""
+    if retrain_params is not None:
+        digest = hashlib.sha1(json.dumps(retrain_params, sort_keys=True, default=str).encode()).hexdigest()
+        return f"retrain-{digest[:12]}"
+    from services.compiled_model import compiled_path_for
+    from services.model_registry import MANIFEST_PATH
+    parts = []
+    for path in (model_path, compiled_path_for(model_path), MANIFEST_PATH):
+        if os.path.exists(path):
+            stat = os.stat(path)
+            parts.append(f"{os.path.basename(path)}:{stat.st_mtime_ns}:{stat.st_size}")
+    return "model-" + hashlib.sha1("|".join(parts).encode()).hexdigest()[:12]
+
+
+def history_fingerprint(weeks: list, merged_root: str = MERGED_STORE, latest_path: str = LATEST_PARQUET) -> list:
+    """
+    Names, sizes and modification times of the files holding `weeks`, so a
+    cached week is checked without reading any data. Any rewrite of those
+    files, including a correction that keeps the totals, invalidates it.
+    """
+    if os.path.isdir(merged_root):
+        paths = [path for week in weeks
+                 for path in sorted(glob.glob(os.path.join(merged_root, str(week), "part-*.parquet")))]
+    else:
+        paths = [latest_path]
+    fingerprint = []
+    for path in paths:
+        stat = os.stat(path)
+        fingerprint.append([os.path.relpath(path, merged_root), stat.st_mtime_ns, stat.st_size])
+    return fingerprint
+
+
+def score_week(test: pd.DataFrame, predicted: np.ndarray) -> pd.DataFrame:
+    """Per-plant sums for one origin week; ratios are formed after summing."""
+    actual = test["ConsumptionQty"].to_numpy(dtype=float)
+    forecast = test["Total_MRP"].to_numpy(dtype=float)
+    scored = pd.DataFrame({
+        "Week": test["Week"].to_numpy(),
+        "Plant": test["Plant"].to_numpy(),
+        "Rows": 1,
+        "ActualQty": actual,
+        "ForecastQty": forecast,
+        "PredictedQty": predicted,
+        "ModelAbsError": np.abs(predicted - actual),
+        "ForecastAbsError": np.abs(forecast - actual),
+        "ModelError": predicted - actual,
+    })
+    return scored.groupby(["Week", "Plant"], as_index=False).sum()
+
+
+def backtest_week(week: str, weeks_upto: list, model_path: str = MODEL_PATH, retrain_params: dict = None,
+                  cache_dir: str = None, merged_root: str = MERGED_STORE,
+                  latest_path: str = LATEST_PARQUET) -> pd.DataFrame:
+    """
+    Score origin week `week`. `weeks_upto` are the history weeks up to and
+    including it; without retraining only the feature look-back is read.
+    Runs in a worker process, so everything is loaded here.
+    """
+    from services.training import build_training_set, MODEL_FEATURES, TARGET_COL, _regressor
+
+    needed = weeks_upto if retrain_params is not None else weeks_upto[-(FEATURE_LOOKBACK_WEEKS + 1):]
+    fingerprint = history_fingerprint(needed, merged_root, latest_path)
+
+    cache_path = os.path.join(cache_dir, f"{week}.parquet") if cache_dir else None
+    meta_path = os.path.join(cache_dir, f"{week}.json") if cache_dir else None
+    if cache_path and os.path.exists(cache_path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if json.load(f).get("fingerprint") == fingerprint:
+                return pd.read_parquet(cache_path)
+
+    data = build_training_set(read_history(needed, merged_root, latest_path))
+    test = data[data["Week"] == week]
+    if test.empty:
+        result = pd.DataFrame(columns=RESULT_COLUMNS)
+    else:
+        if retrain_params is not None:
+            train = data[data["Week"] != week]
+            if train.empty:
+                return pd.DataFrame(columns=RESULT_COLUMNS)
+            model = _regressor(retrain_params, n_jobs=1)
+            model.fit(train[MODEL_FEATURES], train[TARGET_COL])
+            predicted = np.asarray(model.predict(test[MODEL_FEATURES]))
+        else:
+            from services.model_registry import load_registry
+            model = load_registry(model_path)
+            if model is None:
+                raise FileNotFoundError(f"No model at {model_path}")
+            if model.segment_models:
+                predicted = model.predict_segments(test[MODEL_FEATURES], test["Plant"], workers=1)
+            else:
+                predicted = model.predict(test[MODEL_FEATURES])
+        result = score_week(test, np.asarray(predicted, dtype=float))
+
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        result.to_parquet(cache_path, index=False)
+        with open(meta_path, "w") as f:
+            json.dump({"fingerprint": fingerprint, "weeks": list(needed)}, f)
+    return result
+
+
+def _run_week(args):
+    return backtest_week(*args)
+
+
+@timed()
+def run_backtest(workers: int = 1, min_history_weeks: int = 4, last_weeks: int = None,
+                 model_path: str = MODEL_PATH, retrain: bool = True, rebuild: bool = False,
+                 results_path: str = RESULTS_PATH) -> pd.DataFrame:
+    """
+    Backtest every week that has at least `min_history_weeks` weeks before it
+    (optionally only the latest `last_weeks`). By default each origin gets a
+    fresh forest fitted on the weeks before it, using the last search's
+    parameters (out-of-sample). With `retrain=False` the deployed model is
+    scored instead, which is in-sample for the weeks it was trained on; the
+    Mode column records which one produced the results.
+    """
+    weeks = history_weeks()
+    origins = weeks[min_history_weeks:]
+    if last_weeks:
+        origins = origins[-last_weeks:]
+    if not origins:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    retrain_params = None
+    if retrain:
+        from services.training import BEST_PARAMS_PATH
+        retrain_params = {}
+        if os.path.exists(BEST_PARAMS_PATH):
+            with open(BEST_PARAMS_PATH) as f:
+                retrain_params = json.load(f)
+    cache_dir = os.path.join(CACHE_DIR, model_key(model_path, retrain_params))
+    if rebuild and os.path.isdir(cache_dir):
+        import shutil
+        shutil.rmtree(cache_dir)
+
+    tasks = [(week, weeks[:weeks.index(week) + 1], model_path, retrain_params, cache_dir) for week in origins]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            parts = list(pool.map(_run_week, tasks))
+    else:
+        parts = [_run_week(task) for task in tasks]
+
+    parts = [part for part in parts if not part.empty]
+    results = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=RESULT_COLUMNS)
+    results = add_accuracy_columns(results)
+    results["Mode"] = "out_of_sample" if retrain else "in_sample"
+    os.makedirs(os.path.dirname(results_path), exist_ok=True)
+    results.to_parquet(results_path, index=False)
+    return results
+
+
+def add_accuracy_columns(sums: pd.DataFrame) -> pd.DataFrame:
+    """MAE, WAPE and bias for model and forecast from the summed error columns."""
+    sums = sums.copy()
+    rows = sums["Rows"].replace(0, np.nan)
+    actual = sums["ActualQty"].abs().replace(0, np.nan)
+    sums["ModelMAE"] = (sums["ModelAbsError"] / rows).round(2)
+    sums["ForecastMAE"] = (sums["ForecastAbsError"] / rows).round(2)
+    sums["ModelWAPE"] = (sums["ModelAbsError"] / actual * 100).round(2)
+    sums["ForecastWAPE"] = (sums["ForecastAbsError"] / actual * 100).round(2)
+    sums["ModelBiasPercent"] = (sums["ModelError"] / actual * 100).round(2)
+    sums["ModelBeatsForecast"] = sums["ModelAbsError"] < sums["ForecastAbsError"]
+    return sums
+
+
+def accuracy_by_plant(results: pd.DataFrame) -> pd.DataFrame:
+    """Backtest totals per plant over all origin weeks."""
+    sum_cols = ["Rows", "ActualQty", "ForecastQty", "PredictedQty",
+                "ModelAbsError", "ForecastAbsError", "ModelError"]
+    totals = results.groupby("Plant", as_index=False)[sum_cols].sum()
+    weeks_won = results.groupby("Plant")["ModelBeatsForecast"].agg(["sum", "count"])
+    totals = add_accuracy_columns(totals)
+    totals["WeeksModelBetter"] = totals["Plant"].map(
+        lambda plant: f"{int(weeks_won.loc[plant, 'sum'])}/{int(weeks_won.loc[plant, 'count'])}"
+    )
+    return totals
+
+
+def load_backtest_results(path: str = RESULTS_PATH):
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
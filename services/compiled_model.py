@@ -0,0 +1,175 @@
+# services/compiled_model.py
+"""
+Flattened NumPy form of the tree ensembles used for consumption prediction.
+
+Every tree's nodes are packed into padded (n_trees, max_nodes) arrays and all
+rows walk all trees at once, one tree level per step, so a prediction is a
+few dozen vectorised NumPy operations instead of scikit-learn's per-call
+validation plus one Cython pass per tree. Supported: DecisionTreeRegressor,
+RandomForestRegressor, ExtraTreesRegressor and GradientBoostingRegressor
+with its default (mean) initial estimate.
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+COMPILED_SUFFIX = ".npz"
+
+
+def compiled_path_for(model_path: str) -> str:
+    """inventory_model.pkl -> inventory_model.npz, next to the pickle."""
+    return os.path.splitext(model_path)[0] + COMPILED_SUFFIX
+
+
+class CompiledForest:
+    """Sum/mean of flattened regression trees; a drop-in for model.predict."""
+
+    def __init__(self, feature, threshold, left, right, value, depth, scale=1.0, offset=0.0,
+                 feature_names=None, source=""):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.depth = int(depth)
+        self.scale = float(scale)
+        self.offset = float(offset)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        self.source = source
+
+    @property
+    def n_trees(self) -> int:
+        return self.feature.shape[0]
+
+    def _as_array(self, X) -> np.ndarray:
+        if isinstance(X, pd.DataFrame):
+            if self.feature_names is not None:
+                X = X[self.feature_names]
+            X = X.to_numpy()
+        # scikit-learn compares float32 features against float64 thresholds
+        return np.asarray(X, dtype=np.float32)
+
+    def predict(self, X, chunk_rows: int = 20_000) -> np.ndarray:
+        X = self._as_array(X)
+        out = np.empty(len(X))
+        trees = np.arange(self.n_trees)
+        for start in range(0, len(X), chunk_rows):
+            chunk = X[start:start + chunk_rows]
+            rows = np.arange(len(chunk))[:, None]
+            nodes = np.zeros((len(chunk), self.n_trees), dtype=np.int32)
+            for _ in range(self.depth):
+                features = self.feature[trees, nodes]
+                go_left = chunk[rows, features] <= self.threshold[trees, nodes]
+                # Leaves point at themselves, so finished rows stay put
+                nodes = np.where(go_left, self.left[trees, nodes], self.right[trees, nodes])
+            out[start:start + chunk_rows] = self.value[trees, nodes].sum(axis=1)
+        return out * self.scale + self.offset
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp_path, feature=self.feature, threshold=self.threshold, left=self.left,
+            right=self.right, value=self.value,
+            meta=np.array([self.depth, self.scale, self.offset]),
+            feature_names=np.array(self.feature_names or [], dtype=str),
+            source=np.array(self.source),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            depth, scale, offset = data["meta"]
+            names = data["feature_names"].tolist() or None
+            return cls(data["feature"], data["threshold"], data["left"], data["right"],
+                       data["value"], depth, scale, offset, names, str(data["source"]))
+
+
+def _tree_estimators(model):
+    """(sklearn trees, scale, offset) such that predict = scale * sum(tree values) + offset."""
+    name = type(model).__name__
+    if name == "DecisionTreeRegressor":
+        return [model], 1.0, 0.0
+    if name in ("RandomForestRegressor", "ExtraTreesRegressor"):
+        return list(model.estimators_), 1.0 / len(model.estimators_), 0.0
+    if name == "GradientBoostingRegressor":
+        init = getattr(model, "init_", None)
+        if type(init).__name__ != "DummyRegressor" or getattr(init, "strategy", "mean") != "mean":
+            raise ValueError("Only GradientBoostingRegressor with the default init can be compiled.")
+        offset = float(np.ravel(init.constant_)[0])
+        return [est[0] for est in model.estimators_], float(model.learning_rate), offset
+    raise ValueError(f"Cannot compile a {name}; supported are tree and forest regressors.")
+
+
+def compile_model(model) -> CompiledForest:
+    """Flatten a fitted scikit-learn tree regressor into padded NumPy arrays."""
+    estimators, scale, offset = _tree_estimators(model)
+    trees = [est.tree_ for est in estimators]
+    n_trees, max_nodes = len(trees), max(t.node_count for t in trees)
+
+    feature = np.zeros((n_trees, max_nodes), dtype=np.int32)
+    threshold = np.zeros((n_trees, max_nodes))
+    left = np.zeros((n_trees, max_nodes), dtype=np.int32)
+    right = np.zeros((n_trees, max_nodes), dtype=np.int32)
+    value = np.zeros((n_trees, max_nodes))
+
+    for i, tree in enumerate(trees):
+        n = tree.node_count
+        is_leaf = tree.children_left == -1
+        own = np.arange(n, dtype=np.int32)
+        feature[i, :n] = np.where(is_leaf, 0, tree.feature)
+        threshold[i, :n] = tree.threshold
+        left[i, :n] = np.where(is_leaf, own, tree.children_left)
+        right[i, :n] = np.where(is_leaf, own, tree.children_right)
+        value[i, :n] = tree.value[:, 0, 0]
+
+    depth = max(est.get_depth() for est in estimators)
+    names = getattr(model, "feature_names_in_", None)
+    return CompiledForest(feature, threshold, left, right, value, depth, scale, offset,
+                          names, type(model).__name__)
+
+
+def export_compiled(model, path: str) -> CompiledForest:
+    compiled = compile_model(model)
+    compiled.save(path)
+    return compiled
+
+
+def load_compiled(path: str):
+    if not os.path.exists(path):
+        return None
+    return CompiledForest.load(path)
+
+
+def check_parity(model, compiled, X, rtol: float = 1e-6, atol: float = 1e-6) -> dict:
+    """Compare the pickle's and the compiled model's predictions on X."""
+    expected = np.asarray(model.predict(X), dtype=float)
+    actual = compiled.predict(X)
+    diff = np.abs(expected - actual)
+    return {
+        "rows": int(len(expected)),
+        "max_abs_diff": float(diff.max()) if len(diff) else 0.0,
+        "mismatches": int((diff > atol + rtol * np.abs(expected)).sum()),
+        "ok": bool(np.allclose(expected, actual, rtol=rtol, atol=atol)),
+    }
+
+
+def benchmark_latency(model, compiled, X, batch_sizes=(1, 100, 10_000), repeat: int = 5) -> list:
+    """Median predict latency of the pickle vs the compiled model per batch size."""
+    results = []
+    for batch in batch_sizes:
+        sample = X.iloc[:batch] if isinstance(X, pd.DataFrame) else X[:batch]
+        row = {"batch_rows": int(len(sample))}
+        for label, predictor in [("pickle_ms", model), ("compiled_ms", compiled)]:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                predictor.predict(sample)
+                timings.append((time.perf_counter() - start) * 1000)
+            row[label] = float(np.median(timings))
+        row["speedup"] = row["pickle_ms"] / row["compiled_ms"] if row["compiled_ms"] else None
+        results.append(row)
+    return results
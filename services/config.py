@@ -0,0 +1,30 @@
+# services/config.py
+import os
+
+# "in_memory" loads the full history into one DataFrame (default).
+# "out_of_core" merges and aggregates one week partition at a time.
+EXECUTION_MODE = os.environ.get("INVENTORY_EXECUTION_MODE", "in_memory").strip().lower()
+
+
+def is_out_of_core() -> bool:
+    return EXECUTION_MODE == "out_of_core"
+
+
+# DataFrame backend for the service functions: "pandas", "polars" or "duckdb".
+# Every backend returns pandas objects to the UI.
+DATAFRAME_ENGINE = os.environ.get("INVENTORY_ENGINE", "pandas").strip().lower()
+
+
+# Custom-dashboard workspaces (one per distinct upload) unused for this long are deleted.
+WORKSPACE_IDLE_HOURS = float(os.environ.get("INVENTORY_WORKSPACE_IDLE_HOURS", "6"))
+
+
+# Quick look on the explore page: KPIs from a stratified Plant/Week sample are
+# shown while the full merge runs, for histories of at least this many forecast rows.
+QUICK_LOOK_MIN_ROWS = int(os.environ.get("INVENTORY_QUICK_LOOK_MIN_ROWS", "200000"))
+QUICK_LOOK_FRACTION = float(os.environ.get("INVENTORY_QUICK_LOOK_FRACTION", "0.02"))
+QUICK_LOOK_MIN_PER_STRATUM = 50
+
+
+# Built Plotly figures kept per server process (least recently used evicted first).
+FIGURE_CACHE_SIZE = int(os.environ.get("INVENTORY_FIGURE_CACHE_SIZE", "64"))
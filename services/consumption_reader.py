@@ -0,0 +1,137 @@
+# services/consumption_reader.py
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from services.file_utils import convert_week_format_series
+from services.parquet_store import write_partition, remove_store
+from services.perf import timed
+
+USAGE_COLUMNS = ["ConsumptionQty", "RealQty", "Tot_usage", "Tot. usage", "Usage", "Real Usage"]
+KEY_COLUMNS = ["Material", "Plant", "Week"]
+VALUE_COLUMN = "Tot.us.val"
+
+DEFAULT_CHUNKSIZE = 50_000
+
+
+def _wanted_columns(header) -> list:
+    """Project the header down to the columns the consumption store needs."""
+    usage_col = next((col for col in header if col in USAGE_COLUMNS), None)
+    if usage_col is None:
+        return []
+    return [col for col in header if col in KEY_COLUMNS or col == VALUE_COLUMN] + [usage_col]
+
+
+def _iter_excel_chunks(path: str, chunksize: int):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [str(col).strip() if col is not None else "" for col in header]
+        wanted = _wanted_columns(header)
+        if not wanted:
+            return
+        positions = [header.index(col) for col in wanted]
+
+        buffer = []
+        for row in rows:
+            buffer.append([row[i] if i < len(row) else None for i in positions])
+            if len(buffer) >= chunksize:
+                yield pd.DataFrame(buffer, columns=wanted)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=wanted)
+    finally:
+        workbook.close()
+
+
+def _iter_csv_chunks(path: str, chunksize: int):
+    header = pd.read_csv(path, nrows=0).columns
+    wanted = _wanted_columns([str(col) for col in header])
+    if not wanted:
+        return
+    yield from pd.read_csv(
+        path,
+        usecols=wanted,
+        dtype={col: str for col in KEY_COLUMNS},
+        chunksize=chunksize
+    )
+
+
+def iter_consumption_chunks(path: str, chunksize: int = DEFAULT_CHUNKSIZE):
+    """
+    Yield raw consumption rows in chunks, already projected to
+    Material/Plant/Week/usage/Tot.us.val. Yields nothing when the file has
+    no recognised usage column.
+    """
+    if path.lower().endswith(".csv"):
+        yield from _iter_csv_chunks(path, chunksize)
+    else:
+        yield from _iter_excel_chunks(path, chunksize)
+
+
+def normalize_consumption_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Rename, normalise and type one chunk of consumption rows."""
+    usage_col = next(col for col in chunk.columns if col in USAGE_COLUMNS)
+    chunk = chunk.rename(columns={usage_col: "ConsumptionQty"})
+
+    chunk["Week"] = convert_week_format_series(chunk["Week"])
+    chunk["Material"] = chunk["Material"].astype(str).str.strip()
+    chunk["Plant"] = chunk["Plant"].astype(str).str.strip()
+    chunk["ConsumptionQty"] = pd.to_numeric(chunk["ConsumptionQty"], errors="coerce")
+    if VALUE_COLUMN in chunk.columns:
+        chunk[VALUE_COLUMN] = pd.to_numeric(chunk[VALUE_COLUMN], errors="coerce")
+
+    columns = KEY_COLUMNS + ["ConsumptionQty", VALUE_COLUMN]
+    return chunk[[col for col in columns if col in chunk.columns]]
+
+
+def _ingest_one_file(path: str, store_root: str, chunksize: int, part_prefix: str = "") -> int:
+    rows_written = 0
+    for chunk in iter_consumption_chunks(path, chunksize):
+        if not set(KEY_COLUMNS).issubset(chunk.columns):
+            break
+        chunk = normalize_consumption_chunk(chunk)
+        write_partition(chunk, store_root, part_prefix=part_prefix)
+        rows_written += len(chunk)
+    return rows_written
+
+
+@timed()
+def ingest_consumption_files(paths, store_root: str, chunksize: int = DEFAULT_CHUNKSIZE, workers: int = 1) -> int:
+    """
+    Stream every consumption file into a Week-partitioned parquet store.
+
+    Only one chunk per file is held in memory at a time. With workers > 1
+    the files are ingested in parallel processes. The store is built in a
+    temporary folder and swapped in at the end, so a failed ingest never
+    leaves a half-written store behind. Returns the number of rows written.
+    """
+    tmp_root = store_root + ".tmp"
+    remove_store(tmp_root)
+
+    paths = list(paths)
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+            rows_written = sum(pool.map(
+                _ingest_one_file,
+                paths,
+                [tmp_root] * len(paths),
+                [chunksize] * len(paths),
+                [f"f{i:04d}-" for i in range(len(paths))]
+            ))
+    else:
+        rows_written = sum(_ingest_one_file(path, tmp_root, chunksize) for path in paths)
+
+    if rows_written == 0:
+        remove_store(tmp_root)
+        return 0
+
+    remove_store(store_root)
+    os.replace(tmp_root, store_root)
+    return rows_written
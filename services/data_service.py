@@ -2,9 +2,12 @@ import pandas as pd
 import numpy as np
 import streamlit as st
 
+from services.perf import timed
+
 @st.cache_data
-def summarize_gap_by_plant_cached(df):
-    return summarize_gap_by_plant(df)
+def summarize_gap_by_plant_cached(df, engine_name="pandas"):
+    from services.engine import get_engine
+    return get_engine(engine_name).summarize_gap_by_plant(df)
 
 def load_latest_merged_data(path="data/merged/latest.csv"):
     try:
@@ -14,6 +17,7 @@ def load_latest_merged_data(path="data/merged/latest.csv"):
     except FileNotFoundError:
         return None
 
+@timed()
 def merge_forecast_and_consumption(forecast_df: pd.DataFrame, consumption_df: pd.DataFrame) -> pd.DataFrame:
     """Merge forecast and consumption data on Material, Plant, and Week."""
     merged_df = pd.merge(
@@ -37,9 +41,11 @@ def merge_forecast_and_consumption(forecast_df: pd.DataFrame, consumption_df: pd
 
 
 @st.cache_data
-def merge_forecast_and_consumption_cached(forecast_df, consumption_df):
-    return merge_forecast_and_consumption(forecast_df, consumption_df)
+def merge_forecast_and_consumption_cached(forecast_df, consumption_df, engine_name="pandas"):
+    from services.engine import get_engine
+    return get_engine(engine_name).merge_forecast_and_consumption(forecast_df, consumption_df)
 
+@timed()
 def summarize_gap_by_plant(df: pd.DataFrame) -> pd.DataFrame:
     """Group by Plant and calculate forecast gap % correctly."""
     if df.empty:
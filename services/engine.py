@@ -0,0 +1,311 @@
+# services/engine.py
+import os
+import math
+import pandas as pd
+
+from services.config import DATAFRAME_ENGINE
+from services.data_service import merge_forecast_and_consumption, summarize_gap_by_plant
+from services.forecast_cleaner import clean_yppmpl_file, sum_mrp_columns
+from services.kpi_service import calculate_kpis, get_worst_plants
+from services.parquet_store import read_store
+
+KEYS = ["Material", "Plant", "Week"]
+GAP_COLUMNS = ["Plant", "ForecastQty", "ConsumptionQty", "GapPercent"]
+
+
+def _finish_gap_summary(grouped: pd.DataFrame) -> pd.DataFrame:
+    """GapPercent on the (tiny) per-plant result, computed exactly as the pandas path does."""
+    grouped = grouped.sort_values("Plant").reset_index(drop=True)
+    grouped["GapPercent"] = ((grouped["ForecastQty"] - grouped["ConsumptionQty"]) / grouped["ForecastQty"])
+    grouped["GapPercent"] = grouped["GapPercent"].round(2)
+    return grouped[GAP_COLUMNS]
+
+
+def _finish_kpis(total_forecast, total_consumption, total_abs_gap):
+    total_gap = total_forecast - total_consumption
+    abs_total_gap = abs(total_gap)
+    if total_forecast == 0:
+        average_deviation_percent = 0
+    else:
+        average_deviation_percent = round(total_abs_gap / total_forecast * 100, 2)
+    return total_gap, abs_total_gap, average_deviation_percent
+
+
+def _finish_worst_plants(plant_deviation: pd.DataFrame):
+    plant_deviation = plant_deviation.set_index("Plant")["Deviation"].sort_index()
+    return plant_deviation.idxmax(), plant_deviation.idxmin()
+
+
+class PandasEngine:
+    """Reference engine: the plain pandas service functions.
+
+    Every method accepts either a pandas DataFrame or the root folder of a
+    Week-partitioned parquet store (see services/parquet_store.py).
+    """
+    name = "pandas"
+
+    def _frame(self, data):
+        return read_store(data) if isinstance(data, str) else data
+
+    def merge_forecast_and_consumption(self, forecast_df, consumption_df) -> pd.DataFrame:
+        return merge_forecast_and_consumption(self._frame(forecast_df), self._frame(consumption_df))
+
+    def summarize_gap_by_plant(self, df) -> pd.DataFrame:
+        return summarize_gap_by_plant(self._frame(df))
+
+    def calculate_kpis(self, df):
+        return calculate_kpis(self._frame(df))
+
+    def get_worst_plants(self, df):
+        return get_worst_plants(self._frame(df))
+
+    def sum_mrp_columns(self, mrp_df: pd.DataFrame) -> pd.Series:
+        return sum_mrp_columns(mrp_df)
+
+    def clean_yppmpl_file(self, df, week_str, current_week, current_year) -> pd.DataFrame:
+        return clean_yppmpl_file(df, week_str, current_week, current_year, row_sum=self.sum_mrp_columns)
+
+
+class PolarsEngine(PandasEngine):
+    """Polars lazy frames; parquet stores are scanned lazily with projection pushdown."""
+    name = "polars"
+
+    def __init__(self):
+        try:
+            import polars
+        except ImportError as e:
+            raise ImportError("The polars engine needs the 'polars' package (pip install polars).") from e
+        self.pl = polars
+
+    def _lazy(self, data):
+        if isinstance(data, str):
+            return self.pl.scan_parquet(os.path.join(data, "*", "*.parquet"))
+        return self.pl.from_pandas(data).lazy()
+
+    def _numeric(self, col):
+        pl = self.pl
+        return pl.col(col).cast(pl.Float64, strict=False).fill_nan(0).fill_null(0)
+
+    def merge_forecast_and_consumption(self, forecast_df, consumption_df) -> pd.DataFrame:
+        pl = self.pl
+        merged = (
+            self._lazy(forecast_df)
+            .join(self._lazy(consumption_df), on=KEYS, how="inner")
+            .with_columns(
+                self._numeric("ForecastQty").alias("ForecastQty"),
+                self._numeric("ConsumptionQty").alias("ConsumptionQty"),
+            )
+            .with_columns((pl.col("ConsumptionQty") - pl.col("ForecastQty")).alias("Deviation"))
+            .with_columns(
+                pl.when(pl.col("ForecastQty") != 0)
+                .then(pl.col("Deviation") / pl.col("ForecastQty") * 100)
+                .otherwise(0.0)
+                .alias("DeviationPercent")
+            )
+        )
+        return merged.collect().to_pandas()
+
+    def summarize_gap_by_plant(self, df) -> pd.DataFrame:
+        pl = self.pl
+        grouped = (
+            self._lazy(df)
+            .group_by("Plant")
+            .agg(pl.col("ForecastQty").sum(), pl.col("ConsumptionQty").sum())
+            .collect()
+            .to_pandas()
+        )
+        if grouped.empty:
+            return pd.DataFrame(columns=GAP_COLUMNS)
+        return _finish_gap_summary(grouped)
+
+    def calculate_kpis(self, df):
+        pl = self.pl
+        gap = pl.col("ForecastQty") - pl.col("ConsumptionQty")
+        totals = self._lazy(df).select(
+            pl.col("ForecastQty").sum().alias("forecast"),
+            pl.col("ConsumptionQty").sum().alias("consumption"),
+            gap.abs().sum().alias("abs_gap"),
+        ).collect().row(0)
+        return _finish_kpis(*totals)
+
+    def get_worst_plants(self, df):
+        pl = self.pl
+        plant_deviation = (
+            self._lazy(df)
+            .group_by("Plant")
+            .agg(pl.col("Deviation").mean())
+            .collect()
+            .to_pandas()
+        )
+        return _finish_worst_plants(plant_deviation)
+
+    def sum_mrp_columns(self, mrp_df: pd.DataFrame) -> pd.Series:
+        pl = self.pl
+        if mrp_df.shape[1] == 0:
+            return pd.Series(0, index=mrp_df.index)
+        # Mixed-type object columns are handed over as text and parsed by polars
+        columns = {
+            str(i): mrp_df[col].astype(str) if mrp_df[col].dtype == object else mrp_df[col]
+            for i, col in enumerate(mrp_df.columns)
+        }
+        frame = pl.from_pandas(pd.DataFrame(columns)).lazy()
+        totals = frame.select(
+            pl.sum_horizontal([self._numeric(name) for name in columns]).alias("ForecastQty")
+        ).collect().to_series().to_numpy()
+        return pd.Series(totals, index=mrp_df.index)
+
+
+class DuckDBEngine(PandasEngine):
+    """Embedded DuckDB; DataFrames are scanned in place, parquet stores via read_parquet."""
+    name = "duckdb"
+
+    def __init__(self, threads=None):
+        try:
+            import duckdb
+        except ImportError as e:
+            raise ImportError("The duckdb engine needs the 'duckdb' package (pip install duckdb).") from e
+        self.con = duckdb.connect()
+        self.con.execute(f"SET threads TO {threads or os.cpu_count() or 1}")
+
+    def _cursor(self):
+        # One cursor per call: Streamlit sessions run on separate threads
+        return self.con.cursor()
+
+    @staticmethod
+    def _relation(con, data, name):
+        if isinstance(data, str):
+            pattern = os.path.join(data, "*", "*.parquet").replace("'", "''")
+            return f"read_parquet('{pattern}', union_by_name = true)"
+        con.register(name, data)
+        return name
+
+    @staticmethod
+    def _numeric(col):
+        value = f'TRY_CAST("{col}" AS DOUBLE)'
+        return f"COALESCE(CASE WHEN isnan({value}) THEN 0 ELSE {value} END, 0)"
+
+    def merge_forecast_and_consumption(self, forecast_df, consumption_df) -> pd.DataFrame:
+        con = self._cursor()
+        forecast = self._relation(con, forecast_df, "forecast_df")
+        consumption = self._relation(con, consumption_df, "consumption_df")
+        return con.execute(f"""
+            WITH merged AS (
+                SELECT * FROM {forecast} AS f
+                INNER JOIN {consumption} AS c USING (Material, Plant, Week)
+            ), typed AS (
+                SELECT * REPLACE (
+                    {self._numeric("ForecastQty")} AS ForecastQty,
+                    {self._numeric("ConsumptionQty")} AS ConsumptionQty
+                ) FROM merged
+            )
+            SELECT *,
+                ConsumptionQty - ForecastQty AS Deviation,
+                CASE WHEN ForecastQty = 0 THEN 0
+                     ELSE (ConsumptionQty - ForecastQty) / ForecastQty * 100 END AS DeviationPercent
+            FROM typed
+        """).df()
+
+    def summarize_gap_by_plant(self, df) -> pd.DataFrame:
+        con = self._cursor()
+        source = self._relation(con, df, "merged_df")
+        grouped = con.execute(f"""
+            SELECT Plant, SUM(ForecastQty) AS ForecastQty, SUM(ConsumptionQty) AS ConsumptionQty
+            FROM {source} GROUP BY Plant
+        """).df()
+        if grouped.empty:
+            return pd.DataFrame(columns=GAP_COLUMNS)
+        return _finish_gap_summary(grouped)
+
+    def calculate_kpis(self, df):
+        con = self._cursor()
+        source = self._relation(con, df, "merged_df")
+        totals = con.execute(f"""
+            SELECT COALESCE(SUM(ForecastQty), 0), COALESCE(SUM(ConsumptionQty), 0),
+                   COALESCE(SUM(ABS(ForecastQty - ConsumptionQty)), 0)
+            FROM {source}
+        """).fetchone()
+        return _finish_kpis(*totals)
+
+    def get_worst_plants(self, df):
+        con = self._cursor()
+        source = self._relation(con, df, "merged_df")
+        plant_deviation = con.execute(
+            f"SELECT Plant, AVG(Deviation) AS Deviation FROM {source} GROUP BY Plant"
+        ).df()
+        return _finish_worst_plants(plant_deviation)
+
+    def sum_mrp_columns(self, mrp_df: pd.DataFrame) -> pd.Series:
+        if mrp_df.shape[1] == 0:
+            return pd.Series(0, index=mrp_df.index)
+        columns = {
+            f"c{i}": mrp_df[col].astype(str) if mrp_df[col].dtype == object else mrp_df[col]
+            for i, col in enumerate(mrp_df.columns)
+        }
+        con = self._cursor()
+        con.register("mrp_df", pd.DataFrame(columns))
+        total = " + ".join(self._numeric(name) for name in columns)
+        totals = con.execute(f"SELECT {total} AS ForecastQty FROM mrp_df").df()["ForecastQty"].to_numpy()
+        return pd.Series(totals, index=mrp_df.index)
+
+
+_ENGINES = {
+    "pandas": PandasEngine,
+    "polars": PolarsEngine,
+    "duckdb": DuckDBEngine,
+}
+_instances = {}
+
+
+def get_engine(name: str = None):
+    """Return the (shared) engine instance for `name`, defaulting to INVENTORY_ENGINE."""
+    name = (name or DATAFRAME_ENGINE).lower()
+    if name not in _ENGINES:
+        raise ValueError(f"Unknown DataFrame engine '{name}'. Choose one of: {', '.join(_ENGINES)}")
+    if name not in _instances:
+        _instances[name] = _ENGINES[name]()
+    return _instances[name]
+
+
+def check_engine_parity(forecast_df: pd.DataFrame, consumption_df: pd.DataFrame, engine_name: str, rel_tol: float = 1e-9) -> list:
+    """
+    Run the pipeline through pandas and through `engine_name` and list every
+    KPI that differs. An empty list means the engine is a drop-in replacement.
+    Float sums may differ in the last bits because of summation order, so
+    unrounded figures are compared with `rel_tol`.
+    """
+    reference = get_engine("pandas")
+    candidate = get_engine(engine_name)
+    mismatches = []
+
+    def close(a, b):
+        if isinstance(a, str) or isinstance(b, str):
+            return a == b
+        if pd.isna(a) and pd.isna(b):
+            return True
+        return math.isclose(a, b, rel_tol=rel_tol, abs_tol=1e-9)
+
+    expected_merged = reference.merge_forecast_and_consumption(forecast_df, consumption_df)
+    actual_merged = candidate.merge_forecast_and_consumption(forecast_df, consumption_df)
+    if len(expected_merged) != len(actual_merged):
+        mismatches.append(f"merge rows: {len(expected_merged)} != {len(actual_merged)}")
+
+    for label, fn in [("calculate_kpis", "calculate_kpis"), ("get_worst_plants", "get_worst_plants")]:
+        expected = getattr(reference, fn)(expected_merged)
+        actual = getattr(candidate, fn)(expected_merged)
+        for i, (a, b) in enumerate(zip(expected, actual)):
+            # The rounded average deviation may flip on the last decimal
+            tolerance_ok = fn == "calculate_kpis" and i == 2 and abs(a - b) <= 0.01
+            if not (close(a, b) or tolerance_ok):
+                mismatches.append(f"{label}[{i}]: {a!r} != {b!r}")
+
+    expected_gap = reference.summarize_gap_by_plant(expected_merged).reset_index(drop=True)
+    actual_gap = candidate.summarize_gap_by_plant(expected_merged).reset_index(drop=True)
+    if list(expected_gap["Plant"]) != list(actual_gap["Plant"]):
+        mismatches.append("summarize_gap_by_plant: plants differ")
+    else:
+        for col in ["ForecastQty", "ConsumptionQty"]:
+            for plant, a, b in zip(expected_gap["Plant"], expected_gap[col], actual_gap[col]):
+                if not close(a, b):
+                    mismatches.append(f"summarize_gap_by_plant[{plant}].{col}: {a!r} != {b!r}")
+
+    return mismatches
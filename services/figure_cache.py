@@ -0,0 +1,88 @@
+# services/figure_cache.py
+"""
+Bounded LRU cache of built Plotly figures.
+
+Figures are keyed by (chart type, data version, filter selection), where the
+data version changes whenever the underlying data is rewritten (typically a
+file's mtime). A repeat view of the same chart skips both its aggregation
+and the figure construction. Shared by all sessions of the server process.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from services.config import FIGURE_CACHE_SIZE
+from services.perf import span
+
+
+def _freeze(value):
+    """Hashable form of a widget selection (lists/sets/dicts become tuples)."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, set):
+        return tuple(sorted(_freeze(v) for v in value))
+    return value
+
+
+def data_version(*paths) -> tuple:
+    """Modification times of the files a chart is built from (None for missing files)."""
+    return tuple(os.path.getmtime(p) if os.path.exists(p) else None for p in paths)
+
+
+class FigureCache:
+
+    def __init__(self, max_entries: int = FIGURE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_build(self, chart: str, version, selection, build):
+        """The cached figure for this key, or build() it and remember it."""
+        key = (chart, _freeze(version), _freeze(selection))
+        with self._lock:
+            if key in self._figures:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                return self._figures[key]
+            self.misses += 1
+
+        with span(f"figure.build.{chart}"):
+            figure = build()
+
+        with self._lock:
+            self._figures[key] = figure
+            self._figures.move_to_end(key)
+            while len(self._figures) > self.max_entries:
+                self._figures.popitem(last=False)
+                self.evictions += 1
+        return figure
+
+    def invalidate(self, chart: str = None) -> None:
+        """Drop every figure, or only those of one chart type."""
+        with self._lock:
+            for key in [k for k in self._figures if chart is None or k[0] == chart]:
+                del self._figures[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._figures),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else None,
+            }
+
+
+FIGURE_CACHE = FigureCache()
+
+
+def cached_figure(chart: str, version, selection, build):
+    return FIGURE_CACHE.get_or_build(chart, version, selection, build)
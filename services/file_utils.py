@@ -1,13 +1,17 @@
 # services/file_utils.py
+import os
 import pandas as pd
 import numpy as np
 
+from services.perf import timed
+
 def convert_week_format(w):
     if isinstance(w, str) and "." in w:
         parts = w.split(".")
         return f"W{parts[0].zfill(2)}-{parts[1][-2:]}"
     return str(w)
 
+@timed()
 def safe_read_file(uploaded_file):
     try:
         return pd.read_excel(uploaded_file, engine='openpyxl')
@@ -17,4 +21,30 @@ def safe_read_file(uploaded_file):
 
 def clean_dataframe(df):
     df = df.replace([np.inf, -np.inf], np.nan)
-    return df.fillna(0)
\ No newline at end of file
+    return df.fillna(0)
+
+def path_mtime(path: str) -> float:
+    """Latest modification time of a file, or of a folder and everything under it."""
+    if not os.path.isdir(path):
+        return os.path.getmtime(path)
+    latest = os.path.getmtime(path)
+    for root, dirs, files in os.walk(path):
+        for name in dirs + files:
+            latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+    return latest
+
+def convert_week_format_series(weeks: pd.Series) -> pd.Series:
+    """Vectorised convert_week_format for a whole column."""
+    weeks = weeks.astype(str)
+    parts = weeks.str.extract(r"^([^.]*)\.([^.]*)")
+    converted = "W" + parts[0].str.zfill(2) + "-" + parts[1].str[-2:]
+    return converted.where(weeks.str.contains(".", regex=False), weeks)
+
+def week_sort_key(week: str):
+    """Chronological sort key for "W05-24" / "W05-2024" labels: (year, week)."""
+    week_part, _, year_part = str(week).partition("-")
+    try:
+        year = int(year_part)
+        return (year + 2000 if year < 100 else year, int(week_part.lstrip("Ww")))
+    except ValueError:
+        return (9999, 99)
@@ -4,12 +4,26 @@ import numpy as np
 import re
 import streamlit as st
 
+from services.perf import timed
+
 @st.cache_data
 def clean_yppmpl_file_cached(df, week_str, current_week, current_year):
     return clean_yppmpl_file(df, week_str, current_week, current_year)
 
 
-def clean_yppmpl_file(df: pd.DataFrame, week_str: str, current_week: int, current_year: int) -> pd.DataFrame:
+def sum_mrp_columns(mrp_df: pd.DataFrame) -> pd.Series:
+    return mrp_df.apply(pd.to_numeric, errors="coerce").fillna(0).sum(axis=1)
+
+
+@timed()
+def clean_yppmpl_file(df: pd.DataFrame, week_str: str, current_week: int, current_year: int, row_sum=None) -> pd.DataFrame:
+    """
+    Reduce a YPPMPL snapshot to one ForecastQty per row.
+
+    `row_sum` computes the per-row total of the selected MRP buckets; it
+    defaults to pandas and lets services/engine.py plug in another backend.
+    """
+    row_sum = row_sum or sum_mrp_columns
     df = df[df['Material'].notna() & df['Material'].astype(str).str.strip().ne('')]
     po_sl_cols = [col for col in df.columns if str(col).strip().upper().startswith("PO/SL")]
     df.drop(columns=po_sl_cols, inplace=True)
@@ -31,7 +45,7 @@ def clean_yppmpl_file(df: pd.DataFrame, week_str: str, current_week: int, curren
                     if (col_year < current_year) or (col_year == current_year and col_week <= current_week):
                         mrp_cols_to_sum.append(col)
 
-    df["ForecastQty"] = df[mrp_cols_to_sum].apply(pd.to_numeric, errors="coerce").fillna(0).sum(axis=1)
+    df["ForecastQty"] = row_sum(df[mrp_cols_to_sum])
 
     # Columns to preserve explicitly
     keep_features = [
@@ -0,0 +1,264 @@
+# services/ingest_service.py
+import hashlib
+import json
+import os
+import re
+import glob
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from services.file_utils import safe_read_file, week_sort_key
+from services.engine import get_engine
+from services.consumption_reader import (
+    KEY_COLUMNS, ingest_consumption_files, iter_consumption_chunks, normalize_consumption_chunk
+)
+from services.parquet_store import (
+    write_partition, replace_partition, read_partition, read_store, remove_store
+)
+from services.perf import timed
+from services.snapshot_store import SNAPSHOT_STORE, SnapshotStore, bucket_frame
+
+FORECAST_RAW_DIR = "data/raw/forecast"
+CONSUMPTION_RAW_DIR = "data/raw/consumption"
+
+FORECAST_STORE = "data/merged/forecast_cleaned"
+CONSUMPTION_STORE = "data/merged/consumption_cleaned"
+# Weeks each raw consumption file contains, keyed by path and checked by mtime/size
+CONSUMPTION_WEEKS_INDEX = "data/merged/consumption_file_weeks.json"
+
+
+def parse_forecast_week(filename: str):
+    """Return (week_str, week, year) from a YPPMPL file name, or None."""
+    match = re.search(r"W(\d{2})-(\d{2})", os.path.basename(filename))
+    if not match:
+        return None
+    return match.group(0), int(match.group(1)), 2000 + int(match.group(2))
+
+
+def clean_forecast_file(forecast_path: str, with_buckets: bool = False):
+    """
+    The cleaned rows of one YPPMPL file (None if its name has no week). With
+    `with_buckets` returns (week_str, cleaned_df, bucket_frame) instead, so
+    the snapshot store is fed from the same read of the file.
+    """
+    week = parse_forecast_week(forecast_path)
+    if week is None:
+        return None
+    week_str, current_week, current_year = week
+    with open(forecast_path, 'rb') as f:
+        raw_df = safe_read_file(f)
+    buckets = bucket_frame(raw_df) if with_buckets else None
+    cleaned_df = get_engine().clean_yppmpl_file(raw_df, week_str, current_week, current_year)
+    cleaned_df["ForecastQty"] = pd.to_numeric(cleaned_df["ForecastQty"], errors="coerce")
+    cleaned_df = cleaned_df.dropna(subset=["ForecastQty"])
+    if with_buckets:
+        return week_str, cleaned_df, buckets
+    return cleaned_df
+
+
+def _clean_forecast_with_buckets(forecast_path: str):
+    return clean_forecast_file(forecast_path, with_buckets=True)
+
+
+def _iter_cleaned_forecasts(paths, workers: int):
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+            yield from pool.map(_clean_forecast_with_buckets, paths)
+    else:
+        for forecast_path in paths:
+            yield _clean_forecast_with_buckets(forecast_path)
+
+
+def _snapshot_order(path: str):
+    week = parse_forecast_week(path)
+    return week_sort_key(week[0]) if week else (0, 0)
+
+
+@timed()
+def ingest_forecast_files(paths, store_root: str = FORECAST_STORE, workers: int = 1,
+                          snapshot_root: str = SNAPSHOT_STORE) -> int:
+    """
+    Clean each YPPMPL file on its own and write it as a Week partition.
+    With workers > 1 the files are parsed and cleaned in parallel processes.
+    The full MRP bucket vectors go to the delta-encoded snapshot store
+    (services.snapshot_store), in snapshot order.
+    """
+    tmp_root = store_root + ".tmp"
+    remove_store(tmp_root)
+    snapshot_tmp = snapshot_root + ".tmp" if snapshot_root else None
+    snapshots = SnapshotStore(snapshot_tmp) if snapshot_root else None
+    if snapshot_tmp:
+        remove_store(snapshot_tmp)
+
+    rows_written = 0
+    for result in _iter_cleaned_forecasts(sorted(paths, key=_snapshot_order), workers):
+        if result is None:
+            continue
+        week_str, cleaned_df, buckets = result
+        if snapshots is not None and week_str not in snapshots.weeks:
+            snapshots.append(week_str, buckets)
+        write_partition(cleaned_df, tmp_root)
+        rows_written += len(cleaned_df)
+
+    if rows_written == 0:
+        remove_store(tmp_root)
+        if snapshot_tmp:
+            remove_store(snapshot_tmp)
+        return 0
+
+    remove_store(store_root)
+    os.replace(tmp_root, store_root)
+    if snapshot_root and snapshots.index:
+        remove_store(snapshot_root)
+        os.replace(snapshot_tmp, snapshot_root)
+    return rows_written
+
+
+@timed()
+def append_forecast_files(paths, store_root: str = FORECAST_STORE, workers: int = 1,
+                          snapshot_root: str = SNAPSHOT_STORE) -> list:
+    """
+    Clean only the given YPPMPL files and replace their Week partitions,
+    leaving every other week as it is. Their bucket vectors are added to the
+    snapshot store, replacing just the snapshot of a week that is already
+    stored or older than the latest. Returns the weeks written.
+    """
+    snapshots = SnapshotStore.open(snapshot_root) if snapshot_root else None
+    weeks = []
+    for result in _iter_cleaned_forecasts(sorted(paths, key=_snapshot_order), workers):
+        if result is None:
+            continue
+        week_str, cleaned_df, buckets = result
+        if week_str in weeks:
+            write_partition(cleaned_df, store_root)
+            continue
+        replace_partition(cleaned_df, store_root, week_str)
+        weeks.append(week_str)
+        if snapshots is not None:
+            snapshots.replace(week_str, buckets)
+    return weeks
+
+
+def rows_digest(df: pd.DataFrame) -> str:
+    """Content hash of a frame that ignores row and column order."""
+    if df.empty:
+        return ""
+    df = df[sorted(df.columns)]
+    df = df.sort_values(list(df.columns), na_position="last").reset_index(drop=True)
+    hashed = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.sha1(hashed.tobytes() + ",".join(df.columns).encode()).hexdigest()
+
+
+def consumption_file_weeks(paths, index_path: str = CONSUMPTION_WEEKS_INDEX) -> dict:
+    """
+    {path: set of weeks} for the given consumption files. Files are scanned
+    (key columns only) once per version; the result is kept in `index_path`.
+    """
+    index = {}
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            index = json.load(f)
+    result, dirty = {}, False
+    for path in paths:
+        stat = os.stat(path)
+        entry = index.get(path)
+        if entry is None or entry["mtime"] != stat.st_mtime or entry["size"] != stat.st_size:
+            weeks = set()
+            for chunk in iter_consumption_chunks(path):
+                if not set(KEY_COLUMNS).issubset(chunk.columns):
+                    break
+                weeks.update(normalize_consumption_chunk(chunk)["Week"].unique())
+            entry = {"mtime": stat.st_mtime, "size": stat.st_size, "weeks": sorted(weeks)}
+            index[path] = entry
+            dirty = True
+        result[path] = set(entry["weeks"])
+    if dirty:
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        with open(index_path, "w") as f:
+            json.dump(index, f, indent=1)
+    return result
+
+
+@timed()
+def append_consumption_files(paths, store_root: str = CONSUMPTION_STORE, workers: int = 1) -> list:
+    """
+    Rebuild the Week partitions the given consumption files touch from every
+    raw consumption file containing those weeks (as the full ingest combines
+    them), and replace only the partitions whose rows changed. Returns the
+    weeks replaced.
+    """
+    paths = list(paths)
+    all_paths = raw_consumption_paths() + [p for p in paths if p not in raw_consumption_paths()]
+    file_weeks = consumption_file_weeks(all_paths)
+    touched = set().union(*(file_weeks[path] for path in paths)) if paths else set()
+    if not touched:
+        return []
+    sources = [path for path in all_paths if file_weeks[path] & touched]
+
+    scratch_root = store_root + ".append"
+    remove_store(scratch_root)
+    ingest_consumption_files(sources, scratch_root, workers=workers)
+    changed = []
+    for week in sorted(touched, key=week_sort_key):
+        new_df = read_partition(scratch_root, week)
+        if rows_digest(new_df) == rows_digest(read_partition(store_root, week)):
+            continue
+        if new_df.empty:
+            remove_store(os.path.join(store_root, week))
+        else:
+            replace_partition(new_df, store_root, week)
+        changed.append(week)
+    remove_store(scratch_root)
+    return changed
+
+
+def raw_forecast_paths() -> list:
+    return sorted(glob.glob(os.path.join(FORECAST_RAW_DIR, "*.xlsx")))
+
+
+def raw_consumption_paths() -> list:
+    return sorted(
+        glob.glob(os.path.join(CONSUMPTION_RAW_DIR, "*.xlsx"))
+        + glob.glob(os.path.join(CONSUMPTION_RAW_DIR, "*.csv"))
+    )
+
+
+def ensure_cleaned_stores(workers: int = 1) -> tuple:
+    """
+    Build the cleaned forecast and consumption stores from data/raw if they
+    are missing. Returns (has_forecast, has_consumption).
+    """
+    if not os.path.isdir(FORECAST_STORE):
+        ingest_forecast_files(raw_forecast_paths(), FORECAST_STORE, workers=workers)
+    if not os.path.isdir(CONSUMPTION_STORE):
+        paths = raw_consumption_paths()
+        if paths:
+            ingest_consumption_files(paths, CONSUMPTION_STORE, workers=workers)
+    return os.path.isdir(FORECAST_STORE), os.path.isdir(CONSUMPTION_STORE)
+
+
+def reset_cleaned_stores() -> None:
+    remove_store(FORECAST_STORE)
+    remove_store(CONSUMPTION_STORE)
+    remove_store(SNAPSHOT_STORE)
+
+
+def load_forecast_data():
+    """The cleaned forecast history on its own (no consumption needed), or None."""
+    if not os.path.isdir(FORECAST_STORE):
+        ingest_forecast_files(raw_forecast_paths(), FORECAST_STORE)
+    if not os.path.isdir(FORECAST_STORE):
+        return None
+    return read_store(FORECAST_STORE)
+
+
+def load_all_raw_data():
+    """Return the cleaned (forecast_long, consumption) frames, or None for missing ones."""
+    has_forecast, has_consumption = ensure_cleaned_stores()
+    if not has_forecast:
+        return None, None
+    forecast_long = read_store(FORECAST_STORE)
+    if not has_consumption:
+        return forecast_long, None
+    return forecast_long, read_store(CONSUMPTION_STORE)
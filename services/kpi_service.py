@@ -1,7 +1,10 @@
 # services/kpi_service.py
 import pandas as pd
 
+from services.perf import timed
 
+
+@timed()
 def calculate_kpis(df: pd.DataFrame):
     total_gap = (df['ForecastQty'] - df['ConsumptionQty']).sum()
     abs_total_gap = abs(total_gap)
@@ -16,6 +19,7 @@ def calculate_kpis(df: pd.DataFrame):
     return total_gap, abs_total_gap, average_deviation_percent
 
 
+@timed()
 def get_worst_plants(df: pd.DataFrame):
     plant_deviation = df.groupby("Plant")["Deviation"].mean()
     plant_over = plant_deviation.idxmax()
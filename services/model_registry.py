@@ -0,0 +1,127 @@
+# services/model_registry.py
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from services.OEM_project import OEMMapper
+from services.perf import timed
+from services.prediction_service import MODEL_PATH, load_model
+
+SEGMENTS_DIR = "inventory_ai_api/model/segments"
+MANIFEST_PATH = os.path.join(SEGMENTS_DIR, "manifest.json")
+SEGMENT_BY = ("plant", "bu")
+
+
+def segment_keys(plants: pd.Series, segment_by: str = "bu") -> pd.Series:
+    """Segment of every row: the plant code itself or its business unit (OEMMapper._PLANT_TO_BU)."""
+    if segment_by not in SEGMENT_BY:
+        raise ValueError(f"Unknown segment_by '{segment_by}'. Choose one of: {', '.join(SEGMENT_BY)}")
+    codes = plants.astype(str).str.strip().str.upper()
+    if segment_by == "plant":
+        return codes
+    # Map the few distinct codes, not every row
+    uniques = codes.unique()
+    mapping = {code: OEMMapper.get_plant_bu_mapping(code) for code in uniques}
+    return codes.map(mapping)
+
+
+def segment_model_path(key: str, directory: str = SEGMENTS_DIR) -> str:
+    safe_key = "".join(ch if ch.isalnum() else "_" for ch in str(key))
+    return os.path.join(directory, f"model_{safe_key}.pkl")
+
+
+class ModelRegistry:
+    """
+    One model per plant or business unit plus the global model.
+
+    Rows are routed to their segment's model; segments without a model (or
+    plants missing from OEMMapper) use the global model. Segments are
+    predicted concurrently on a thread pool, the tree ensembles release the
+    GIL while predicting.
+    """
+
+    def __init__(self, global_model=None, segment_models: dict = None, segment_by: str = "bu"):
+        self.global_model = global_model
+        self.segment_models = segment_models or {}
+        self.segment_by = segment_by
+
+    @classmethod
+    def load(cls, global_path: str = MODEL_PATH, manifest_path: str = MANIFEST_PATH):
+        """Registry from the global model file and the segment manifest, or None if neither exists."""
+        global_model = load_model(global_path)
+        segment_models = {}
+        segment_by = "bu"
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            segment_by = manifest.get("segment_by", segment_by)
+            for key, entry in manifest.get("segments", {}).items():
+                model = load_model(entry["path"])
+                if model is not None:
+                    segment_models[key] = model
+        if global_model is None and not segment_models:
+            return None
+        return cls(global_model, segment_models, segment_by)
+
+    @property
+    def segments(self) -> list:
+        return sorted(self.segment_models)
+
+    def predict(self, X: pd.DataFrame) -> np.ndarray:
+        """Global-model prediction, so the registry can stand in for a plain model."""
+        if self.global_model is None:
+            raise ValueError("No global model available for rows without a segment.")
+        return np.asarray(self.global_model.predict(X))
+
+    @timed("ModelRegistry.predict_segments")
+    def predict_segments(self, X: pd.DataFrame, plants: pd.Series, workers: int = None) -> np.ndarray:
+        """
+        Predictions aligned with X, each row scored by its segment model or the
+        global one. workers defaults to one thread per segment.
+        """
+        keys = segment_keys(plants, self.segment_by).to_numpy()
+        predicted = np.full(len(X), np.nan)
+
+        groups = {}
+        fallback = np.zeros(len(X), dtype=bool)
+        for key, positions in pd.Series(np.arange(len(X))).groupby(keys, sort=False):
+            if key in self.segment_models:
+                groups[key] = positions.to_numpy()
+            else:
+                fallback[positions.to_numpy()] = True
+
+        if fallback.any():
+            if self.global_model is None:
+                missing = sorted(set(keys[fallback]))
+                raise ValueError(f"No model for segment(s) {missing} and no global model to fall back to.")
+            groups[None] = np.flatnonzero(fallback)
+
+        def run(item):
+            key, positions = item
+            model = self.global_model if key is None else self.segment_models[key]
+            return positions, np.asarray(model.predict(X.iloc[positions]))
+
+        workers = len(groups) if workers is None else min(workers, len(groups))
+        if workers <= 1:
+            results = list(map(run, groups.items()))
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(run, groups.items()))
+        for positions, values in results:
+            predicted[positions] = values
+        return predicted
+
+
+def load_registry(global_path: str = MODEL_PATH, manifest_path: str = MANIFEST_PATH):
+    return ModelRegistry.load(global_path, manifest_path)
+
+
+def write_manifest(segments: dict, segment_by: str, path: str = MANIFEST_PATH) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"segment_by": segment_by, "segments": segments}, f, indent=2, default=str)
+    os.replace(tmp_path, path)
@@ -0,0 +1,221 @@
+# services/out_of_core.py
+import os
+import numpy as np
+import pandas as pd
+
+from services.data_service import merge_forecast_and_consumption
+from services.file_utils import clean_dataframe, week_sort_key
+from services.parquet_store import list_partitions, read_partition, replace_partition, remove_store
+from services.ingest_service import FORECAST_STORE, CONSUMPTION_STORE
+from services.perf import timed
+from services.series_store import SERIES_STORE, SeriesStoreWriter
+
+MERGED_STORE = "data/merged/merged_partitions"
+AGGREGATES_PATH = "data/merged/plant_week_aggregates.parquet"
+
+AGGREGATE_COLUMNS = [
+    "Week", "Plant", "ForecastQty", "ConsumptionQty",
+    "AbsGap", "DeviationSum", "Rows", "Value"
+]
+
+
+def merge_week(week: str, forecast_root: str = FORECAST_STORE, consumption_root: str = CONSUMPTION_STORE) -> pd.DataFrame:
+    """Merge a single week partition. Week is part of the join key, so this
+    gives exactly the rows the full merge would give for that week."""
+    forecast_df = read_partition(forecast_root, week)
+    consumption_df = read_partition(consumption_root, week)
+    merged_df = merge_forecast_and_consumption(forecast_df, consumption_df)
+    merged_df = clean_dataframe(merged_df)
+    for col in merged_df.select_dtypes(include=['object']).columns:
+        merged_df[col] = merged_df[col].astype(str)
+    return merged_df
+
+
+def partial_aggregates(merged_df: pd.DataFrame) -> pd.DataFrame:
+    """Per Week/Plant partial sums from which every plant and KPI figure can be rebuilt."""
+    if merged_df.empty:
+        return pd.DataFrame(columns=AGGREGATE_COLUMNS)
+
+    gap = merged_df["ForecastQty"] - merged_df["ConsumptionQty"]
+    if "Tot.us.val" in merged_df.columns:
+        value = pd.to_numeric(merged_df["Tot.us.val"], errors="coerce")
+    else:
+        value = pd.Series(np.nan, index=merged_df.index)
+    parts = pd.DataFrame({
+        "Week": merged_df["Week"],
+        "Plant": merged_df["Plant"],
+        "ForecastQty": merged_df["ForecastQty"],
+        "ConsumptionQty": merged_df["ConsumptionQty"],
+        "AbsGap": gap.abs(),
+        "DeviationSum": merged_df["Deviation"],
+        "Rows": 1,
+        "Value": value,
+    })
+    return parts.groupby(["Week", "Plant"], as_index=False).sum(min_count=1)
+
+
+@timed()
+def run_out_of_core_merge(
+    forecast_root: str = FORECAST_STORE,
+    consumption_root: str = CONSUMPTION_STORE,
+    merged_root: str = MERGED_STORE,
+    aggregates_path: str = AGGREGATES_PATH,
+    series_root: str = SERIES_STORE
+) -> pd.DataFrame:
+    """
+    Merge forecast and consumption one week at a time.
+
+    Each week's merged rows are written to their own partition, reduced to
+    Week/Plant partial aggregates and written as the series store's column
+    for that week before the next week is read, so peak memory follows the
+    largest single week rather than the whole history.
+    """
+    weeks = sorted(set(list_partitions(forecast_root)) & set(list_partitions(consumption_root)))
+
+    remove_store(merged_root)
+    series_tmp = series_root + ".tmp"
+    remove_store(series_tmp)
+    series = SeriesStoreWriter(series_tmp)
+    partials = []
+    for week in weeks:
+        merged_week = merge_week(week, forecast_root, consumption_root)
+        if merged_week.empty:
+            continue
+        replace_partition(merged_week, merged_root, week)
+        partials.append(partial_aggregates(merged_week))
+        series.write_week(merged_week, week)
+
+    remove_store(series_root)
+    if series.weeks:
+        series.close()
+        os.replace(series_tmp, series_root)
+
+    if partials:
+        aggregates = pd.concat(partials, ignore_index=True)
+    else:
+        aggregates = pd.DataFrame(columns=AGGREGATE_COLUMNS)
+
+    os.makedirs(os.path.dirname(aggregates_path), exist_ok=True)
+    aggregates.to_parquet(aggregates_path, index=False)
+    return aggregates
+
+
+@timed()
+def append_merged_weeks(
+    weeks,
+    forecast_root: str = FORECAST_STORE,
+    consumption_root: str = CONSUMPTION_STORE,
+    merged_root: str = MERGED_STORE,
+    aggregates_path: str = AGGREGATES_PATH,
+    series_root: str = SERIES_STORE
+) -> pd.DataFrame:
+    """
+    Re-merge only `weeks` and fold them into the merged partitions, the
+    Week/Plant partial aggregates and the series store, whose other week
+    columns are not read or rewritten. The cost follows the new weeks, not
+    the history. Returns the updated aggregates.
+    """
+    available = set(list_partitions(forecast_root)) & set(list_partitions(consumption_root))
+    weeks = sorted(set(weeks), key=week_sort_key)
+
+    aggregates = load_aggregates(aggregates_path)
+    if aggregates is None:
+        aggregates = pd.DataFrame(columns=AGGREGATE_COLUMNS)
+    series = SeriesStoreWriter(series_root)
+
+    partials = []
+    for week in weeks:
+        merged_week = merge_week(week, forecast_root, consumption_root) if week in available else pd.DataFrame()
+        if merged_week.empty:
+            remove_store(os.path.join(merged_root, week))
+            series.remove_week(week)
+            continue
+        replace_partition(merged_week, merged_root, week)
+        partials.append(partial_aggregates(merged_week))
+        series.write_week(merged_week, week)
+
+    kept = aggregates[~aggregates["Week"].isin(weeks)]
+    aggregates = pd.concat([kept] + partials, ignore_index=True) if partials else kept
+    os.makedirs(os.path.dirname(aggregates_path), exist_ok=True)
+    aggregates.to_parquet(aggregates_path, index=False)
+    if weeks:
+        series.close()
+    return aggregates
+
+
+def load_aggregates(aggregates_path: str = AGGREGATES_PATH):
+    if not os.path.exists(aggregates_path):
+        return None
+    return pd.read_parquet(aggregates_path)
+
+
+def _select_weeks(aggregates: pd.DataFrame, weeks=None) -> pd.DataFrame:
+    if weeks is None:
+        return aggregates
+    return aggregates[aggregates["Week"].isin(weeks)]
+
+
+def combine_gap_by_plant(aggregates: pd.DataFrame, weeks=None) -> pd.DataFrame:
+    """Same output as summarize_gap_by_plant, rebuilt from partial aggregates."""
+    aggregates = _select_weeks(aggregates, weeks)
+    if aggregates.empty:
+        return pd.DataFrame(columns=["Plant", "ForecastQty", "ConsumptionQty", "GapPercent"])
+
+    grouped = aggregates.groupby("Plant")[["ForecastQty", "ConsumptionQty"]].sum().reset_index()
+    grouped["GapPercent"] = ((grouped["ForecastQty"] - grouped["ConsumptionQty"]) / grouped["ForecastQty"])
+    grouped["GapPercent"] = grouped["GapPercent"].round(2)
+    return grouped[["Plant", "ForecastQty", "ConsumptionQty", "GapPercent"]]
+
+
+def combine_kpis(aggregates: pd.DataFrame, weeks=None):
+    """Same output as calculate_kpis, rebuilt from partial aggregates."""
+    aggregates = _select_weeks(aggregates, weeks)
+    total_forecast = aggregates["ForecastQty"].sum()
+    total_gap = total_forecast - aggregates["ConsumptionQty"].sum()
+    abs_total_gap = abs(total_gap)
+
+    if total_forecast == 0:
+        average_deviation_percent = 0
+    else:
+        average_deviation_percent = round(aggregates["AbsGap"].sum() / total_forecast * 100, 2)
+
+    return total_gap, abs_total_gap, average_deviation_percent
+
+
+def combine_worst_plants(aggregates: pd.DataFrame, weeks=None):
+    """Same output as get_worst_plants, rebuilt from partial aggregates."""
+    grouped = _select_weeks(aggregates, weeks).groupby("Plant")[["DeviationSum", "Rows"]].sum()
+    plant_deviation = grouped["DeviationSum"] / grouped["Rows"]
+    return plant_deviation.idxmax(), plant_deviation.idxmin()
+
+
+def combine_value_by_plant(aggregates: pd.DataFrame, weeks=None):
+    """Consumption value (Tot.us.val) per plant, or None when no value column was loaded."""
+    aggregates = _select_weeks(aggregates, weeks)
+    if aggregates["Value"].isna().all():
+        return None
+    return aggregates.groupby("Plant")["Value"].sum().reset_index().rename(columns={"Value": "Tot.us.val"})
+
+
+def read_merged_weeks(weeks=None, columns=None, material=None, merged_root: str = MERGED_STORE) -> pd.DataFrame:
+    """Read merged partitions one at a time, optionally keeping only one material."""
+    weeks = list_partitions(merged_root) if weeks is None else weeks
+    parts = []
+    for week in weeks:
+        part = read_partition(merged_root, week, columns)
+        if material is not None:
+            part = part[part["Material"] == material]
+        if not part.empty:
+            parts.append(part)
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(parts, ignore_index=True)
+
+
+def list_merged_values(column: str, weeks=None, merged_root: str = MERGED_STORE) -> list:
+    """Distinct values of one column across the merged partitions."""
+    weeks = list_partitions(merged_root) if weeks is None else weeks
+    values = set()
+    for week in weeks:
+        values.update(read_partition(merged_root, week, [column])[column].unique())
+    return sorted(values)
@@ -0,0 +1,77 @@
+# services/parquet_store.py
+import os
+import glob
+import shutil
+import pandas as pd
+
+from services.perf import timed
+
+
+def list_partitions(root: str) -> list:
+    """Return the partition keys (one sub-folder per key) present in a store."""
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        name for name in os.listdir(root)
+        if os.path.isdir(os.path.join(root, name))
+    )
+
+
+@timed()
+def write_partition(df: pd.DataFrame, root: str, partition_col: str = "Week", part_prefix: str = "") -> None:
+    """
+    Append rows to the store, adding one part file per partition value.
+    Writers running in parallel must use distinct `part_prefix` values.
+    """
+    if df.empty:
+        return
+    for key, part in df.groupby(partition_col, sort=False):
+        part_dir = os.path.join(root, str(key))
+        os.makedirs(part_dir, exist_ok=True)
+        part_no = len(glob.glob(os.path.join(part_dir, f"part-{part_prefix}*.parquet")))
+        part.to_parquet(os.path.join(part_dir, f"part-{part_prefix}{part_no:05d}.parquet"), index=False)
+
+
+@timed()
+def replace_partition(df: pd.DataFrame, root: str, key) -> None:
+    """Overwrite a single partition with the given rows."""
+    part_dir = os.path.join(root, str(key))
+    if os.path.isdir(part_dir):
+        shutil.rmtree(part_dir)
+    os.makedirs(part_dir, exist_ok=True)
+    df.to_parquet(os.path.join(part_dir, "part-00000.parquet"), index=False)
+
+
+def read_partition(root: str, key, columns=None) -> pd.DataFrame:
+    part_files = sorted(glob.glob(os.path.join(root, str(key), "part-*.parquet")))
+    if not part_files:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(
+        [pd.read_parquet(path, columns=columns) for path in part_files],
+        ignore_index=True
+    )
+
+
+def partition_rows(root: str, key) -> int:
+    """Row count of one partition from the parquet footers, without reading any data."""
+    import pyarrow.parquet as pq
+    part_files = glob.glob(os.path.join(root, str(key), "part-*.parquet"))
+    return sum(pq.read_metadata(path).num_rows for path in part_files)
+
+
+@timed()
+def read_store(root: str, columns=None, keys=None) -> pd.DataFrame:
+    """Read the given partitions (all of them by default) into one frame."""
+    keys = list_partitions(root) if keys is None else keys
+    parts = [read_partition(root, key, columns) for key in keys]
+    parts = [part for part in parts if not part.empty]
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(parts, ignore_index=True)
+
+
+def remove_store(root: str) -> None:
+    if os.path.isdir(root):
+        shutil.rmtree(root)
+    elif os.path.exists(root):
+        os.remove(root)
@@ -0,0 +1,219 @@
+# services/perf.py
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+TRACE_DIR = "data/perf"
+
+# Module state survives Streamlit reruns, so this marks worker start-up.
+PROCESS_START = time.perf_counter()
+_startup_seconds = None
+
+# Each Streamlit session reruns its script on its own thread, so spans are
+# collected per thread and reset at the start of every rerun.
+_local = threading.local()
+
+# tracemalloc is process wide: one traced-memory total and one peak counter
+# shared by every thread. Tracing runs only while at least one run asked for
+# it, and a span's memory is only reported when no span on another thread
+# was open at the same time.
+_memory_lock = threading.Lock()
+_memory_runs = 0
+_started_tracing = False
+_open_spans = {}        # thread id -> open span count
+_memory_stacks = {}     # thread id -> that thread's open memory entries
+
+
+def _state():
+    if not hasattr(_local, "spans"):
+        _local.spans = []
+        _local.depth = 0
+        _local.run_start = time.perf_counter()
+        _local.track_memory = False
+        _local.memory_stack = []
+    return _local
+
+
+def start_run(track_memory: bool = False) -> None:
+    """Forget the previous rerun's spans and start timing a new one."""
+    global _memory_runs, _started_tracing
+    end_run()
+    state = _state()
+    state.spans = []
+    state.depth = 0
+    state.run_start = time.perf_counter()
+    state.track_memory = track_memory
+    state.memory_stack = []
+    if track_memory:
+        with _memory_lock:
+            _memory_runs += 1
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _started_tracing = True
+
+
+def end_run() -> None:
+    """Stop memory tracking for this thread's run; tracing stops with the last such run."""
+    global _memory_runs, _started_tracing
+    state = _state()
+    if not state.track_memory:
+        return
+    state.track_memory = False
+    with _memory_lock:
+        _memory_runs = max(0, _memory_runs - 1)
+        if _memory_runs == 0 and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+
+def _enter_span(state, track_memory: bool):
+    """Register an open span; any overlap with another thread's spans voids their memory figures."""
+    thread = threading.get_ident()
+    with _memory_lock:
+        overlapping = any(count for other, count in _open_spans.items() if other != thread)
+        _open_spans[thread] = _open_spans.get(thread, 0) + 1
+        if overlapping:
+            for stack in _memory_stacks.values():
+                for entry in stack:
+                    entry[2] = True
+        if not track_memory:
+            return
+        _memory_stacks[thread] = state.memory_stack
+        # tracemalloc has a single peak counter: hand the peak seen so far to
+        # the enclosing span before resetting it for this one.
+        current, peak = tracemalloc.get_traced_memory()
+        if state.memory_stack:
+            state.memory_stack[-1][1] = max(state.memory_stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        state.memory_stack.append([current, current, overlapping])
+
+
+def _exit_span(state, track_memory: bool, record: dict) -> None:
+    thread = threading.get_ident()
+    with _memory_lock:
+        _open_spans[thread] -= 1
+        if not _open_spans[thread]:
+            del _open_spans[thread]
+        if not track_memory:
+            return
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        mem_before, child_peak, overlapped = state.memory_stack.pop()
+        if not state.memory_stack:
+            _memory_stacks.pop(thread, None)
+        if overlapped or not tracemalloc.is_tracing():
+            return
+        peak = max(peak, child_peak)
+        if state.memory_stack:
+            state.memory_stack[-1][1] = max(state.memory_stack[-1][1], peak)
+        record["alloc_mb"] = (current - mem_before) / 1e6
+        record["peak_mb"] = (peak - mem_before) / 1e6
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time a block. Nested spans are recorded with their depth."""
+    state = _state()
+    track_memory = state.track_memory and tracemalloc.is_tracing()
+    _enter_span(state, track_memory)
+    start = time.perf_counter()
+    state.depth += 1
+    try:
+        yield
+    finally:
+        state.depth -= 1
+        record = {
+            "name": name,
+            "start": start - state.run_start,
+            "seconds": time.perf_counter() - start,
+            "depth": state.depth,
+            "thread": threading.get_ident(),
+        }
+        _exit_span(state, track_memory, record)
+        if attrs:
+            record["attrs"] = attrs
+        state.spans.append(record)
+
+
+def timed(name: str = None):
+    """Decorator form of span(); defaults to module.function as the span name."""
+    def decorator(fn):
+        label = name or f"{fn.__module__.split('.')[-1]}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_startup() -> float:
+    """Seconds from worker start-up to the end of the first rerun (recorded once)."""
+    global _startup_seconds
+    if _startup_seconds is None:
+        _startup_seconds = time.perf_counter() - PROCESS_START
+    return _startup_seconds
+
+
+def startup_seconds():
+    return _startup_seconds
+
+
+def run_seconds() -> float:
+    """Seconds since start_run() on this thread."""
+    return time.perf_counter() - _state().run_start
+
+
+def get_spans() -> list:
+    return list(_state().spans)
+
+
+def summarize_spans(spans=None) -> list:
+    """Aggregate spans by name: calls, total/max seconds and peak memory."""
+    spans = get_spans() if spans is None else spans
+    summary = {}
+    for record in spans:
+        row = summary.setdefault(record["name"], {
+            "name": record["name"], "calls": 0, "total_s": 0.0, "max_s": 0.0, "peak_mb": None
+        })
+        row["calls"] += 1
+        row["total_s"] += record["seconds"]
+        row["max_s"] = max(row["max_s"], record["seconds"])
+        if "peak_mb" in record:
+            row["peak_mb"] = max(row["peak_mb"] or 0.0, record["peak_mb"])
+    return sorted(summary.values(), key=lambda row: row["total_s"], reverse=True)
+
+
+def to_chrome_trace(spans=None) -> dict:
+    """Spans in Chrome trace-event format (chrome://tracing, Perfetto)."""
+    spans = get_spans() if spans is None else spans
+    events = []
+    for record in spans:
+        args = dict(record.get("attrs", {}))
+        for key in ("alloc_mb", "peak_mb"):
+            if key in record:
+                args[key] = round(record[key], 3)
+        events.append({
+            "name": record["name"],
+            "ph": "X",
+            "ts": record["start"] * 1e6,
+            "dur": record["seconds"] * 1e6,
+            "pid": os.getpid(),
+            "tid": record["thread"],
+            "args": args,
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def export_trace(path: str = None, spans=None) -> str:
+    """Write the current rerun's spans as a Chrome trace file and return its path."""
+    if path is None:
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        path = os.path.join(TRACE_DIR, f"trace_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(to_chrome_trace(spans), f)
+    return path
@@ -0,0 +1,178 @@
+# services/pipeline.py
+import json
+import os
+
+import pandas as pd
+
+from services.config import is_out_of_core, DATAFRAME_ENGINE
+from services.engine import get_engine
+from services.file_utils import clean_dataframe, path_mtime, week_sort_key
+from services.ingest_service import (
+    FORECAST_STORE, CONSUMPTION_STORE, ensure_cleaned_stores, reset_cleaned_stores,
+    load_all_raw_data, load_forecast_data, append_forecast_files, append_consumption_files
+)
+from services.out_of_core import (
+    MERGED_STORE, AGGREGATES_PATH, run_out_of_core_merge, partial_aggregates, append_merged_weeks,
+    combine_kpis, combine_worst_plants, combine_gap_by_plant
+)
+from services.parquet_store import write_partition, remove_store
+from services.perf import span
+from services.series_store import build_series_store
+from services.model_registry import load_registry
+from services.prediction_service import MODEL_PATH, PREDICTIONS_PATH, predict_consumption
+
+LATEST_PARQUET = "data/merged/latest.parquet"
+LATEST_CSV = "data/merged/latest.csv"
+FORECAST_ONLY_CSV = "data/merged/latest_forecast_only.csv"
+SUMMARY_PATH = "data/merged/summary.json"
+
+
+def finalize_merged(merged_df: pd.DataFrame) -> pd.DataFrame:
+    merged_df = clean_dataframe(merged_df)
+    # Fix mixed types: force all object columns to str
+    for col in merged_df.select_dtypes(include=['object']).columns:
+        merged_df[col] = merged_df[col].astype(str)
+    return merged_df
+
+
+def write_latest(merged_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    latest.parquet/csv plus the week partitions, partial aggregates and
+    series store derived from it, so later weeks can be appended without a
+    full merge (see run_append_step). latest.* are exports of this full
+    merge; appends only update the partitions, which the dashboards read.
+    Returns the aggregates.
+    """
+    merged_df.to_csv(LATEST_CSV, index=False)
+    merged_df.to_parquet(LATEST_PARQUET, index=False)
+    remove_store(MERGED_STORE)
+    write_partition(merged_df, MERGED_STORE)
+    aggregates = partial_aggregates(merged_df)
+    aggregates.to_parquet(AGGREGATES_PATH, index=False)
+    build_series_store(merged_df)
+    return aggregates
+
+
+def merged_is_stale() -> bool:
+    """True when the merged partitions are missing or older than either cleaned store."""
+    # Every full merge and every append rewrites the aggregates
+    if not (os.path.isdir(MERGED_STORE) and os.path.exists(AGGREGATES_PATH)):
+        return True
+    written = os.path.getmtime(AGGREGATES_PATH)
+    return any(
+        os.path.exists(store) and path_mtime(store) > written
+        for store in (FORECAST_STORE, CONSUMPTION_STORE)
+    )
+
+
+def run_merge_step(out_of_core: bool):
+    """Merge the cleaned stores and return the Week/Plant partial aggregates (or None)."""
+    if out_of_core:
+        return run_out_of_core_merge()
+
+    forecast_long, mcsk_df = load_all_raw_data()
+    if forecast_long is None or mcsk_df is None:
+        return None
+    merged_df = finalize_merged(get_engine().merge_forecast_and_consumption(forecast_long, mcsk_df))
+    with span("pipeline.write_merged"):
+        return write_latest(merged_df)
+
+
+def can_append() -> bool:
+    """True when the cleaned stores, merged partitions and aggregates exist to append weeks to."""
+    return all(os.path.exists(path) for path in (FORECAST_STORE, CONSUMPTION_STORE, MERGED_STORE, AGGREGATES_PATH))
+
+
+def run_append_step(forecast_paths=(), consumption_paths=(), workers: int = 1) -> dict:
+    """
+    Fold newly arrived forecast/consumption files into every derived store:
+    only their weeks are cleaned and merged, and the aggregates, series
+    store, snapshot store and summary are updated from that delta. Returns
+    {"weeks": [...], "aggregates": DataFrame}.
+    """
+    forecast_weeks, consumption_weeks = [], []
+    if forecast_paths:
+        with span("append.forecast"):
+            forecast_weeks = append_forecast_files(forecast_paths, workers=workers)
+    if consumption_paths:
+        with span("append.consumption"):
+            consumption_weeks = append_consumption_files(consumption_paths, workers=workers)
+    weeks = sorted(set(forecast_weeks) | set(consumption_weeks), key=week_sort_key)
+
+    with span("append.merge"):
+        aggregates = append_merged_weeks(weeks)
+    if not aggregates.empty:
+        write_summary(aggregates)
+    return {"weeks": weeks, "aggregates": aggregates}
+
+
+def write_summary(aggregates: pd.DataFrame, path: str = SUMMARY_PATH) -> dict:
+    total_gap, abs_total_gap, average_deviation_percent = combine_kpis(aggregates)
+    plant_over, plant_under = combine_worst_plants(aggregates)
+    summary = {
+        "weeks": sorted(aggregates["Week"].unique().tolist()),
+        "total_gap": float(total_gap),
+        "abs_total_gap": float(abs_total_gap),
+        "average_deviation_percent": float(average_deviation_percent),
+        "plant_over": plant_over,
+        "plant_under": plant_under,
+        "gap_by_plant": combine_gap_by_plant(aggregates).to_dict(orient="records"),
+    }
+    with open(path, "w") as f:
+        json.dump(summary, f, indent=2, default=str)
+    return summary
+
+
+def run_prediction_step(model_path: str = MODEL_PATH, workers: int = 1):
+    model = load_registry(model_path)
+    if model is None:
+        return None
+    forecast_long = load_forecast_data()
+    if forecast_long is None:
+        return None
+    forecast_long = clean_dataframe(forecast_long)
+    forecast_long.to_csv(FORECAST_ONLY_CSV, index=False)
+    predictions = predict_consumption(model, forecast_long, workers=workers)
+    predictions.to_parquet(PREDICTIONS_PATH, index=False)
+    return predictions
+
+
+def run_pipeline(workers: int = 1, rebuild: bool = False, out_of_core: bool = None,
+                 predict: bool = True, model_path: str = MODEL_PATH, log=print) -> dict:
+    """
+    Headless ingest -> clean -> merge -> aggregate -> predict over data/raw,
+    writing the same files the dashboards read.
+    """
+    out_of_core = is_out_of_core() if out_of_core is None else out_of_core
+    for folder in ["data/raw/forecast", "data/raw/consumption", "data/merged"]:
+        os.makedirs(folder, exist_ok=True)
+
+    result = {"engine": DATAFRAME_ENGINE, "out_of_core": out_of_core}
+
+    if rebuild:
+        reset_cleaned_stores()
+    with span("pipeline.ingest"):
+        has_forecast, has_consumption = ensure_cleaned_stores(workers=workers)
+    log(f"Ingest: forecast store {'ready' if has_forecast else 'missing'}, "
+        f"consumption store {'ready' if has_consumption else 'missing'}")
+
+    if has_forecast and has_consumption:
+        with span("pipeline.merge"):
+            aggregates = run_merge_step(out_of_core)
+        if aggregates is not None and not aggregates.empty:
+            with span("pipeline.summary"):
+                result["summary"] = write_summary(aggregates)
+            log(f"Merge: {int(aggregates['Rows'].sum()):,} rows across {aggregates['Week'].nunique()} weeks")
+        else:
+            log("Merge: no overlapping forecast/consumption rows")
+
+    if predict:
+        with span("pipeline.predict"):
+            predictions = run_prediction_step(model_path, workers)
+        if predictions is None:
+            log(f"Predict: skipped (no model at {model_path} or no forecast data)")
+        else:
+            result["predictions"] = len(predictions)
+            log(f"Predict: {len(predictions):,} rows written to {PREDICTIONS_PATH}")
+
+    return result
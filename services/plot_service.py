@@ -1,13 +1,11 @@
 # services/plot_service.py
-import matplotlib.pyplot as plt
-import seaborn as sns
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 
-import plotly.express as px
-import pandas as pd
+from services.perf import timed
 
+@timed()
 def plot_gap_by_plant(df: pd.DataFrame):
     fig = px.bar(
         df,
@@ -29,6 +27,7 @@ def plot_gap_by_plant(df: pd.DataFrame):
     )
     return fig
 
+@timed()
 def plot_forecast_vs_prediction(df: pd.DataFrame):
     df_long = df.melt(
         id_vars=['Week'],
@@ -40,10 +39,12 @@ def plot_forecast_vs_prediction(df: pd.DataFrame):
     fig.update_layout(xaxis_tickangle=-45)
     return fig
 
+@timed()
 def plot_prediction_distribution(df: pd.DataFrame):
     fig = px.histogram(df, x='AI_Prediction', nbins=30, title="AI Prediction Distribution", marginal="box", color_discrete_sequence=["#2196F3"])
     return fig
 
+@timed()
 def plot_consumption_vs_forecast(df: pd.DataFrame, plant_filter=None, material_filter=None):
     if plant_filter:
         df = df[df['Plant'] == plant_filter]
@@ -89,4 +90,45 @@ def plot_consumption_vs_forecast(df: pd.DataFrame, plant_filter=None, material_f
         template="simple_white",
         legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
     )
-    return fig
\ No newline at end of file
+    return fig
+
+
+@timed()
+def plot_forecast_evolution(df: pd.DataFrame):
+    target_week = df["TargetWeek"].iloc[0] if not df.empty else ""
+    fig = px.line(df, x="Snapshot", y="ForecastQty", markers=True,
+                  title=f"Forecast for week {target_week} across snapshots")
+    fig.update_layout(
+        xaxis_title="Snapshot week",
+        yaxis_title="Forecast Qty",
+        template="simple_white",
+        height=400
+    )
+    return fig
+
+
+@timed()
+def plot_gap_by_group(df: pd.DataFrame, keys: list, top: int = 20):
+    """Gap % of the `top` groups with the largest absolute gap (df sorted by AbsGap)."""
+    df = df.head(top).copy()
+    df["Group"] = df[keys].astype(str).agg(" / ".join, axis=1)
+    fig = px.bar(
+        df,
+        x="Group",
+        y="GapPercent",
+        text="GapPercent",
+        color="GapPercent",
+        color_continuous_scale="RdBu",
+        hover_data=["ForecastQty", "ConsumptionQty", "AbsGap", "Materials"],
+        title=f"Deviation % by {' + '.join(keys)} (largest {len(df)} by absolute gap)"
+    )
+    fig.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
+    fig.update_layout(
+        yaxis_title="Deviation %",
+        xaxis_title=" / ".join(keys),
+        uniformtext_minsize=8,
+        uniformtext_mode='hide',
+        template="simple_white",
+        height=450
+    )
+    return fig
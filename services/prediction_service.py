@@ -0,0 +1,138 @@
+# services/prediction_service.py
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from services.perf import timed
+from services.file_utils import path_mtime
+
+MODEL_PATH = "inventory_ai_api/model/inventory_model.pkl"
+PREDICTIONS_PATH = "data/merged/predictions.parquet"
+
+FEATURE_COLS = ['ForecastQty', 'WIP', 'Stock', 'MRP BACKLOG',
+                'Price from Info Record', 'Price unit', 'Safety Stock']
+
+LOW_RISK = "Low risk"
+HIGH_BACKLOG = "High backlog — supplier delays likely"
+LOW_SUPPLY = "Low WIP & Stock — supply shortage risk"
+OVER_FORECAST = "Over-forecasting with high safety stock"
+NEEDS_INVESTIGATION = "Forecast deviation — needs investigation"
+
+
+def load_model(path: str = MODEL_PATH, prefer_compiled: bool = True):
+    """
+    The model at `path`, or its compiled NumPy export (services.compiled_model)
+    when one exists that is at least as new as the pickle.
+    """
+    if prefer_compiled:
+        from services.compiled_model import compiled_path_for, load_compiled
+        compiled_path = compiled_path_for(path)
+        if os.path.exists(compiled_path) and (
+                not os.path.exists(path) or os.path.getmtime(compiled_path) >= os.path.getmtime(path)):
+            return load_compiled(compiled_path)
+    if not os.path.exists(path):
+        return None
+    import joblib
+    return joblib.load(path)
+
+
+def build_feature_matrix(df: pd.DataFrame) -> pd.DataFrame:
+    """The model's input frame; missing feature columns are filled with 0."""
+    for col in FEATURE_COLS:
+        if col not in df.columns:
+            df[col] = 0
+    return df[FEATURE_COLS].rename(columns={"ForecastQty": "Total_MRP"})
+
+
+@timed()
+def predict_in_parallel(model, X: pd.DataFrame, workers: int = 1, chunk_rows: int = 50_000) -> np.ndarray:
+    """model.predict over row chunks on a thread pool (tree ensembles release the GIL)."""
+    if workers <= 1 or len(X) <= chunk_rows:
+        return np.asarray(model.predict(X))
+    chunks = [X.iloc[start:start + chunk_rows] for start in range(0, len(X), chunk_rows)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return np.concatenate(list(pool.map(model.predict, chunks)))
+
+
+def generate_risk_explanation(row):
+    if abs(row.get('Predicted_GapPercent', 0)) < 50:
+        return LOW_RISK
+    if row.get('MRP BACKLOG', 0) > 10000:
+        return HIGH_BACKLOG
+    if row.get('WIP', 0) < 500 and row.get('Stock', 0) < 500:
+        return LOW_SUPPLY
+    if row.get('Safety Stock', 0) > 5000 and row.get('Predicted_ConsumptionQty', 0) < (0.5 * row.get('ForecastQty', 1)):
+        return OVER_FORECAST
+    return NEEDS_INVESTIGATION
+
+
+RISK_LABELS = [LOW_RISK, HIGH_BACKLOG, LOW_SUPPLY, OVER_FORECAST, NEEDS_INVESTIGATION]
+
+
+def risk_codes(gap_percent, backlog, wip, stock, safety_stock, predicted, forecast) -> np.ndarray:
+    """
+    generate_risk_explanation's rules on NumPy arrays, as positions in
+    RISK_LABELS. Inputs broadcast, so a (scenarios x rows) batch works too.
+    """
+    with np.errstate(invalid="ignore"):
+        conditions = [
+            np.abs(gap_percent) < 50,
+            backlog > 10000,
+            (wip < 500) & (stock < 500),
+            (safety_stock > 5000) & (predicted < 0.5 * forecast),
+        ]
+    return np.select(conditions, [0, 1, 2, 3], default=4)
+
+
+@timed()
+def explain_risk(df: pd.DataFrame) -> pd.Series:
+    """Vectorised generate_risk_explanation: same rules, same order, whole frame at once."""
+    def column(name, default=0):
+        if name in df.columns:
+            return df[name].to_numpy()
+        return np.full(len(df), default)
+
+    codes = risk_codes(
+        column('Predicted_GapPercent'), column('MRP BACKLOG'), column('WIP'), column('Stock'),
+        column('Safety Stock'), column('Predicted_ConsumptionQty'), column('ForecastQty', 1)
+    )
+    return pd.Series(np.asarray(RISK_LABELS, dtype=object)[codes], index=df.index)
+
+
+def add_prediction_columns(df: pd.DataFrame, predicted: np.ndarray) -> pd.DataFrame:
+    df['Predicted_ConsumptionQty'] = predicted
+    df['Predicted_Gap'] = df['ForecastQty'] - df['Predicted_ConsumptionQty']
+    df['Predicted_GapPercent'] = np.where(
+        df['ForecastQty'] != 0,
+        (df['Predicted_Gap'] / df['ForecastQty']) * 100,
+        0
+    )
+    df['Risk Explanation'] = explain_risk(df)
+    return df
+
+
+def predict_consumption(model, forecast_long: pd.DataFrame, workers: int = 1) -> pd.DataFrame:
+    """
+    Predicted consumption, gap, gap % and risk explanation for every forecast row.
+    A ModelRegistry (services.model_registry) routes rows to per-segment models.
+    """
+    X = build_feature_matrix(forecast_long)
+    if getattr(model, "segment_models", None) and "Plant" in forecast_long.columns:
+        predicted = model.predict_segments(X, forecast_long["Plant"])
+    else:
+        predicted = predict_in_parallel(getattr(model, "global_model", model), X, workers)
+    return add_prediction_columns(forecast_long, predicted)
+
+
+def load_precomputed_predictions(path: str = PREDICTIONS_PATH, newer_than=()):
+    """Predictions written by the batch CLI, or None if missing or older than any of `newer_than`."""
+    if not os.path.exists(path):
+        return None
+    written = os.path.getmtime(path)
+    for source in newer_than:
+        if source and os.path.exists(source) and path_mtime(source) > written:
+            return None
+    return pd.read_parquet(path)
+
@@ -5,10 +5,10 @@ def create_features(df):
     Create time-series features for forecasting.
     Includes week parsing, date indexing, lag and rolling mean features.
     """
-    # Extract Week number and Year from Week format "W01-2023"
-    week_year = df['Week'].str.extract(r'W(\d{2})-(\d{4})')  # Extract week and full year
+    # Extract Week number and Year from Week format "W01-2023" (or "W01-23" as in the YPPMPL file names)
+    week_year = df['Week'].str.extract(r'W(\d{2})-(\d{4}|\d{2})')
     df['Week_num'] = week_year[0].astype(int)
-    df['Year'] = week_year[1]
+    df['Year'] = week_year[1].where(week_year[1].str.len() == 4, '20' + week_year[1])
 
     # Create datetime index from week number (ISO calendar)
     df['Time_index'] = pd.to_datetime(
@@ -0,0 +1,158 @@
+# services/quick_look.py
+"""
+Quick-look KPIs from a stratified sample of the cleaned stores.
+
+Forecast rows are sampled per Plant/Week stratum (simple random sampling
+without replacement), joined to their consumption rows, and the merged
+totals are estimated with stratum weights N_h / n_h. calculate_kpis and
+summarize_gap_by_plant figures come with normal-approximation confidence
+bounds, so the explore page can show them while the full merge runs.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+from services.config import QUICK_LOOK_FRACTION, QUICK_LOOK_MIN_PER_STRATUM
+from services.ingest_service import FORECAST_STORE, CONSUMPTION_STORE
+from services.parquet_store import list_partitions, read_partition, partition_rows
+from services.perf import timed
+
+KEYS = ["Material", "Plant", "Week"]
+Z_95 = 1.96
+
+
+def stratified_sample(df: pd.DataFrame, fraction: float, min_per_stratum: int,
+                      strata=("Plant", "Week"), seed: int = 0) -> pd.DataFrame:
+    """
+    Rows sampled per stratum, with the stratum size N_h and sample size n_h
+    attached. Strata smaller than `min_per_stratum` are taken whole.
+    """
+    strata = list(strata)
+    if df.empty:
+        return df.assign(N_h=pd.Series(dtype=int), n_h=pd.Series(dtype=int))
+    rng = np.random.default_rng(seed)
+    shuffled = df.iloc[np.argsort(rng.random(len(df)))]
+    sizes = shuffled.groupby(strata, sort=False)[strata[0]].transform("size")
+    wanted = np.minimum(np.maximum(np.ceil(sizes * fraction), min_per_stratum), sizes)
+    taken = shuffled.groupby(strata, sort=False).cumcount()
+    sample = shuffled[taken < wanted].copy()
+    sample["N_h"] = sizes[taken < wanted].astype(int)
+    sample["n_h"] = wanted[taken < wanted].astype(int)
+    return sample.reset_index(drop=True)
+
+
+def unit_contributions(forecast_sample: pd.DataFrame, consumption_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per sampled forecast row, what it adds to the merged totals: forecast and
+    consumption summed over its matching consumption rows, and the absolute
+    gap. Rows without consumption add 0 (the merge is an inner join).
+    """
+    units = forecast_sample.reset_index(drop=True)
+    units["unit"] = np.arange(len(units))
+    consumption = consumption_df[KEYS + ["ConsumptionQty"]].copy()
+    consumption["ConsumptionQty"] = pd.to_numeric(consumption["ConsumptionQty"], errors="coerce").fillna(0)
+    pairs = units[KEYS + ["unit", "ForecastQty"]].merge(consumption, on=KEYS, how="inner")
+    pairs["ForecastQty"] = pd.to_numeric(pairs["ForecastQty"], errors="coerce").fillna(0)
+    pairs["AbsGap"] = (pairs["ForecastQty"] - pairs["ConsumptionQty"]).abs()
+    sums = pairs.groupby("unit")[["ForecastQty", "ConsumptionQty", "AbsGap"]].sum()
+
+    out = units[["Plant", "Week", "N_h", "n_h"]].copy()
+    for col in ["ForecastQty", "ConsumptionQty", "AbsGap"]:
+        out[col] = sums[col].reindex(units["unit"]).fillna(0).to_numpy()
+    return out
+
+
+@timed()
+def quick_look_sample(forecast_root: str = FORECAST_STORE, consumption_root: str = CONSUMPTION_STORE,
+                      fraction: float = QUICK_LOOK_FRACTION, min_per_stratum: int = QUICK_LOOK_MIN_PER_STRATUM,
+                      weeks=None, seed: int = 0, min_rows: int = 0):
+    """
+    Sampled units for every week present in both stores, read one week
+    partition at a time with only the key and quantity columns. None if the
+    stores are empty or hold fewer than `min_rows` forecast rows, which is
+    checked from the parquet footers before any partition is read.
+    """
+    all_weeks = sorted(set(list_partitions(forecast_root)) & set(list_partitions(consumption_root)))
+    if weeks is not None:
+        all_weeks = [week for week in all_weeks if week in set(weeks)]
+    if min_rows and sum(partition_rows(forecast_root, week) for week in all_weeks) < min_rows:
+        return None
+    parts = []
+    for i, week in enumerate(all_weeks):
+        forecast = read_partition(forecast_root, week, columns=KEYS + ["ForecastQty"])
+        sample = stratified_sample(forecast, fraction, min_per_stratum, seed=seed + i)
+        if sample.empty:
+            continue
+        consumption = read_partition(consumption_root, week, columns=KEYS + ["ConsumptionQty"])
+        consumption = consumption[consumption["Material"].isin(sample["Material"].unique())]
+        parts.append(unit_contributions(sample, consumption))
+    if not parts:
+        return None
+    return pd.concat(parts, ignore_index=True)
+
+
+def _stratified_total(units: pd.DataFrame, values) -> tuple:
+    """Estimated population total of `values` and its variance (stratified SRS)."""
+    frame = pd.DataFrame({
+        "Plant": units["Plant"].to_numpy(), "Week": units["Week"].to_numpy(),
+        "y": np.asarray(values, dtype=float),
+        "N": units["N_h"].to_numpy(), "n": units["n_h"].to_numpy(),
+    })
+    per = frame.groupby(["Plant", "Week"], sort=False).agg(
+        total=("y", "sum"), var=("y", "var"), N=("N", "first"), n=("n", "first")
+    )
+    total = (per["N"] / per["n"] * per["total"]).sum()
+    variance = (per["N"] ** 2 * (1 - per["n"] / per["N"]) * per["var"].fillna(0) / per["n"]).sum()
+    return float(total), float(variance)
+
+
+def _ratio(units: pd.DataFrame, numerator, denominator) -> tuple:
+    """Ratio of two estimated totals and its linearised standard error."""
+    num_total, _ = _stratified_total(units, numerator)
+    den_total, _ = _stratified_total(units, denominator)
+    if den_total == 0:
+        return 0.0, 0.0
+    ratio = num_total / den_total
+    _, variance = _stratified_total(units, np.asarray(numerator) - ratio * np.asarray(denominator))
+    return ratio, math.sqrt(variance) / abs(den_total)
+
+
+def estimate_kpis(units: pd.DataFrame, z: float = Z_95) -> dict:
+    """calculate_kpis figures with (low, high) bounds and the sample/population sizes."""
+    forecast = units["ForecastQty"].to_numpy()
+    gap = forecast - units["ConsumptionQty"].to_numpy()
+    total_gap, gap_var = _stratified_total(units, gap)
+    ratio, ratio_se = _ratio(units, units["AbsGap"].to_numpy(), forecast)
+    gap_se = math.sqrt(gap_var)
+    strata = units.groupby(["Plant", "Week"], sort=False)["N_h"].first()
+    return {
+        "total_gap": total_gap,
+        "total_gap_bounds": (total_gap - z * gap_se, total_gap + z * gap_se),
+        "abs_total_gap": abs(total_gap),
+        "average_deviation_percent": round(ratio * 100, 2),
+        "average_deviation_bounds": (round((ratio - z * ratio_se) * 100, 2), round((ratio + z * ratio_se) * 100, 2)),
+        "sample_rows": int(len(units)),
+        "population_rows": int(strata.sum()),
+    }
+
+
+def estimate_gap_by_plant(units: pd.DataFrame, z: float = Z_95) -> pd.DataFrame:
+    """summarize_gap_by_plant columns plus GapPercentLow/GapPercentHigh bounds."""
+    rows = []
+    for plant, plant_units in units.groupby("Plant", sort=True):
+        forecast = plant_units["ForecastQty"].to_numpy()
+        consumption = plant_units["ConsumptionQty"].to_numpy()
+        forecast_total, _ = _stratified_total(plant_units, forecast)
+        consumption_total, _ = _stratified_total(plant_units, consumption)
+        ratio, ratio_se = _ratio(plant_units, forecast - consumption, forecast)
+        rows.append({
+            "Plant": plant,
+            "ForecastQty": forecast_total,
+            "ConsumptionQty": consumption_total,
+            "GapPercent": round(ratio, 2),
+            "GapPercentLow": round(ratio - z * ratio_se, 2),
+            "GapPercentHigh": round(ratio + z * ratio_se, 2),
+        })
+    return pd.DataFrame(rows, columns=["Plant", "ForecastQty", "ConsumptionQty",
+                                       "GapPercent", "GapPercentLow", "GapPercentHigh"])
@@ -0,0 +1,119 @@
+# services/ranking_service.py
+"""
+Top-K worst materials by absolute gap, value-weighted gap or gap %.
+
+Material totals for any plant and contiguous week range come from prefix
+sums over the series store's week axis (one subtraction per series), and
+the K worst are picked with np.argpartition before sorting only those K.
+"""
+import numpy as np
+import pandas as pd
+
+from services.perf import timed
+
+RANKING_METRICS = {
+    "abs_gap": "Absolute gap (Qty)",
+    "value_gap": "Value-weighted gap (EUR)",
+    "gap_pct": "Gap %",
+}
+DIRECTIONS = ("both", "over", "under")
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k largest scores, largest first; NaN scores rank last."""
+    scores = np.where(np.isnan(scores), -np.inf, scores)
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class MaterialRanking:
+    """Ranking index over a SeriesStore (services/series_store.py)."""
+
+    def __init__(self, store):
+        self.index = store.index
+        self.weeks = list(store.weeks)
+        self.plant_rows = store.index.groupby("Plant").indices
+        self.prefix = {}
+        for measure, matrix in store.matrices.items():
+            prefix = np.zeros((matrix.shape[0], matrix.shape[1] + 1))
+            prefix[:, 1:] = np.cumsum(np.nan_to_num(np.asarray(matrix, dtype=float)), axis=1)
+            self.prefix[measure] = prefix
+
+    @property
+    def has_value(self) -> bool:
+        return "Value" in self.prefix
+
+    def _week_span(self, first_week=None, last_week=None):
+        start = self.weeks.index(first_week) if first_week in self.weeks else 0
+        stop = self.weeks.index(last_week) + 1 if last_week in self.weeks else len(self.weeks)
+        return start, max(start, stop)
+
+    def totals(self, plant=None, first_week=None, last_week=None):
+        """(series rows, {measure: totals over the week range}) for one plant or all."""
+        start, stop = self._week_span(first_week, last_week)
+        if plant is None:
+            rows = np.arange(len(self.index))
+        else:
+            rows = self.plant_rows.get(plant, np.array([], dtype=np.int64))
+        return rows, {m: prefix[rows, stop] - prefix[rows, start] for m, prefix in self.prefix.items()}
+
+    @timed("MaterialRanking.top_k")
+    def top_k(self, metric: str = "abs_gap", k: int = 50, plant=None, first_week=None, last_week=None,
+              direction: str = "both", min_forecast: float = 1.0) -> pd.DataFrame:
+        """
+        The k worst Material/Plant series. `direction` ranks by the size of
+        the gap ("both"), over-forecast only ("over") or under-forecast only
+        ("under"). Gap % ignores series whose forecast is below `min_forecast`;
+        the value-weighted gap prices the gap at the series' consumption value
+        per consumed unit over all stored weeks, so a range without
+        consumption is still priced. Series never consumed have no price and
+        are left out of that ranking.
+        """
+        if metric not in RANKING_METRICS:
+            raise ValueError(f"Unknown metric '{metric}'. Choose one of: {', '.join(RANKING_METRICS)}")
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Unknown direction '{direction}'. Choose one of: {', '.join(DIRECTIONS)}")
+
+        rows, totals = self.totals(plant, first_week, last_week)
+        forecast, consumption = totals["ForecastQty"], totals["ConsumptionQty"]
+        gap = forecast - consumption
+        signed = {"both": np.abs(gap), "over": gap, "under": -gap}[direction]
+        # Series on the other side of the gap never fill up a one-sided list
+        signed = np.where(signed > 0, signed, np.nan) if direction != "both" else signed
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            gap_pct = np.where(forecast >= min_forecast, gap / forecast * 100, np.nan)
+            if "Value" in totals:
+                all_value = self.prefix["Value"][rows, -1]
+                all_consumption = self.prefix["ConsumptionQty"][rows, -1]
+                unit_value = np.where(all_consumption > 0, all_value / all_consumption, np.nan)
+            else:
+                unit_value = np.full(len(rows), np.nan)
+        value_gap = gap * unit_value
+
+        if metric == "abs_gap":
+            scores = signed
+        elif metric == "value_gap":
+            scores = signed * unit_value
+        else:
+            scores = np.where(np.isnan(gap_pct), np.nan, signed / np.maximum(forecast, min_forecast) * 100)
+
+        picked = top_k_indices(scores, k)
+        picked = picked[np.isfinite(scores[picked])]
+        series = self.index.iloc[rows[picked]].reset_index(drop=True)
+        return pd.DataFrame({
+            "Rank": np.arange(1, len(picked) + 1),
+            "Material": series["Material"],
+            "Plant": series["Plant"],
+            "ForecastQty": forecast[picked],
+            "ConsumptionQty": consumption[picked],
+            "Gap": gap[picked],
+            "GapPercent": np.round(gap_pct[picked], 2),
+            "ValueGap": np.round(value_gap[picked], 2),
+        })
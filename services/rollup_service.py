@@ -0,0 +1,75 @@
+# services/rollup_service.py
+"""
+Forecast gap rolled up by OEM and Project.
+
+Material/Plant totals for a plant and week range come from the series
+store's prefix sums (services.ranking_service.MaterialRanking), so no
+merged rows are read. Each series is joined to its projects from the OEM
+project map and its totals are split evenly across them, so the rollup adds
+back up to the overall totals; series without a mapping land in "Unmapped".
+"""
+import numpy as np
+import pandas as pd
+
+from services.perf import timed
+
+UNMAPPED = "Unmapped"
+ROLLUP_LEVELS = {
+    "OEM": ["OEM"],
+    "Project": ["Project"],
+    "OEM + Project": ["OEM", "Project"],
+}
+
+ROLLUP_COLUMNS = ["ForecastQty", "ConsumptionQty", "Gap", "AbsGap"]
+
+
+def project_shares(project_map: pd.DataFrame) -> pd.DataFrame:
+    """Join keys, OEM, Project and each row's Share (1 / projects of its Material/Plant)."""
+    shares = pd.DataFrame({
+        "MaterialKey": project_map["Material"].astype(str).str.strip().str.upper(),
+        "PlantKey": project_map["Plant"].astype(str).str.strip().str.upper(),
+        "OEM": project_map["OEM"],
+        "Project": project_map["Project"],
+    }).drop_duplicates(["MaterialKey", "PlantKey", "Project"])
+    shares["Share"] = 1.0 / shares.groupby(["MaterialKey", "PlantKey"])["Project"].transform("size")
+    return shares
+
+
+@timed()
+def rollup_gap(ranking, project_map: pd.DataFrame, level: str = "OEM", plant=None,
+               first_week=None, last_week=None) -> pd.DataFrame:
+    """
+    Forecast, consumption, gap and absolute gap per OEM, Project or both,
+    with gap % and average deviation % computed from the rolled-up sums.
+    The absolute gap is taken per series before allocation, as in the KPIs.
+    """
+    if level not in ROLLUP_LEVELS:
+        raise ValueError(f"Unknown rollup level '{level}'. Choose one of: {', '.join(ROLLUP_LEVELS)}")
+    keys = ROLLUP_LEVELS[level]
+
+    rows, totals = ranking.totals(plant, first_week, last_week)
+    series = ranking.index.iloc[rows]
+    forecast, consumption = totals["ForecastQty"], totals["ConsumptionQty"]
+    allocated = pd.DataFrame({
+        "MaterialKey": series["Material"].astype(str).str.strip().str.upper().to_numpy(),
+        "PlantKey": series["Plant"].astype(str).str.strip().str.upper().to_numpy(),
+        "Material": series["Material"].to_numpy(),
+        "ForecastQty": forecast,
+        "ConsumptionQty": consumption,
+        "Gap": forecast - consumption,
+        "AbsGap": np.abs(forecast - consumption),
+    })
+    allocated = allocated.merge(project_shares(project_map), on=["MaterialKey", "PlantKey"], how="left")
+    allocated["Share"] = allocated["Share"].fillna(1.0)
+    allocated[["OEM", "Project"]] = allocated[["OEM", "Project"]].fillna(UNMAPPED)
+    allocated[ROLLUP_COLUMNS] = allocated[ROLLUP_COLUMNS].mul(allocated["Share"], axis=0)
+
+    grouped = allocated.groupby(keys, as_index=False).agg(
+        Materials=("Material", "nunique"),
+        **{col: (col, "sum") for col in ROLLUP_COLUMNS}
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        grouped["GapPercent"] = np.round(grouped["Gap"] / grouped["ForecastQty"] * 100, 2)
+        grouped["AvgDeviationPercent"] = np.round(grouped["AbsGap"] / grouped["ForecastQty"] * 100, 2)
+    grouped = grouped.replace([np.inf, -np.inf], np.nan)
+    return grouped.sort_values("AbsGap", ascending=False).reset_index(drop=True)
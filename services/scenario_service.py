@@ -0,0 +1,214 @@
+# services/scenario_service.py
+"""
+What-if scenarios over the merged or predicted data, without re-ingesting.
+
+A scenario is a name plus a list of adjustments, each a dict:
+
+    {"target": "ForecastQty" | "Safety Stock",
+     "scope": "Plant" | "Vendor" | "Material" | None (all rows),
+     "value": "YMM2",                 # ignored when scope is None
+     "factor": 0.9}                   # multiply ...
+    {"target": "Safety Stock", "scope": "Plant", "value": "YMO", "set": 0}   # ... or override
+
+e.g. {"name": "YMM2 -10%", "adjustments": [{"target": "ForecastQty",
+      "scope": "Plant", "value": "YMM2", "factor": 0.9}]}
+
+Adjustments are applied in order as (scenarios x rows) NumPy arrays, and
+gaps, KPIs, plant gap % and risk categories are recomputed for the whole
+batch at once against a reference quantity: actual consumption for the
+merged history, predicted consumption for the AI forecasts.
+"""
+import numpy as np
+import pandas as pd
+
+from services.perf import timed
+from services.prediction_service import RISK_LABELS, LOW_RISK, risk_codes, build_feature_matrix, predict_in_parallel
+
+TARGETS = ("ForecastQty", "Safety Stock")
+SCOPES = ("Plant", "Vendor", "Material")
+BASELINE = "Baseline"
+
+# Rows x scenarios held in memory at once
+MAX_CELLS = 5_000_000
+
+
+def _column(df: pd.DataFrame, name: str, default: float = 0.0) -> np.ndarray:
+    if name not in df.columns:
+        return np.full(len(df), default)
+    return pd.to_numeric(df[name], errors="coerce").fillna(default).to_numpy(dtype=float)
+
+
+class ScenarioEngine:
+
+    def __init__(self, base_df: pd.DataFrame, reference: str = "Predicted_ConsumptionQty"):
+        if reference not in base_df.columns:
+            raise ValueError(f"Scenario data needs a '{reference}' column.")
+        self.base_df = base_df
+        self.reference_name = reference
+        self.forecast = _column(base_df, "ForecastQty")
+        self.reference = _column(base_df, reference)
+        self.safety_stock = _column(base_df, "Safety Stock")
+        self.backlog = _column(base_df, "MRP BACKLOG")
+        self.wip = _column(base_df, "WIP")
+        self.stock = _column(base_df, "Stock")
+        # Scope columns as integer codes, so every adjustment is one comparison
+        self.codes, self.labels = {}, {}
+        for scope in SCOPES:
+            if scope in base_df.columns:
+                codes, labels = pd.factorize(base_df[scope].astype(str).str.strip())
+                self.codes[scope] = codes
+                self.labels[scope] = {label: i for i, label in enumerate(labels)}
+        self.plants = list(self.labels.get("Plant", {}))
+
+    def _mask(self, adjustment: dict, rows: slice) -> np.ndarray:
+        scope = adjustment.get("scope")
+        if scope is None or scope == "All":
+            return np.ones(rows.stop - rows.start, dtype=bool)
+        if scope not in SCOPES:
+            raise ValueError(f"Unknown scope '{scope}'. Choose one of: {', '.join(SCOPES)}")
+        if scope not in self.codes:
+            raise ValueError(f"The data has no '{scope}' column to scope an adjustment by.")
+        value = str(adjustment.get("value")).strip()
+        if value not in self.labels[scope]:
+            raise ValueError(f"No {scope} '{value}' in the data; the adjustment would change nothing.")
+        return self.codes[scope][rows] == self.labels[scope][value]
+
+    def _adjusted(self, scenarios: list, rows: slice):
+        """(forecast, safety stock) as (scenarios x rows) arrays for one block of rows."""
+        n = rows.stop - rows.start
+        forecast = np.tile(self.forecast[rows], (len(scenarios), 1))
+        safety = np.tile(self.safety_stock[rows], (len(scenarios), 1))
+        for s, scenario in enumerate(scenarios):
+            for adjustment in scenario.get("adjustments", []):
+                target = adjustment.get("target", "ForecastQty")
+                if target not in TARGETS:
+                    raise ValueError(f"Unknown target '{target}'. Choose one of: {', '.join(TARGETS)}")
+                values = forecast[s] if target == "ForecastQty" else safety[s]
+                mask = self._mask(adjustment, rows) if n else np.zeros(0, dtype=bool)
+                if "set" in adjustment:
+                    values[mask] = float(adjustment["set"])
+                else:
+                    values[mask] *= float(adjustment.get("factor", 1.0))
+        return forecast, safety
+
+    def _repredict(self, model, forecast: np.ndarray, safety: np.ndarray, rows: slice, workers: int) -> np.ndarray:
+        """Model predictions with each scenario's forecast and safety stock as features."""
+        block = self.base_df.iloc[rows]
+        predicted = np.empty_like(forecast)
+        for s in range(forecast.shape[0]):
+            features = block.copy()
+            features["ForecastQty"] = forecast[s]
+            features["Safety Stock"] = safety[s]
+            X = build_feature_matrix(features)
+            if getattr(model, "segment_models", None) and "Plant" in block.columns:
+                predicted[s] = model.predict_segments(X, block["Plant"])
+            else:
+                predicted[s] = predict_in_parallel(getattr(model, "global_model", model), X, workers)
+        return predicted
+
+    @timed("ScenarioEngine.run")
+    def run(self, scenarios: list, model=None, workers: int = 1) -> dict:
+        """
+        KPIs and plant gaps for the baseline plus every scenario.
+
+        With a `model` the reference quantity is re-predicted from each
+        scenario's adjusted features instead of being held fixed.
+        """
+        scenarios = [{"name": BASELINE, "adjustments": []}] + list(scenarios)
+        n_scen, n_rows = len(scenarios), len(self.forecast)
+        n_plants = len(self.plants)
+        n_risks = len(RISK_LABELS)
+
+        totals = np.zeros((n_scen, 3))              # forecast, reference, |gap|
+        plant_totals = np.zeros((n_scen, 2, max(n_plants, 1)))
+        risk_counts = np.zeros((n_scen, n_risks), dtype=np.int64)
+        plant_codes = self.codes.get("Plant")
+
+        block_rows = max(1, MAX_CELLS // n_scen)
+        for start in range(0, max(n_rows, 1), block_rows):
+            rows = slice(start, min(start + block_rows, n_rows))
+            if rows.stop <= rows.start:
+                break
+            forecast, safety = self._adjusted(scenarios, rows)
+            if model is not None:
+                reference = self._repredict(model, forecast, safety, rows, workers)
+            else:
+                reference = np.broadcast_to(self.reference[rows], forecast.shape)
+            gap = forecast - reference
+
+            totals[:, 0] += forecast.sum(axis=1)
+            totals[:, 1] += reference.sum(axis=1)
+            totals[:, 2] += np.abs(gap).sum(axis=1)
+
+            if plant_codes is not None and n_plants:
+                # One bincount over (scenario, plant) pairs for the whole batch
+                flat = (np.arange(n_scen)[:, None] * n_plants + plant_codes[rows][None, :]).ravel()
+                size = n_scen * n_plants
+                plant_totals[:, 0, :n_plants] += np.bincount(flat, forecast.ravel(), size).reshape(n_scen, n_plants)
+                plant_totals[:, 1, :n_plants] += np.bincount(flat, reference.ravel(), size).reshape(n_scen, n_plants)
+
+            with np.errstate(divide="ignore", invalid="ignore"):
+                gap_percent = np.where(forecast != 0, gap / forecast * 100, 0)
+            codes = risk_codes(gap_percent, self.backlog[rows], self.wip[rows], self.stock[rows],
+                               safety, reference, forecast)
+            flat = (np.arange(n_scen)[:, None] * n_risks + codes).ravel()
+            risk_counts += np.bincount(flat, minlength=n_scen * n_risks).reshape(n_scen, n_risks)
+
+        names = [scenario.get("name", f"Scenario {i}") for i, scenario in enumerate(scenarios)]
+        total_gap = totals[:, 0] - totals[:, 1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            avg_dev = np.where(totals[:, 0] != 0, np.round(totals[:, 2] / totals[:, 0] * 100, 2), 0)
+        kpis = pd.DataFrame({
+            "Scenario": names,
+            "ForecastQty": totals[:, 0],
+            self.reference_name: totals[:, 1],
+            "TotalGap": total_gap,
+            "AbsTotalGap": np.abs(total_gap),
+            "AvgDeviationPercent": avg_dev,
+            "AtRiskRows": n_rows - risk_counts[:, RISK_LABELS.index(LOW_RISK)],
+        })
+        kpis["TotalGapChange"] = kpis["TotalGap"] - kpis["TotalGap"].iloc[0]
+        risks = pd.DataFrame(risk_counts, columns=RISK_LABELS)
+        risks.insert(0, "Scenario", names)
+
+        by_plant = pd.DataFrame({
+            "Scenario": np.repeat(names, n_plants),
+            "Plant": np.tile(self.plants, n_scen),
+            "ForecastQty": plant_totals[:, 0, :n_plants].ravel(),
+            self.reference_name: plant_totals[:, 1, :n_plants].ravel(),
+        })
+        with np.errstate(divide="ignore", invalid="ignore"):
+            by_plant["GapPercent"] = (
+                (by_plant["ForecastQty"] - by_plant[self.reference_name]) / by_plant["ForecastQty"]
+            ).round(2)
+        return {"kpis": kpis, "risks": risks, "by_plant": by_plant}
+
+
+def run_scenarios(base_df: pd.DataFrame, scenarios: list, reference: str = "Predicted_ConsumptionQty",
+                  model=None, workers: int = 1) -> dict:
+    return ScenarioEngine(base_df, reference).run(scenarios, model=model, workers=workers)
+
+
+def scenarios_from_table(table: pd.DataFrame) -> list:
+    """
+    Scenario dicts from an editable table with Scenario, Target, Scope,
+    Value, Factor and (optional) Set columns, one adjustment per row.
+    """
+    scenarios = {}
+    for _, row in table.dropna(subset=["Scenario"]).iterrows():
+        name = str(row["Scenario"]).strip()
+        if not name:
+            continue
+        scope = row.get("Scope")
+        adjustment = {
+            "target": row.get("Target") or "ForecastQty",
+            "scope": None if scope in (None, "", "All") or pd.isna(scope) else scope,
+            "value": row.get("Value"),
+        }
+        if "Set" in row and pd.notna(row.get("Set")):
+            adjustment["set"] = float(row["Set"])
+        else:
+            factor = row.get("Factor")
+            adjustment["factor"] = 1.0 if factor is None or pd.isna(factor) else float(factor)
+        scenarios.setdefault(name, []).append(adjustment)
+    return [{"name": name, "adjustments": adjustments} for name, adjustments in scenarios.items()]
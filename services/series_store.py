@@ -0,0 +1,253 @@
+# services/series_store.py
+"""
+Dense Material x Plant x Week series store.
+
+Every Material/Plant pair is one row of a (series x week) matrix per measure,
+weeks in chronological order; weeks without data are NaN. One series is a
+row slice and plant or total weekly figures are column sums over a set of
+rows. Stored next to the merged data one week column at a time, so a week
+can be added or replaced without rewriting the others:
+
+    root/index.parquet      Material, Plant (row order, append-only)
+    root/weeks.json         stored weeks in chronological order
+    root/weeks/<week>.npz   that week's column of every measure
+
+A column written before later series were added is shorter than the index;
+the missing rows are NaN.
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from services.file_utils import week_sort_key
+from services.perf import timed
+
+SERIES_STORE = "data/merged/series_store"
+INDEX_FILE = "index.parquet"
+WEEKS_FILE = "weeks.json"
+WEEKS_DIR = "weeks"
+
+MEASURES = ["ForecastQty", "ConsumptionQty", "Value"]
+# Merged column a measure is read from, where the names differ
+SOURCE_COLUMNS = {"Value": "Tot.us.val"}
+
+
+def series_rows(merged_df: pd.DataFrame) -> pd.DataFrame:
+    """Material/Plant/Week sums of the stored measures, the only input the store needs."""
+    merged_df = merged_df.rename(columns={src: m for m, src in SOURCE_COLUMNS.items()
+                                          if m not in merged_df.columns})
+    measures = [m for m in MEASURES if m in merged_df.columns]
+    rows = merged_df[["Material", "Plant", "Week"] + measures].copy()
+    for col in ["Material", "Plant", "Week"]:
+        rows[col] = rows[col].astype(str)
+    for col in measures:
+        rows[col] = pd.to_numeric(rows[col], errors="coerce")
+    return rows.groupby(["Material", "Plant", "Week"], as_index=False, sort=False).sum(min_count=1)
+
+
+def _scatter(ids, week_ids, values, shape) -> np.ndarray:
+    totals = np.zeros(shape)
+    counts = np.zeros(shape, dtype=np.int32)
+    present = ~np.isnan(values)
+    np.add.at(totals, (ids[present], week_ids[present]), values[present])
+    np.add.at(counts, (ids, week_ids), 1)
+    totals[counts == 0] = np.nan
+    return totals
+
+
+def _week_path(root: str, week: str) -> str:
+    return os.path.join(root, WEEKS_DIR, f"{week}.npz")
+
+
+def _write_column(root: str, week: str, columns: dict) -> None:
+    os.makedirs(os.path.join(root, WEEKS_DIR), exist_ok=True)
+    np.savez(_week_path(root, week), **columns)
+
+
+def _has_store(root: str) -> bool:
+    # Stores from before the per-week layout have no weeks/ folder and are rebuilt
+    return os.path.exists(os.path.join(root, WEEKS_FILE)) and os.path.isdir(os.path.join(root, WEEKS_DIR))
+
+
+def _write_meta(root: str, index: pd.DataFrame, weeks: list, with_index: bool = True) -> None:
+    """The index and then the week list, which readers key their caches on."""
+    os.makedirs(root, exist_ok=True)
+    if with_index:
+        index.to_parquet(os.path.join(root, INDEX_FILE), index=False)
+    tmp_path = os.path.join(root, WEEKS_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(weeks, f)
+    os.replace(tmp_path, os.path.join(root, WEEKS_FILE))
+
+
+class SeriesStore:
+
+    def __init__(self, index: pd.DataFrame, weeks: list, matrices: dict):
+        self.index = index.reset_index(drop=True)
+        self.weeks = list(weeks)
+        self.matrices = matrices
+        self._lookup = None
+
+    # --- construction -------------------------------------------------------
+
+    @classmethod
+    @timed("SeriesStore.build")
+    def build(cls, merged_df: pd.DataFrame):
+        rows = series_rows(merged_df)
+        index = rows[["Material", "Plant"]].drop_duplicates().sort_values(["Plant", "Material"])
+        index = index.reset_index(drop=True)
+        weeks = sorted(rows["Week"].unique(), key=week_sort_key)
+
+        ids = pd.MultiIndex.from_frame(index).get_indexer(pd.MultiIndex.from_frame(rows[["Material", "Plant"]]))
+        week_ids = pd.Index(weeks).get_indexer(rows["Week"])
+        shape = (len(index), len(weeks))
+        matrices = {
+            measure: _scatter(ids, week_ids, rows[measure].to_numpy(dtype=float), shape)
+            for measure in MEASURES if measure in rows.columns
+        }
+        return cls(index, weeks, matrices)
+
+    # --- persistence --------------------------------------------------------
+
+    @timed("SeriesStore.save")
+    def save(self, root: str = SERIES_STORE) -> None:
+        """Write to a sibling folder first, then swap it in."""
+        tmp_root = root + ".tmp"
+        shutil.rmtree(tmp_root, ignore_errors=True)
+        for col, week in enumerate(self.weeks):
+            _write_column(tmp_root, week, {measure: matrix[:, col] for measure, matrix in self.matrices.items()})
+        _write_meta(tmp_root, self.index, self.weeks)
+        shutil.rmtree(root, ignore_errors=True)
+        os.replace(tmp_root, root)
+
+    @classmethod
+    @timed("SeriesStore.load")
+    def load(cls, root: str = SERIES_STORE):
+        """The stored matrices, or None if there is no store."""
+        if not _has_store(root):
+            return None
+        with open(os.path.join(root, WEEKS_FILE)) as f:
+            weeks = json.load(f)
+        index = pd.read_parquet(os.path.join(root, INDEX_FILE))
+        matrices = {}
+        for col, week in enumerate(weeks):
+            with np.load(_week_path(root, week)) as columns:
+                for measure in columns.files:
+                    if measure not in matrices:
+                        matrices[measure] = np.full((len(index), len(weeks)), np.nan)
+                    column = columns[measure]
+                    matrices[measure][:len(column), col] = column
+        matrices = {measure: matrices[measure] for measure in MEASURES if measure in matrices}
+        return cls(index, weeks, matrices)
+
+    # --- queries ------------------------------------------------------------
+
+    def _rows(self, material=None, plant=None) -> np.ndarray:
+        if self._lookup is None:
+            self._lookup = {
+                "pair": {key: i for i, key in enumerate(zip(self.index["Material"], self.index["Plant"]))},
+                "Material": self.index.groupby("Material").indices,
+                "Plant": self.index.groupby("Plant").indices,
+            }
+        if material is not None and plant is not None:
+            row = self._lookup["pair"].get((str(material), str(plant)))
+            return np.array([], dtype=np.int64) if row is None else np.array([row])
+        if material is not None:
+            return self._lookup["Material"].get(str(material), np.array([], dtype=np.int64))
+        if plant is not None:
+            return self._lookup["Plant"].get(str(plant), np.array([], dtype=np.int64))
+        return None
+
+    def _week_cols(self, weeks=None):
+        if weeks is None:
+            return np.arange(len(self.weeks)), self.weeks
+        wanted = set(weeks)
+        cols = np.array([i for i, w in enumerate(self.weeks) if w in wanted], dtype=np.int64)
+        return cols, [self.weeks[i] for i in cols]
+
+    def weekly(self, material=None, plant=None, weeks=None) -> pd.DataFrame:
+        """
+        Week, ForecastQty, ConsumptionQty for one series (material and plant),
+        a material across plants, a plant's total or the overall total.
+        """
+        rows = self._rows(material, plant)
+        cols, labels = self._week_cols(weeks)
+        out = {"Week": labels}
+        for measure, matrix in self.matrices.items():
+            if rows is None:
+                block = matrix[:, cols]
+            else:
+                block = matrix[rows][:, cols]
+            if len(rows if rows is not None else self.index) == 1:
+                out[measure] = np.asarray(block[0], dtype=float)
+            else:
+                out[measure] = np.nansum(block, axis=0)
+        return pd.DataFrame(out)
+
+
+class SeriesStoreWriter:
+    """
+    Writes a store one week column at a time, straight to its own file, so
+    a week costs the same however long the history is. Opened on an
+    existing store it adds or replaces weeks in place; close() writes the
+    index and week list.
+    """
+
+    def __init__(self, root: str = SERIES_STORE):
+        self.root = root
+        self.index = pd.DataFrame(columns=["Material", "Plant"])
+        self.weeks = []
+        if _has_store(root):
+            with open(os.path.join(root, WEEKS_FILE)) as f:
+                self.weeks = json.load(f)
+            self.index = pd.read_parquet(os.path.join(root, INDEX_FILE))
+        self._key_pos = {key: i for i, key in enumerate(zip(self.index["Material"], self.index["Plant"]))}
+        self._new_keys = []
+
+    @timed("SeriesStoreWriter.write_week")
+    def write_week(self, week_df: pd.DataFrame, week: str = None) -> None:
+        """Write (or replace) one week's column from that week's merged rows."""
+        rows = series_rows(week_df)
+        if week is None:
+            week = rows["Week"].iloc[0]
+        rows = rows[rows["Week"] == week]
+
+        pairs = list(zip(rows["Material"], rows["Plant"]))
+        for pair in dict.fromkeys(pairs):
+            if pair not in self._key_pos:
+                self._key_pos[pair] = len(self._key_pos)
+                self._new_keys.append(pair)
+        ids = np.array([self._key_pos[pair] for pair in pairs], dtype=np.int64)
+        shape = (len(self._key_pos), 1)
+        _write_column(self.root, week, {
+            measure: _scatter(ids, np.zeros(len(ids), dtype=np.int64), rows[measure].to_numpy(dtype=float), shape)[:, 0]
+            for measure in MEASURES if measure in rows.columns
+        })
+        if week not in self.weeks:
+            self.weeks = sorted(self.weeks + [week], key=week_sort_key)
+
+    def remove_week(self, week: str) -> None:
+        if week in self.weeks:
+            self.weeks.remove(week)
+            os.remove(_week_path(self.root, week))
+
+    def close(self) -> None:
+        with_index = bool(self._new_keys) or not os.path.exists(os.path.join(self.root, INDEX_FILE))
+        if self._new_keys:
+            new_keys = pd.DataFrame(self._new_keys, columns=["Material", "Plant"])
+            self.index = pd.concat([self.index, new_keys], ignore_index=True)
+            self._new_keys = []
+        _write_meta(self.root, self.index, self.weeks, with_index=with_index)
+
+
+def build_series_store(merged_df: pd.DataFrame, root: str = SERIES_STORE) -> SeriesStore:
+    store = SeriesStore.build(merged_df)
+    store.save(root)
+    return store
+
+
+def load_series_store(root: str = SERIES_STORE):
+    return SeriesStore.load(root)
@@ -0,0 +1,340 @@
+# services/snapshot_store.py
+"""
+Delta-encoded store of the full MRP bucket vectors of every YPPMPL snapshot.
+
+All snapshots share one grid: rows are Material/Plant pairs, columns are
+bucket labels ("BACKLOG", "MRP" and the absolute target week "05.2024"), so
+the same target week lines up across snapshots even though the horizon
+rolls forward. A snapshot is stored as the cells that changed since the
+previous one (row, column, new value; NaN = cell gone), with a full
+keyframe every KEYFRAME_EVERY snapshots to bound reconstruction work.
+
+    root/keys.parquet        Material, Plant (row order, append-only)
+    root/buckets.json        bucket labels (column order, append-only)
+    root/index.json          [{"week", "keyframe", "file", "cells"}, ...]
+    root/snap-00000.npz      rows, cols, values
+"""
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from services.file_utils import week_sort_key
+from services.perf import timed
+
+SNAPSHOT_STORE = "data/merged/forecast_snapshots"
+KEYFRAME_EVERY = 8
+
+KEYS_FILE = "keys.parquet"
+BUCKETS_FILE = "buckets.json"
+INDEX_FILE = "index.json"
+
+
+def bucket_label(column) -> str:
+    """Grid column of a YPPMPL MRP column, or None for anything else."""
+    col_str = str(column).strip()
+    if col_str == "MRP BACKLOG":
+        return "BACKLOG"
+    if col_str == "MRP":
+        return "MRP"
+    if col_str.startswith("MRP"):
+        match = re.search(r"(\d{2})\.(\d{4})", col_str)
+        if match:
+            return f"{match.group(1)}.{match.group(2)}"
+    return None
+
+
+def target_label(week: str) -> str:
+    """"W05-24" / "W05-2024" / "05.2024" -> the bucket label "05.2024"."""
+    week = str(week).strip()
+    if re.fullmatch(r"\d{2}\.\d{4}", week):
+        return week
+    year, week_no = week_sort_key(week)
+    return f"{week_no:02d}.{year}"
+
+
+def _bucket_sort_key(label: str):
+    if label in ("BACKLOG", "MRP"):
+        return (0, 0, label)
+    week_no, year = label.split(".")
+    return (int(year), int(week_no), "")
+
+
+def bucket_frame(raw_df: pd.DataFrame) -> pd.DataFrame:
+    """Material, Plant and one numeric column per bucket label, summed per Material/Plant."""
+    df = raw_df[raw_df["Material"].notna() & raw_df["Material"].astype(str).str.strip().ne("")]
+    labels = {col: bucket_label(col) for col in df.columns}
+    mrp_cols = [col for col, label in labels.items() if label is not None]
+    buckets = df[mrp_cols].apply(pd.to_numeric, errors="coerce")
+    buckets.columns = [labels[col] for col in mrp_cols]
+    buckets = buckets.loc[:, ~buckets.columns.duplicated()]
+    buckets.insert(0, "Plant", df["Plant"].astype(str).str.strip())
+    buckets.insert(0, "Material", df["Material"].astype(str).str.strip())
+    return buckets.groupby(["Material", "Plant"], as_index=False, sort=False).sum(min_count=1)
+
+
+class SnapshotStore:
+
+    def __init__(self, root: str = SNAPSHOT_STORE, keyframe_every: int = KEYFRAME_EVERY):
+        self.root = root
+        self.keyframe_every = keyframe_every
+        self.keys = pd.DataFrame(columns=["Material", "Plant"])
+        self.buckets = []
+        self.index = []
+        self._key_pos = {}
+        self._bucket_pos = {}
+        self._cells = {}
+        self._latest = None
+
+    # --- persistence --------------------------------------------------------
+
+    @classmethod
+    def open(cls, root: str = SNAPSHOT_STORE):
+        """The store at `root`, or an empty one to append to."""
+        store = cls(root)
+        index_path = os.path.join(root, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                store.index = json.load(f)
+            with open(os.path.join(root, BUCKETS_FILE)) as f:
+                store.buckets = json.load(f)
+            store.keys = pd.read_parquet(os.path.join(root, KEYS_FILE))
+            store._key_pos = {key: i for i, key in enumerate(zip(store.keys["Material"], store.keys["Plant"]))}
+            store._bucket_pos = {label: i for i, label in enumerate(store.buckets)}
+        return store
+
+    def _write_meta(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        self.keys.to_parquet(os.path.join(self.root, KEYS_FILE), index=False)
+        with open(os.path.join(self.root, BUCKETS_FILE), "w") as f:
+            json.dump(self.buckets, f)
+        tmp_path = os.path.join(self.root, INDEX_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(tmp_path, os.path.join(self.root, INDEX_FILE))
+
+    def _load_cells(self, position: int):
+        if position not in self._cells:
+            entry = self.index[position]
+            with np.load(os.path.join(self.root, entry["file"])) as data:
+                self._cells[position] = (data["rows"], data["cols"], data["values"])
+        return self._cells[position]
+
+    @property
+    def weeks(self) -> list:
+        return [entry["week"] for entry in self.index]
+
+    @property
+    def shape(self) -> tuple:
+        return len(self.keys), len(self.buckets)
+
+    # --- writing ------------------------------------------------------------
+
+    def _grid_positions(self, frame: pd.DataFrame):
+        """Row and column positions of a bucket frame, growing the grid as needed."""
+        pairs = list(zip(frame["Material"], frame["Plant"]))
+        new_pairs = [pair for pair in dict.fromkeys(pairs) if pair not in self._key_pos]
+        if new_pairs:
+            start = len(self.keys)
+            self._key_pos.update({pair: start + i for i, pair in enumerate(new_pairs)})
+            self.keys = pd.concat([self.keys, pd.DataFrame(new_pairs, columns=["Material", "Plant"])],
+                                  ignore_index=True)
+        labels = [col for col in frame.columns if col not in ("Material", "Plant")]
+        for label in sorted(set(labels) - set(self._bucket_pos), key=_bucket_sort_key):
+            self._bucket_pos[label] = len(self.buckets)
+            self.buckets.append(label)
+        rows = np.array([self._key_pos[pair] for pair in pairs], dtype=np.int64)
+        cols = np.array([self._bucket_pos[label] for label in labels], dtype=np.int64)
+        return rows, cols, labels
+
+    @timed("SnapshotStore.append")
+    def append(self, week: str, frame: pd.DataFrame) -> dict:
+        """
+        Add the snapshot taken in `week` (a bucket_frame). Snapshots must be
+        appended in chronological order; older weeks go through replace().
+        """
+        if self.index and week_sort_key(week) <= week_sort_key(self.index[-1]["week"]):
+            raise ValueError(f"Snapshot {week} is not newer than {self.index[-1]['week']}; use replace().")
+
+        previous = self.dense(len(self.index) - 1) if self.index else None
+        current = self._dense_frame(frame)
+
+        position = len(self.index)
+        keyframe = previous is None or position % self.keyframe_every == 0
+        entry = {"week": week, "keyframe": bool(keyframe), "file": f"snap-{position:05d}.npz"}
+        self.index.append(entry)
+        self._write_cells(position, self._encode(previous, current, keyframe))
+        self._latest = (position, current)
+        self._write_meta()
+        return entry
+
+    @timed("SnapshotStore.replace")
+    def replace(self, week: str, frame: pd.DataFrame) -> dict:
+        """
+        Add or replace the snapshot taken in `week`, wherever it falls in
+        time. Only it and the snapshot after it (a delta against it) are
+        re-encoded; every other snapshot file is left as it is.
+        """
+        weeks = self.weeks
+        if not weeks or week_sort_key(week) > week_sort_key(weeks[-1]):
+            return self.append(week, frame)
+
+        replacing = week in weeks
+        if replacing:
+            position = weeks.index(week)
+        else:
+            position = sum(week_sort_key(w) < week_sort_key(week) for w in weeks)
+        # The snapshot that will follow `week`, decoded while the old chain is intact
+        old_next = position + 1 if replacing else position
+        following = None
+        if old_next < len(self.index) and not self.index[old_next]["keyframe"]:
+            following = self.dense(old_next)
+        previous = self.dense(position - 1) if position > 0 else None
+        current = self._dense_frame(frame)
+        self._latest = None
+
+        if replacing:
+            entry = dict(self.index[position])
+            self.index[position] = entry
+        else:
+            last_keyframe = max((i for i in range(position) if self.index[i]["keyframe"]), default=None)
+            keyframe = last_keyframe is None or position - last_keyframe >= self.keyframe_every
+            entry = {"week": week, "keyframe": bool(keyframe), "file": f"snap-{len(self.index):05d}.npz"}
+            self.index.insert(position, entry)
+            self._cells = {i + (i >= position): cells for i, cells in self._cells.items()}
+        self._write_cells(position, self._encode(previous, current, entry["keyframe"]))
+        if following is not None:
+            self._write_cells(position + 1, self._encode(current, following, False))
+        self._write_meta()
+        return entry
+
+    def _dense_frame(self, frame: pd.DataFrame) -> np.ndarray:
+        """A bucket frame as a full grid matrix, growing the grid as needed."""
+        rows, cols, labels = self._grid_positions(frame)
+        matrix = np.full(self.shape, np.nan)
+        matrix[np.ix_(rows, cols)] = frame[labels].to_numpy(dtype=float)
+        return matrix
+
+    def _padded(self, matrix: np.ndarray) -> np.ndarray:
+        """A matrix decoded before the grid last grew, padded to the current shape."""
+        if matrix.shape == self.shape:
+            return matrix
+        padded = np.full(self.shape, np.nan)
+        padded[:matrix.shape[0], :matrix.shape[1]] = matrix
+        return padded
+
+    def _encode(self, previous, current: np.ndarray, keyframe: bool):
+        """Every cell of a keyframe, otherwise the cells that changed since `previous`."""
+        if keyframe:
+            changed = ~np.isnan(current)
+        else:
+            padded = self._padded(previous)
+            current = self._padded(current)
+            same = (padded == current) | (np.isnan(padded) & np.isnan(current))
+            changed = ~same
+        cell_rows, cell_cols = np.nonzero(changed)
+        return cell_rows.astype(np.int32), cell_cols.astype(np.int32), current[cell_rows, cell_cols]
+
+    def _write_cells(self, position: int, cells) -> None:
+        entry = self.index[position]
+        rows, cols, values = cells
+        os.makedirs(self.root, exist_ok=True)
+        np.savez_compressed(os.path.join(self.root, entry["file"]), rows=rows, cols=cols, values=values)
+        entry["cells"] = int(len(values))
+        self._cells[position] = cells
+
+    # --- reading ------------------------------------------------------------
+
+    def _position(self, week: str) -> int:
+        weeks = self.weeks
+        if week not in weeks:
+            raise KeyError(f"No snapshot for {week}")
+        return weeks.index(week)
+
+    def dense(self, position: int) -> np.ndarray:
+        """Full (keys x buckets) matrix of the snapshot at `position`."""
+        if self._latest is not None and self._latest[0] == position:
+            return self._latest[1]
+        start = max(i for i in range(position + 1) if self.index[i]["keyframe"])
+        matrix = np.full(self.shape, np.nan)
+        for i in range(start, position + 1):
+            rows, cols, values = self._load_cells(i)
+            if self.index[i]["keyframe"]:
+                matrix[:] = np.nan
+            matrix[rows, cols] = values
+        return matrix
+
+    @timed("SnapshotStore.snapshot")
+    def snapshot(self, week: str) -> pd.DataFrame:
+        """The snapshot of `week` as Material, Plant and one column per bucket."""
+        matrix = self.dense(self._position(week))
+        present = ~np.isnan(matrix)
+        keep_rows = present.any(axis=1)
+        keep_cols = present.any(axis=0)
+        frame = pd.DataFrame(matrix[np.ix_(keep_rows, keep_cols)],
+                             columns=[label for label, keep in zip(self.buckets, keep_cols) if keep])
+        keys = self.keys[keep_rows].reset_index(drop=True)
+        return pd.concat([keys, frame], axis=1)
+
+    @timed("SnapshotStore.forecast_evolution")
+    def forecast_evolution(self, target_week: str, material=None, plant=None) -> pd.DataFrame:
+        """
+        How the forecast for `target_week` moved across snapshots: one row per
+        snapshot week with the bucket total over the selected Material/Plant
+        rows. Only the cells of that one bucket column are replayed.
+        """
+        label = target_label(target_week)
+        result = pd.DataFrame(columns=["Snapshot", "TargetWeek", "ForecastQty"])
+        if label not in self._bucket_pos or not self.index:
+            return result
+        col = self._bucket_pos[label]
+
+        mask = np.ones(len(self.keys), dtype=bool)
+        if material is not None:
+            mask &= (self.keys["Material"] == str(material)).to_numpy()
+        if plant is not None:
+            mask &= (self.keys["Plant"] == str(plant)).to_numpy()
+
+        vector = np.full(len(self.keys), np.nan)
+        totals = []
+        for i, entry in enumerate(self.index):
+            rows, cols, values = self._load_cells(i)
+            if entry["keyframe"]:
+                vector[:] = np.nan
+            hits = cols == col
+            vector[rows[hits]] = values[hits]
+            selected = vector[mask]
+            totals.append(np.nansum(selected) if (~np.isnan(selected)).any() else np.nan)
+
+        result = pd.DataFrame({"Snapshot": self.weeks, "TargetWeek": label, "ForecastQty": totals})
+        return result.dropna(subset=["ForecastQty"]).reset_index(drop=True)
+
+    def target_weeks(self) -> list:
+        return [label for label in self.buckets if label not in ("BACKLOG", "MRP")]
+
+
+@timed()
+def rebuild_snapshot_store(snapshots, root: str = SNAPSHOT_STORE) -> SnapshotStore:
+    """
+    Rewrite the store from (week, bucket_frame) pairs given in chronological
+    order, streaming them into a temporary folder that then replaces `root`.
+    """
+    tmp_root = root + ".tmp"
+    shutil.rmtree(tmp_root, ignore_errors=True)
+    store = SnapshotStore(tmp_root)
+    for week, frame in snapshots:
+        store.append(week, frame)
+    shutil.rmtree(root, ignore_errors=True)
+    if store.index:
+        os.replace(tmp_root, root)
+    return SnapshotStore.open(root)
+
+
+def load_snapshot_store(root: str = SNAPSHOT_STORE):
+    """The persisted store, or None if no snapshots have been stored."""
+    if not os.path.exists(os.path.join(root, INDEX_FILE)):
+        return None
+    return SnapshotStore.open(root)
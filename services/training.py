@@ -0,0 +1,318 @@
+# services/training.py
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from services.preprocessing import create_features
+from services.prediction_service import MODEL_PATH, build_feature_matrix
+from services.parquet_store import read_store
+from services.out_of_core import MERGED_STORE
+from services.pipeline import LATEST_PARQUET
+from services.perf import timed
+
+TRAINING_DIR = "data/training"
+TRAINING_SET_PATH = os.path.join(TRAINING_DIR, "training_set.parquet")
+BEST_PARAMS_PATH = os.path.join(TRAINING_DIR, "best_params.json")
+RUNS_LOG_PATH = os.path.join(TRAINING_DIR, "runs.jsonl")
+
+TARGET_COL = "ConsumptionQty"
+MODEL_FEATURES = ["Total_MRP", "WIP", "Stock", "MRP BACKLOG",
+                  "Price from Info Record", "Price unit", "Safety Stock"]
+
+PARAM_DISTRIBUTIONS = {
+    "n_estimators": [100, 200, 300, 500],
+    "max_depth": [None, 8, 12, 16, 24],
+    "min_samples_leaf": [1, 2, 5, 10],
+    "max_features": [1.0, 0.7, 0.5, "sqrt"],
+}
+
+# Warm-started forests are refit from scratch once they would exceed this
+MAX_INCREMENTAL_TREES = 800
+
+
+def load_merged_history() -> pd.DataFrame:
+    """The merged forecast/consumption history, from the week partitions or latest.parquet."""
+    if os.path.isdir(MERGED_STORE):
+        return read_store(MERGED_STORE)
+    if os.path.exists(LATEST_PARQUET):
+        return pd.read_parquet(LATEST_PARQUET)
+    return None
+
+
+@timed()
+def build_training_set(merged_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Model features (named as at inference), the ConsumptionQty target and the
+    time/lag columns from create_features, one row per Material/Plant/Week.
+    """
+    features = create_features(merged_df.copy())
+    X = build_feature_matrix(features)
+    context = features[["Material", "Plant", "Week", "Time_index",
+                        "ConsumptionQty_lag1", "ConsumptionQty_rolling4"]]
+    training_set = pd.concat([context, X, features[[TARGET_COL]]], axis=1)
+    for col in MODEL_FEATURES + [TARGET_COL]:
+        training_set[col] = pd.to_numeric(training_set[col], errors="coerce").fillna(0)
+    return training_set.sort_values("Time_index").reset_index(drop=True)
+
+
+def update_training_set(merged_df: pd.DataFrame, path: str = TRAINING_SET_PATH):
+    """
+    Append-only training data: only weeks that are not yet in the stored set
+    are added. Returns (full_training_set, new_rows).
+    """
+    fresh = build_training_set(merged_df)
+    if os.path.exists(path):
+        existing = pd.read_parquet(path)
+        new_rows = fresh[~fresh["Week"].isin(existing["Week"].unique())]
+        training_set = pd.concat([existing, new_rows], ignore_index=True).sort_values("Time_index")
+    else:
+        new_rows = fresh
+        training_set = fresh
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    training_set.to_parquet(path, index=False)
+    return training_set.reset_index(drop=True), new_rows.reset_index(drop=True)
+
+
+def split_holdout(training_set: pd.DataFrame, holdout_weeks: int):
+    """Train on everything except the most recent `holdout_weeks` weeks."""
+    times = np.sort(training_set["Time_index"].unique())
+    if holdout_weeks <= 0 or len(times) <= holdout_weeks:
+        return training_set, training_set.iloc[0:0]
+    cutoff = times[-holdout_weeks]
+    return (training_set[training_set["Time_index"] < cutoff],
+            training_set[training_set["Time_index"] >= cutoff])
+
+
+def evaluate(model, data: pd.DataFrame) -> dict:
+    """Model accuracy next to the raw MRP forecast as a baseline."""
+    if data.empty:
+        return {}
+    actual = data[TARGET_COL].to_numpy()
+    predicted = np.asarray(model.predict(data[MODEL_FEATURES]))
+    forecast = data["Total_MRP"].to_numpy()
+    total_actual = np.abs(actual).sum()
+
+    def wape(values):
+        return float(np.abs(actual - values).sum() / total_actual * 100) if total_actual else None
+
+    ss_tot = ((actual - actual.mean()) ** 2).sum()
+    return {
+        "rows": int(len(data)),
+        "mae": float(np.abs(actual - predicted).mean()),
+        "rmse": float(np.sqrt(((actual - predicted) ** 2).mean())),
+        "r2": float(1 - ((actual - predicted) ** 2).sum() / ss_tot) if ss_tot else None,
+        "wape": wape(predicted),
+        "forecast_mae": float(np.abs(actual - forecast).mean()),
+        "forecast_wape": wape(forecast),
+    }
+
+
+def record_run(run: dict, path: str = RUNS_LOG_PATH) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(run, default=str) + "\n")
+
+
+def load_runs(path: str = RUNS_LOG_PATH) -> pd.DataFrame:
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    with open(path) as f:
+        return pd.json_normalize([json.loads(line) for line in f if line.strip()])
+
+
+def save_model(model, path: str = MODEL_PATH) -> None:
+    import joblib
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    joblib.dump(model, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _regressor(params=None, n_jobs: int = -1, random_state: int = 42):
+    from sklearn.ensemble import RandomForestRegressor
+    return RandomForestRegressor(random_state=random_state, n_jobs=n_jobs, **(params or {}))
+
+
+@timed()
+def train_with_search(training_set: pd.DataFrame, n_iter: int = 20, n_jobs: int = -1,
+                      cv_splits: int = 3, holdout_weeks: int = 2, model_path: str = MODEL_PATH,
+                      random_state: int = 42) -> dict:
+    """
+    Randomised hyper-parameter search over a RandomForestRegressor.
+
+    Candidates are cross-validated with forward-chaining time splits and
+    evaluated in parallel worker processes (n_jobs, joblib's process pool).
+    The best parameters are scored on the held-out latest weeks, then refit
+    on the full history, saved as the app's model and remembered for
+    incremental retraining.
+    """
+    from sklearn.model_selection import RandomizedSearchCV, TimeSeriesSplit
+
+    start = time.perf_counter()
+    train, holdout = split_holdout(training_set, holdout_weeks)
+
+    # One estimator thread per candidate: the parallelism lives in the search
+    search = RandomizedSearchCV(
+        _regressor(n_jobs=1, random_state=random_state),
+        PARAM_DISTRIBUTIONS,
+        n_iter=n_iter,
+        cv=TimeSeriesSplit(n_splits=cv_splits),
+        scoring="neg_mean_absolute_error",
+        n_jobs=n_jobs,
+        random_state=random_state,
+        refit=True,
+    )
+    search.fit(train[MODEL_FEATURES], train[TARGET_COL])
+    metrics = evaluate(search.best_estimator_, holdout)
+
+    model = _regressor(search.best_params_, n_jobs=n_jobs, random_state=random_state)
+    model.fit(training_set[MODEL_FEATURES], training_set[TARGET_COL])
+    save_model(model, model_path)
+
+    os.makedirs(os.path.dirname(BEST_PARAMS_PATH), exist_ok=True)
+    with open(BEST_PARAMS_PATH, "w") as f:
+        json.dump(search.best_params_, f, indent=2)
+
+    run = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "kind": "search",
+        "rows": int(len(training_set)),
+        "weeks": int(training_set["Week"].nunique()),
+        "n_iter": n_iter,
+        "cv_mae": float(-search.best_score_),
+        "params": search.best_params_,
+        "holdout": metrics,
+        "seconds": time.perf_counter() - start,
+        "model_path": model_path,
+    }
+    record_run(run)
+    return run
+
+
+@timed()
+def train_segment_models(training_set: pd.DataFrame, segment_by: str = "bu", holdout_weeks: int = 2,
+                         min_rows: int = 500, n_jobs: int = -1, random_state: int = 42) -> dict:
+    """
+    One forest per plant or business unit, with the last search's parameters.
+
+    Each segment model is scored on the held-out latest weeks next to a
+    global forest fitted with the same parameters on the same pre-holdout
+    weeks (the saved global model has seen the holdout), and is only
+    registered when it does at least as well; segments that are too small
+    or lose keep using the global model. The segments are fitted
+    concurrently (the forests release the GIL).
+    """
+    from services.model_registry import segment_keys, segment_model_path, write_manifest
+
+    start = time.perf_counter()
+    params = {}
+    if os.path.exists(BEST_PARAMS_PATH):
+        with open(BEST_PARAMS_PATH) as f:
+            params = json.load(f)
+    keys = segment_keys(training_set["Plant"], segment_by)
+
+    global_train, global_holdout = split_holdout(training_set, holdout_weeks)
+    reference = None
+    if not global_holdout.empty:
+        reference = _regressor(params, n_jobs=n_jobs, random_state=random_state)
+        reference.fit(global_train[MODEL_FEATURES], global_train[TARGET_COL])
+
+    def fit_segment(item):
+        key, segment = item
+        in_holdout = segment.index.isin(global_holdout.index)
+        train, holdout = segment[~in_holdout], segment[in_holdout]
+        if train.empty:
+            train, holdout = segment, segment.iloc[0:0]
+        model = _regressor(params, n_jobs=1, random_state=random_state)
+        model.fit(train[MODEL_FEATURES], train[TARGET_COL])
+        metrics = evaluate(model, holdout)
+        global_metrics = evaluate(reference, holdout) if reference is not None else {}
+        if not holdout.empty:
+            # Refit on the segment's full history once it has been scored
+            model = _regressor(params, n_jobs=1, random_state=random_state)
+            model.fit(segment[MODEL_FEATURES], segment[TARGET_COL])
+        return key, model, len(segment), metrics, global_metrics
+
+    segments = [(key, segment) for key, segment in training_set.groupby(keys, sort=True)
+                if len(segment) >= min_rows]
+    workers = os.cpu_count() if n_jobs == -1 else max(1, n_jobs)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(segments) or 1))) as pool:
+        fitted = list(pool.map(fit_segment, segments))
+
+    manifest, skipped = {}, []
+    for key, model, rows, metrics, global_metrics in fitted:
+        if global_metrics and metrics and metrics["mae"] > global_metrics["mae"]:
+            skipped.append(key)
+            continue
+        path = segment_model_path(key)
+        save_model(model, path)
+        manifest[key] = {"path": path, "rows": rows, "holdout": metrics, "global_holdout": global_metrics}
+    write_manifest(manifest, segment_by)
+
+    run = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "kind": f"segments_{segment_by}",
+        "rows": int(len(training_set)),
+        "segments": manifest,
+        "kept_global": skipped + sorted(set(keys.unique()) - {key for key, _ in segments}),
+        "seconds": time.perf_counter() - start,
+    }
+    record_run(run)
+    return run
+
+
+@timed()
+def retrain_incremental(training_set: pd.DataFrame, new_rows: pd.DataFrame, extra_trees: int = 50,
+                        n_jobs: int = -1, model_path: str = MODEL_PATH, random_state: int = 42,
+                        max_trees: int = MAX_INCREMENTAL_TREES) -> dict:
+    """
+    Fold a newly landed week into the model without a new search.
+
+    The current model is first scored on the new rows (a true forward test).
+    A warm-startable forest then grows `extra_trees` trees fitted on the new
+    rows only, as long as it stays within `max_trees`. Past that, or for any
+    other model, it is refit on the append-only training set using the last
+    search's parameters, so the forest does not grow without bound and
+    small-sample trees do not pile up.
+    """
+    from services.prediction_service import load_model
+
+    start = time.perf_counter()
+    model = load_model(model_path, prefer_compiled=False)
+    forward_metrics = evaluate(model, new_rows) if model is not None else {}
+
+    can_warm_start = model is not None and hasattr(model, "warm_start") and hasattr(model, "n_estimators")
+    if can_warm_start and model.n_estimators + extra_trees <= max_trees:
+        kind = "warm_start"
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + extra_trees, n_jobs=n_jobs)
+        model.fit(new_rows[MODEL_FEATURES], new_rows[TARGET_COL])
+        model.set_params(warm_start=False)
+    else:
+        kind = "refit"
+        params = {}
+        if os.path.exists(BEST_PARAMS_PATH):
+            with open(BEST_PARAMS_PATH) as f:
+                params = json.load(f)
+        model = _regressor(params, n_jobs=n_jobs, random_state=random_state)
+        model.fit(training_set[MODEL_FEATURES], training_set[TARGET_COL])
+    save_model(model, model_path)
+
+    run = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "kind": kind,
+        "rows": int(len(training_set)),
+        "new_rows": int(len(new_rows)),
+        "new_weeks": sorted(new_rows["Week"].unique().tolist()),
+        "n_estimators": int(getattr(model, "n_estimators", 0)),
+        "forward_test": forward_metrics,
+        "seconds": time.perf_counter() - start,
+        "model_path": model_path,
+    }
+    record_run(run)
+    return run
@@ -0,0 +1,89 @@
+# services/workspace_service.py
+"""
+Workspaces for the custom dashboard.
+
+Each distinct set of uploaded files gets its own folder under
+data/custom/workspaces, named after a hash of the files' names and contents.
+The uploads are cleaned and merged once; later reruns (and other sessions
+uploading the same files) read the stored result instead. Workspaces that
+have not been used for WORKSPACE_IDLE_HOURS are evicted.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import pandas as pd
+
+from services.config import WORKSPACE_IDLE_HOURS
+from services.perf import timed
+
+WORKSPACE_ROOT = "data/custom/workspaces"
+MERGED_FILE = "merged.parquet"
+META_FILE = "meta.json"
+
+
+def upload_key(files) -> str:
+    """Content hash of uploaded files; the order they were picked in does not matter."""
+    digests = []
+    for uploaded in files:
+        digest = hashlib.sha256(uploaded.getvalue()).hexdigest()
+        digests.append(f"{uploaded.name}:{digest}")
+    return hashlib.sha256("\n".join(sorted(digests)).encode()).hexdigest()[:24]
+
+
+def workspace_dir(key: str, root: str = WORKSPACE_ROOT) -> str:
+    return os.path.join(root, key)
+
+
+def touch_workspace(key: str, root: str = WORKSPACE_ROOT) -> None:
+    """Mark the workspace as used now (its meta file's mtime is the idle clock)."""
+    meta_path = os.path.join(workspace_dir(key, root), META_FILE)
+    if os.path.exists(meta_path):
+        os.utime(meta_path)
+
+
+def load_workspace(key: str, root: str = WORKSPACE_ROOT):
+    """(merged_df, meta) of a processed workspace, or None."""
+    path = workspace_dir(key, root)
+    merged_path = os.path.join(path, MERGED_FILE)
+    meta_path = os.path.join(path, META_FILE)
+    if not (os.path.exists(merged_path) and os.path.exists(meta_path)):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    touch_workspace(key, root)
+    return pd.read_parquet(merged_path), meta
+
+
+@timed()
+def save_workspace(key: str, merged_df: pd.DataFrame, meta: dict, root: str = WORKSPACE_ROOT) -> None:
+    """Write the merged result, then the meta file that marks the workspace complete."""
+    path = workspace_dir(key, root)
+    os.makedirs(path, exist_ok=True)
+    tmp_path = os.path.join(path, MERGED_FILE + ".tmp")
+    merged_df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, os.path.join(path, MERGED_FILE))
+    with open(os.path.join(path, META_FILE), "w") as f:
+        json.dump({**meta, "created": time.time()}, f, default=str)
+
+
+def evict_idle_workspaces(max_idle_hours: float = WORKSPACE_IDLE_HOURS, keep=(),
+                          root: str = WORKSPACE_ROOT) -> list:
+    """Delete workspaces idle for longer than `max_idle_hours`; returns the evicted keys."""
+    if not os.path.isdir(root):
+        return []
+    cutoff = time.time() - max_idle_hours * 3600
+    evicted = []
+    for key in os.listdir(root):
+        if key in keep:
+            continue
+        path = workspace_dir(key, root)
+        meta_path = os.path.join(path, META_FILE)
+        # Unfinished workspaces have no meta file; fall back to the folder's mtime
+        last_used = os.path.getmtime(meta_path if os.path.exists(meta_path) else path)
+        if last_used < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+            evicted.append(key)
+    return evicted
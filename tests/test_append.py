@@ -0,0 +1,95 @@
+# tests/test_append.py
+"""
+Appending weeks to the merged partitions, aggregates and series store must
+give the same result as merging the full history from scratch.
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("streamlit")  # services.data_service caches with st.cache_data
+
+from benchmarks.synthetic_data import generate_history
+from services.consumption_reader import normalize_consumption_chunk
+from services.engine import get_engine
+from services.out_of_core import run_out_of_core_merge, append_merged_weeks
+from services.parquet_store import list_partitions, read_store, replace_partition, write_partition
+from services.series_store import SeriesStore
+
+
+@pytest.fixture(scope="module")
+def cleaned():
+    snapshots, mcsk = generate_history(n_materials=20, n_weeks=6, seed=3)
+    engine = get_engine("pandas")
+    forecast = pd.concat([engine.clean_yppmpl_file(raw.copy(), week_str, week, year)
+                          for week_str, week, year, raw in snapshots], ignore_index=True)
+    return forecast, normalize_consumption_chunk(mcsk.copy())
+
+
+def _roots(base):
+    return {
+        "forecast_root": str(base / "forecast"),
+        "consumption_root": str(base / "consumption"),
+        "merged_root": str(base / "merged"),
+        "aggregates_path": str(base / "aggregates.parquet"),
+        "series_root": str(base / "series"),
+    }
+
+
+def _sorted(df, keys):
+    return df.sort_values(keys).reset_index(drop=True)
+
+
+def _series_long(store):
+    """Every stored cell as Material, Plant, Week and one column per measure."""
+    frames = []
+    for col, week in enumerate(store.weeks):
+        frame = store.index.copy()
+        frame["Week"] = week
+        for measure, matrix in store.matrices.items():
+            frame[measure] = np.asarray(matrix[:, col], dtype=float)
+        frames.append(frame)
+    long = pd.concat(frames, ignore_index=True)
+    long = long.dropna(subset=list(store.matrices), how="all")
+    return _sorted(long, ["Material", "Plant", "Week"])
+
+
+def test_append_matches_full_merge(tmp_path, cleaned):
+    forecast, consumption = cleaned
+    weeks = sorted(set(forecast["Week"]) & set(consumption["Week"]))
+    early, late = weeks[:len(weeks) // 2], weeks[len(weeks) // 2:]
+    corrected = early[0]
+
+    full = _roots(tmp_path / "full")
+    write_partition(forecast, full["forecast_root"])
+    write_partition(consumption, full["consumption_root"])
+    expected = run_out_of_core_merge(**full)
+
+    # Start from the early weeks, one of them with consumption that is later corrected
+    appended = _roots(tmp_path / "appended")
+    write_partition(forecast[forecast["Week"].isin(early)], appended["forecast_root"])
+    stale = consumption[consumption["Week"].isin(early)].copy()
+    stale.loc[stale["Week"] == corrected, "ConsumptionQty"] *= 2
+    write_partition(stale, appended["consumption_root"])
+    run_out_of_core_merge(**appended)
+
+    write_partition(forecast[forecast["Week"].isin(late)], appended["forecast_root"])
+    write_partition(consumption[consumption["Week"].isin(late)], appended["consumption_root"])
+    replace_partition(consumption[consumption["Week"] == corrected], appended["consumption_root"], corrected)
+    actual = append_merged_weeks(late + [corrected], **appended)
+
+    pd.testing.assert_frame_equal(
+        _sorted(actual, ["Week", "Plant"]), _sorted(expected, ["Week", "Plant"]), check_dtype=False
+    )
+    assert list_partitions(appended["merged_root"]) == list_partitions(full["merged_root"])
+    keys = ["Material", "Plant", "Week"]
+    merged_expected = read_store(full["merged_root"])
+    pd.testing.assert_frame_equal(
+        _sorted(read_store(appended["merged_root"])[list(merged_expected.columns)], keys),
+        _sorted(merged_expected, keys), check_dtype=False
+    )
+
+    store_expected = SeriesStore.load(full["series_root"])
+    store_actual = SeriesStore.load(appended["series_root"])
+    assert store_actual.weeks == store_expected.weeks
+    pd.testing.assert_frame_equal(_series_long(store_actual), _series_long(store_expected), check_dtype=False)
@@ -0,0 +1,55 @@
+# tests/test_compiled_model.py
+"""
+The compiled NumPy evaluator is served in place of the scikit-learn models,
+so its predictions must match theirs for every supported estimator.
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+ensemble = pytest.importorskip("sklearn.ensemble")
+tree = pytest.importorskip("sklearn.tree")
+
+from services.compiled_model import CompiledForest, check_parity, compile_model
+
+FEATURES = ["Total_MRP", "WIP", "Stock", "MRP BACKLOG", "Price from Info Record", "Price unit", "Safety Stock"]
+
+MODELS = {
+    "DecisionTreeRegressor": lambda: tree.DecisionTreeRegressor(max_depth=10, random_state=0),
+    "RandomForestRegressor": lambda: ensemble.RandomForestRegressor(n_estimators=25, random_state=0),
+    "ExtraTreesRegressor": lambda: ensemble.ExtraTreesRegressor(n_estimators=25, random_state=0),
+    "GradientBoostingRegressor": lambda: ensemble.GradientBoostingRegressor(n_estimators=50, random_state=0),
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.integers(0, 5000, (2000, len(FEATURES))).astype(float), columns=FEATURES)
+    X["Price from Info Record"] = rng.uniform(0.01, 50, len(X)).round(4)
+    y = X["Total_MRP"] * 0.6 + X["Stock"] * 0.1 + rng.normal(0, 100, len(X))
+    return X.iloc[:1500], y.iloc[:1500], X.iloc[1500:]
+
+
+@pytest.mark.parametrize("name", MODELS)
+def test_compiled_matches_sklearn(name, data):
+    X_train, y_train, X_test = data
+    model = MODELS[name]().fit(X_train, y_train)
+    compiled = compile_model(model)
+
+    parity = check_parity(model, compiled, X_test)
+    assert parity["ok"], parity
+    assert parity["max_abs_diff"] < 1e-9
+
+
+def test_compiled_round_trip(tmp_path, data):
+    X_train, y_train, X_test = data
+    model = MODELS["RandomForestRegressor"]().fit(X_train, y_train)
+    compiled = compile_model(model)
+    path = str(tmp_path / "model.npz")
+    compiled.save(path)
+
+    loaded = CompiledForest.load(path)
+    assert loaded.feature_names == list(FEATURES)
+    # Columns are picked by name, so their order in the input does not matter
+    np.testing.assert_array_equal(loaded.predict(X_test[FEATURES[::-1]]), compiled.predict(X_test))
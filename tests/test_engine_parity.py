@@ -0,0 +1,97 @@
+# tests/test_engine_parity.py
+"""
+The polars and duckdb engines must give the same cleaned frames, merged
+rows and KPIs as the pandas reference engine. Each engine is skipped when
+its package is not installed.
+"""
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("streamlit")  # services.forecast_cleaner caches with st.cache_data
+
+from benchmarks.synthetic_data import generate_history
+from services.consumption_reader import normalize_consumption_chunk
+from services.engine import KEYS, get_engine, check_engine_parity
+
+ENGINES = ["polars", "duckdb"]
+
+
+def _engine(name):
+    pytest.importorskip(name)
+    return get_engine(name)
+
+
+def _sorted(df):
+    return df.sort_values(KEYS).reset_index(drop=True)
+
+
+@pytest.fixture(scope="module")
+def history():
+    return generate_history(n_materials=25, n_weeks=3, seed=7)
+
+
+@pytest.fixture(scope="module")
+def forecast_df(history):
+    snapshots, _ = history
+    reference = get_engine("pandas")
+    cleaned = [reference.clean_yppmpl_file(raw.copy(), week_str, week, year)
+               for week_str, week, year, raw in snapshots]
+    return pd.concat(cleaned, ignore_index=True)
+
+
+@pytest.fixture(scope="module")
+def consumption_df(history):
+    _, mcsk = history
+    return normalize_consumption_chunk(mcsk.copy())
+
+
+@pytest.fixture(scope="module")
+def merged_df(forecast_df, consumption_df):
+    return get_engine("pandas").merge_forecast_and_consumption(forecast_df, consumption_df)
+
+
+@pytest.mark.parametrize("name", ENGINES)
+def test_clean_matches_pandas(name, history):
+    engine = _engine(name)
+    reference = get_engine("pandas")
+    snapshots, _ = history
+    for week_str, week, year, raw in snapshots:
+        expected = reference.clean_yppmpl_file(raw.copy(), week_str, week, year)
+        actual = engine.clean_yppmpl_file(raw.copy(), week_str, week, year)
+        pd.testing.assert_frame_equal(_sorted(actual), _sorted(expected), check_dtype=False)
+
+
+@pytest.mark.parametrize("name", ENGINES)
+def test_merge_matches_pandas(name, forecast_df, consumption_df, merged_df):
+    actual = _engine(name).merge_forecast_and_consumption(forecast_df, consumption_df)
+    assert set(actual.columns) == set(merged_df.columns)
+    pd.testing.assert_frame_equal(
+        _sorted(actual[list(merged_df.columns)]), _sorted(merged_df),
+        check_dtype=False, rtol=1e-9
+    )
+
+
+@pytest.mark.parametrize("name", ENGINES)
+def test_kpis_match_pandas(name, merged_df):
+    engine = _engine(name)
+    reference = get_engine("pandas")
+
+    expected_gap, expected_abs, expected_dev = reference.calculate_kpis(merged_df)
+    actual_gap, actual_abs, actual_dev = engine.calculate_kpis(merged_df)
+    assert actual_gap == pytest.approx(expected_gap, rel=1e-9)
+    assert actual_abs == pytest.approx(expected_abs, rel=1e-9)
+    assert actual_dev == pytest.approx(expected_dev, abs=0.01)
+
+    assert engine.get_worst_plants(merged_df) == reference.get_worst_plants(merged_df)
+
+    pd.testing.assert_frame_equal(
+        engine.summarize_gap_by_plant(merged_df).sort_values("Plant").reset_index(drop=True),
+        reference.summarize_gap_by_plant(merged_df).sort_values("Plant").reset_index(drop=True),
+        check_dtype=False, rtol=1e-9
+    )
+
+
+@pytest.mark.parametrize("name", ENGINES)
+def test_check_engine_parity_finds_no_mismatches(name, forecast_df, consumption_df):
+    _engine(name)
+    assert check_engine_parity(forecast_df, consumption_df, name) == []